@@ -0,0 +1,76 @@
+"""
+Microbenchmark of the alert webhook validation paths:
+AlertCreateSerializer against notifications.validation.validate_alert_payload.
+
+Usage: python benchmarks/bench_alert_validation.py [--number 20000]
+
+No database is needed: the store is seeded into the resolver cache, as it
+would be on a warm worker.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+
+from notifications.models import Store  # noqa: E402
+from notifications.serializers import AlertCreateSerializer  # noqa: E402
+from notifications.stores import store_resolver  # noqa: E402
+from notifications.validation import validate_alert_payload  # noqa: E402
+
+PAYLOAD = {
+    "alert_uuid": "0b6c3b8e-58a4-4d1c-9d55-6c2f1a3c0e11",
+    "url": "https://media.veesion.io/example.mp4",
+    "label": "theft",
+    "time_spotted": 1742470260.083,
+    "location": "store-1",
+}
+
+
+def with_serializer() -> None:
+    serializer = AlertCreateSerializer(data=PAYLOAD)
+    serializer.is_valid(raise_exception=True)
+
+
+def with_fast_validation() -> None:
+    record = validate_alert_payload(PAYLOAD)
+    # the view resolves the store after validation, include it for fairness
+    store_resolver.resolve(record.location)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now = timezone.now()
+    store_resolver._cache.set(
+        "store-1",
+        Store(location_id="store-1", name="Store 1", created=now, modified=now),
+    )
+
+    results = {}
+    for name, func in [
+        ("serializer", with_serializer),
+        ("fast", with_fast_validation),
+    ]:
+        func()  # warm up lazy compilation
+        best = min(timeit.repeat(func, number=args.number, repeat=args.repeat))
+        results[name] = best / args.number * 1e6
+        print(f"{name:>10}: {results[name]:8.2f} us/payload")
+    print(f"   speedup: {results['serializer'] / results['fast']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Load test of the single alert webhook: the sync DRF view under sync gunicorn
+workers against the async view (webhooks/alerts/async/) under uvicorn workers,
+with the same number of worker processes (the peak RSS of each server is
+reported).
+
+Every request posts a new alert. The database round trip of a remote server
+is emulated by sleeping --db-latency-ms before each query, in the servers.
+Both views use the precompiled validator (NOTIFICATION_ALERT_FAST_VALIDATION).
+
+Usage: DATABASE_URL=postgresql://... python benchmarks/bench_async_ingestion.py
+       [--workers 2] [--concurrency 64] [--requests 3000] [--db-latency-ms 5]
+
+Needs gunicorn and uvicorn-worker, and PostgreSQL: SQLite serializes writes.
+No Redis nor broker is needed, the fan-out only goes to the outbox.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db.backends.signals import connection_created  # noqa: E402
+
+LOCATION = "bench-store"
+SERVERS = {
+    "sync": (
+        ["bench_async_ingestion:wsgi_application"],
+        "/api/v1/notifications/webhooks/alerts/",
+    ),
+    "async": (
+        [
+            "-k",
+            "uvicorn_worker.UvicornWorker",
+            "bench_async_ingestion:asgi_application",
+        ],
+        "/api/v1/notifications/webhooks/alerts/async/",
+    ),
+}
+
+
+def _emulate_latency(sender, connection, **kwargs) -> None:
+    delay = float(os.environ["BENCH_DB_LATENCY_MS"]) / 1000
+
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    connection.execute_wrappers.append(wrapper)
+
+
+# entry points of the servers, started by gunicorn with --pythonpath benchmarks
+if "BENCH_DB_LATENCY_MS" in os.environ:
+    from django.core.asgi import get_asgi_application
+    from django.core.wsgi import get_wsgi_application
+
+    connection_created.connect(_emulate_latency)
+    wsgi_application = get_wsgi_application()
+    asgi_application = get_asgi_application()
+
+
+def rss_mb(pid: int) -> float:
+    """RSS of a process and its children, from /proc."""
+    pids, total = [pid], 0
+    while pids:
+        current = pids.pop()
+        try:
+            status = Path(f"/proc/{current}/status").read_text()
+            for task in Path(f"/proc/{current}/task").iterdir():
+                pids.extend(map(int, (task / "children").read_text().split()))
+        except FileNotFoundError:
+            continue
+        total += next(
+            int(line.split()[1])
+            for line in status.splitlines()
+            if line.startswith("VmRSS")
+        )
+    return total / 1024
+
+
+def start_server(
+    mode: str, workers: int, port: int, latency_ms: float, db_threads: int
+):
+    args, _ = SERVERS[mode]
+    env = {
+        **os.environ,
+        "BENCH_DB_LATENCY_MS": str(latency_ms),
+        "NOTIFICATION_ALERT_FAST_VALIDATION": "true",
+        # as deployed: persistent connections under WSGI, a fixed pool of
+        # connections for the async view under ASGI
+        "DATABASE_CONN_MAX_AGE": "0" if mode == "async" else "600",
+        "NOTIFICATION_ASYNC_DB_THREADS": str(db_threads),
+    }
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--pythonpath",
+            f"{ROOT},{ROOT / 'benchmarks'}",
+            "--workers",
+            str(workers),
+            "--bind",
+            f"127.0.0.1:{port}",
+            "--log-level",
+            "warning",
+            *args,
+        ],
+        cwd=ROOT,
+        env=env,
+    )
+
+
+def payload() -> dict:
+    return {
+        "alert_uuid": str(uuid.uuid4()),
+        "url": "https://media.veesion.io/example.mp4",
+        "label": "theft",
+        "time_spotted": time.time(),
+        "location": LOCATION,
+    }
+
+
+async def load(url: str, concurrency: int, requests: int, server_pid: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    rss_samples: list[float] = []
+    remaining = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency)
+
+    # no keep-alive: each request is balanced across the worker processes,
+    # as sync gunicorn workers close the connection anyway
+    async with httpx.AsyncClient(
+        limits=limits, timeout=60, headers={"Connection": "close"}
+    ) as client:
+        # wait for the workers
+        for _ in range(200):
+            try:
+                await client.post(url, json=payload())
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+
+        async def user() -> None:
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payload())
+                except httpx.TransportError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+                errors += response.status_code != 200
+
+        async def sample_rss() -> None:
+            while True:
+                rss_samples.append(rss_mb(server_pid))
+                await asyncio.sleep(0.5)
+
+        sampler = asyncio.create_task(sample_rss())
+        start = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        sampler.cancel()
+
+    return {
+        "rps": requests / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": statistics.quantiles(latencies, n=100, method="inclusive")[98] * 1000,
+        "errors": errors,
+        "rss": max(rss_samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--db-latency-ms", type=float, default=5)
+    parser.add_argument("--db-threads", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    from django.core.management import call_command
+
+    from notifications.models import Store
+
+    call_command("migrate", verbosity=0)
+    Store.objects.get_or_create(location_id=LOCATION)
+
+    print(
+        f"{'server':<6} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7} {'RSS MB':>7}"
+    )
+    for mode, (_, path) in SERVERS.items():
+        server = start_server(
+            mode, args.workers, args.port, args.db_latency_ms, args.db_threads
+        )
+        try:
+            result = asyncio.run(
+                load(
+                    f"http://127.0.0.1:{args.port}{path}",
+                    args.concurrency,
+                    args.requests,
+                    server.pid,
+                )
+            )
+        finally:
+            server.terminate()
+            server.wait()
+        print(
+            f"{mode:<6} {result['rps']:>8.0f} {result['p50']:>8.1f} "
+            f"{result['p99']:>8.1f} {result['errors']:>7} {result['rss']:>7.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
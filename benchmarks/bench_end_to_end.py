@@ -0,0 +1,440 @@
+"""
+End-to-end benchmark of the notification pipeline: alert webhook -> outbox ->
+fan-out -> delivery, against a local webhook sink (webhook_sink.py).
+
+Seeds --stores stores of --profiles user profiles each, with mixed
+notification preferences, then starts the stack as in docker-compose, one
+process each: gunicorn (config.wsgi), the outbox relay, a Celery worker and
+beat, with e2e_settings to count their SQL queries. The driver posts --alerts
+alerts to /api/v1/notifications/webhooks/alerts/, at --rate alerts/s (0: as
+fast as --concurrency clients go), each spotted when it is sent. Once every
+expected notification landed in the sink (or after --timeout), it reports:
+
+  alerts/s           ingestion throughput of the webhook
+  notifications/s    deliveries landed per second, first alert to last delivery
+  queries/alert      SQL queries per alert, per process kind and in total
+                     (the relay polls the outbox even when idle)
+  latency p50/95/99  detection (time_spotted) to delivery landing in the sink
+
+and writes them, with the configuration, to --output as JSON; --baseline
+prints the change from a previous result file.
+
+Usage: DATABASE_URL=postgresql://... python benchmarks/bench_end_to_end.py
+       [--redis-url redis://localhost:6379] [--stores 20] [--profiles 10]
+       [--alerts 1000] [--rate 0] [--sink-latency-ms 20]
+       [--sink-error-rate 0.01] [--sink-throttle-rate 0.01]
+       [--output FILE] [--baseline FILE]
+
+Needs PostgreSQL and Redis. Databases 0 (broker), 1 (caches) and 2 (query
+counts) of --redis-url are flushed, the bench-e2e-* stores are recreated.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import redis
+
+ROOT = Path(__file__).resolve().parent.parent
+BENCHMARKS = ROOT / "benchmarks"
+STORE_PREFIX = "bench-e2e-"
+ALERT_PATH = "/api/v1/notifications/webhooks/alerts/"
+COMPONENTS = ["web", "relay", "worker", "beat"]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--redis-url", default=os.getenv("REDIS_URL", "redis://localhost:6379")
+    )
+    parser.add_argument("--stores", type=int, default=20)
+    parser.add_argument("--profiles", type=int, default=10, help="per store")
+    parser.add_argument("--alerts", type=int, default=1000)
+    parser.add_argument("--theft-ratio", type=float, default=0.2)
+    parser.add_argument("--rate", type=float, default=0, help="alerts/s, 0: max")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--web-workers", type=int, default=2)
+    parser.add_argument("--celery-concurrency", type=int, default=2)
+    parser.add_argument("--sink-latency-ms", type=float, default=20)
+    parser.add_argument("--sink-jitter-ms", type=float, default=10)
+    parser.add_argument("--sink-error-rate", type=float, default=0.01)
+    parser.add_argument("--sink-throttle-rate", type=float, default=0.01)
+    parser.add_argument(
+        "--retry-base-delay", type=float, default=1, help="seconds, for the bench"
+    )
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--sink-port", type=int, default=9766)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    return parser.parse_args()
+
+
+def stack_environment(args: argparse.Namespace) -> dict[str, str]:
+    """Environment of the stack processes, also applied to this one."""
+    redis_url = args.redis_url.rstrip("/")
+    return {
+        "CELERY_TASK_ALWAYS_EAGER": "false",
+        "CELERY_BROKER_URL": f"{redis_url}/0",
+        "CELERY_RESULT_BACKEND": f"{redis_url}/0",
+        "NOTIFICATION_REDIS_URL": f"{redis_url}/1",
+        "BENCH_REDIS_URL": f"{redis_url}/2",
+        "NOTIFICATION_WEBHOOK_URL": f"http://127.0.0.1:{args.sink_port}/webhook/",
+        "NOTIFICATION_WEBHOOK_DRY_RUN": "false",
+        "NOTIFICATION_SWEEP_INTERVAL": "1",
+        "NOTIFICATION_RETRY_BASE_DELAY": str(args.retry_base_delay),
+    }
+
+
+def seed(stores: int, profiles: int, rng: random.Random) -> dict[str, Counter]:
+    """
+    Synthetic stores and profiles, preferences drawn all 50%, critical 25%,
+    standard 25%. Returns the preference counts of each store.
+    """
+    from notifications.models import Store, UserProfile
+
+    Preference = UserProfile.NotificationPreferenceChoices
+    Store.objects.filter(location_id__startswith=STORE_PREFIX).delete()
+    locations = [f"{STORE_PREFIX}{index}" for index in range(stores)]
+    Store.objects.bulk_create(Store(location_id=location) for location in locations)
+
+    preferences: dict[str, Counter] = {location: Counter() for location in locations}
+    new_profiles = []
+    for location in locations:
+        for _ in range(profiles):
+            preference = rng.choices(
+                [Preference.ALL, Preference.CRITICAL, Preference.STANDARD],
+                weights=[2, 1, 1],
+            )[0]
+            preferences[location][preference] += 1
+            new_profiles.append(
+                UserProfile(
+                    user_id=uuid.UUID(int=rng.getrandbits(128)),
+                    store_id=location,
+                    notification_preference=preference,
+                )
+            )
+    UserProfile.objects.bulk_create(new_profiles, batch_size=1000)
+    return preferences
+
+
+def generate_alerts(
+    count: int, preferences: dict[str, Counter], theft_ratio: float, rng: random.Random
+) -> tuple[list[dict], int]:
+    """Alerts over the seeded stores, and the notifications they should produce."""
+    from notifications.models import Alert, UserProfile
+
+    Preference = UserProfile.NotificationPreferenceChoices
+    alerts, expected = [], 0
+    for _ in range(count):
+        location = rng.choice(list(preferences))
+        if rng.random() < theft_ratio:
+            label, audience = Alert.LabelChoices.THEFT, Preference.CRITICAL
+        else:
+            label = rng.choice(
+                [Alert.LabelChoices.SUSPICIOUS, Alert.LabelChoices.NORMAL]
+            )
+            audience = Preference.STANDARD
+        expected += preferences[location][Preference.ALL]
+        expected += preferences[location][audience]
+        alerts.append(
+            {
+                "alert_uuid": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                "url": "https://media.veesion.io/bench.mp4",
+                "label": str(label),
+                "location": location,
+            }
+        )
+    return alerts, expected
+
+
+def start(
+    command: list[str], env: dict[str, str], component: str | None = None
+) -> subprocess.Popen:
+    return subprocess.Popen(
+        command,
+        cwd=ROOT,
+        env={
+            **env,
+            "DJANGO_SETTINGS_MODULE": "e2e_settings",
+            "PYTHONPATH": os.pathsep.join([str(ROOT), str(BENCHMARKS)]),
+            "BENCH_COMPONENT": component or "",
+        },
+    )
+
+
+def start_stack(args: argparse.Namespace, env: dict, workdir: str) -> list:
+    python = sys.executable
+    return [
+        start(
+            [
+                python,
+                str(BENCHMARKS / "webhook_sink.py"),
+                f"--port={args.sink_port}",
+                f"--latency-ms={args.sink_latency_ms}",
+                f"--jitter-ms={args.sink_jitter_ms}",
+                f"--error-rate={args.sink_error_rate}",
+                f"--throttle-rate={args.sink_throttle_rate}",
+            ],
+            env,
+        ),
+        start(
+            [
+                python,
+                "-m",
+                "gunicorn",
+                f"--workers={args.web_workers}",
+                f"--bind=127.0.0.1:{args.port}",
+                "--log-level=warning",
+                "config.wsgi:application",
+            ],
+            env,
+            "web",
+        ),
+        start([python, "manage.py", "relay_outbox"], env, "relay"),
+        start(
+            [
+                python,
+                "-m",
+                "celery",
+                "-A",
+                "config.celery",
+                "worker",
+                "-Q",
+                "notifications.critical,celery,notifications",
+                f"--concurrency={args.celery_concurrency}",
+                "--loglevel=WARNING",
+            ],
+            env,
+            "worker",
+        ),
+        start(
+            [
+                python,
+                "-m",
+                "celery",
+                "-A",
+                "config.celery",
+                "beat",
+                f"--schedule={workdir}/celerybeat-schedule",
+                "--loglevel=WARNING",
+            ],
+            env,
+            "beat",
+        ),
+    ]
+
+
+def stop_stack(processes: list[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def wait_until_ready(args: argparse.Namespace) -> None:
+    from config.celery import app
+
+    async with httpx.AsyncClient() as client:
+        # an empty alert is rejected before any query
+        for method, url in (
+            ("POST", f"http://127.0.0.1:{args.port}{ALERT_PATH}"),
+            ("GET", f"http://127.0.0.1:{args.sink_port}/stats"),
+        ):
+            for _ in range(300):
+                try:
+                    await client.request(method, url, json={})
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+    while not await asyncio.to_thread(app.control.ping, timeout=1):
+        pass
+
+
+async def drive(
+    url: str, alerts: list[dict], concurrency: int, rate: float
+) -> tuple[float, int]:
+    """Posts the alerts, stamping their time_spotted. Returns (seconds, errors)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+
+        async def post(alert: dict, due: float) -> None:
+            nonlocal errors
+            await asyncio.sleep(max(0.0, due - time.monotonic()))
+            async with semaphore:
+                alert["time_spotted"] = time.time()
+                try:
+                    response = await client.post(url, json=alert)
+                except httpx.TransportError:
+                    errors += 1
+                    return
+                errors += response.status_code != 200
+
+        start = time.monotonic()
+        await asyncio.gather(
+            *(
+                post(alert, start + (index / rate if rate else 0))
+                for index, alert in enumerate(alerts)
+            )
+        )
+        return time.monotonic() - start, errors
+
+
+async def wait_for_deliveries(
+    sink_url: str, expected: int, timeout: float
+) -> tuple[dict, list]:
+    """Polls the sink until `expected` distinct notifications landed."""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=30) as client:
+        while True:
+            stats = (await client.get(f"{sink_url}/stats")).json()
+            delivered = {(alert, user): at for alert, user, at in stats["deliveries"]}
+            if len(delivered) >= expected or time.monotonic() > deadline:
+                return stats["responses"], [
+                    (alert, at) for (alert, _), at in delivered.items()
+                ]
+            await asyncio.sleep(0.5)
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if len(values) < 2:
+        return {}
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {
+        "p50": cuts[49],
+        "p95": cuts[94],
+        "p99": cuts[98],
+        "max": max(values),
+    }
+
+
+def compare(results: dict, baseline: dict) -> None:
+    metrics = [
+        ("alerts/s", ["alerts_per_s"]),
+        ("notifications/s", ["notifications_per_s"]),
+        ("queries/alert", ["queries_per_alert", "total"]),
+        ("latency p50 ms", ["latency_ms", "p50"]),
+        ("latency p95 ms", ["latency_ms", "p95"]),
+        ("latency p99 ms", ["latency_ms", "p99"]),
+    ]
+    print(f"\n{'vs baseline':<16} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, path in metrics:
+        before, after = baseline["results"], results
+        for key in path:
+            before, after = before.get(key), after.get(key)
+            if before is None or after is None:
+                break
+        if before is None or after is None:
+            continue
+        change = f"{(after - before) / before:+.1%}" if before else "n/a"
+        print(f"{name:<16} {before:>10.1f} {after:>10.1f} {change:>8}")
+
+
+def main() -> None:
+    args = parse_args()
+    env = stack_environment(args)
+    os.environ.update(env)
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+    import django
+
+    django.setup()
+
+    from django.core.management import call_command
+
+    for database in range(3):
+        redis.Redis.from_url(f"{args.redis_url.rstrip('/')}/{database}").flushdb()
+    call_command("migrate", verbosity=0)
+    rng = random.Random(args.seed)
+    preferences = seed(args.stores, args.profiles, rng)
+    alerts, expected = generate_alerts(args.alerts, preferences, args.theft_ratio, rng)
+    print(
+        f"{args.stores} stores x {args.profiles} profiles, {len(alerts)} alerts, "
+        f"{expected} notifications expected"
+    )
+
+    with tempfile.TemporaryDirectory() as workdir:
+        processes = start_stack(args, {**os.environ, **env}, workdir)
+        try:
+            asyncio.run(wait_until_ready(args))
+            counters = redis.Redis.from_url(env["BENCH_REDIS_URL"])
+            counters.flushdb()
+            elapsed, errors = asyncio.run(
+                drive(
+                    f"http://127.0.0.1:{args.port}{ALERT_PATH}",
+                    alerts,
+                    args.concurrency,
+                    args.rate,
+                )
+            )
+            responses, deliveries = asyncio.run(
+                wait_for_deliveries(
+                    f"http://127.0.0.1:{args.sink_port}", expected, args.timeout
+                )
+            )
+            # counts are flushed every 0.2s
+            time.sleep(1)
+            queries = {
+                component: int(counters.get(f"bench:queries:{component}") or 0)
+                for component in COMPONENTS
+            }
+        finally:
+            stop_stack(processes)
+
+    spotted = {alert["alert_uuid"]: alert["time_spotted"] for alert in alerts}
+    latencies = [(at - spotted[alert]) * 1000 for alert, at in deliveries]
+    first_spotted = min(spotted.values())
+    last_delivery = max((at for _, at in deliveries), default=first_spotted)
+    results = {
+        "alerts": len(alerts),
+        "ingestion_errors": errors,
+        "alerts_per_s": len(alerts) / elapsed,
+        "notifications_expected": expected,
+        "notifications_delivered": len(deliveries),
+        "notifications_per_s": len(deliveries)
+        / max(last_delivery - first_spotted, 1e-9),
+        "queries_per_alert": {
+            **{component: count / len(alerts) for component, count in queries.items()},
+            "total": sum(queries.values()) / len(alerts),
+        },
+        "latency_ms": percentiles(latencies),
+        "sink_responses": responses,
+    }
+
+    print(json.dumps(results, indent=2))
+    output = args.output or (
+        BENCHMARKS / "results" / f"e2e-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    config = {
+        key: str(value) if isinstance(value, Path) else value
+        for key, value in vars(args).items()
+    }
+    output.write_text(json.dumps({"config": config, "results": results}, indent=2))
+    print(f"Saved to {output}")
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Benchmark of the priority routing of the notification tasks: latency of the
+theft deliveries while a backlog of standard alerts saturates the workers.
+
+Two in-process Celery workers (solo pool) consume an in-memory broker, as in
+docker-compose: a general one (-Q notifications.critical,celery,notifications)
+and a critical one (-Q notifications.critical). Every delivery takes
+--service-ms. For each backlog size, the standard deliveries are enqueued
+first, then theft deliveries arrive at a steady rate; the queueing latency
+(enqueued to started) of the theft deliveries is reported.
+
+  shared: every task on the standard queue, as before the routing
+  routed: queues from notifications.priority.task_options
+
+Usage: python benchmarks/bench_priority_routing.py [--backlogs 0 250 1000]
+
+No database nor Redis is needed.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from celery import Celery  # noqa: E402
+from celery.contrib.testing.worker import start_worker  # noqa: E402
+
+from notifications.models import Alert  # noqa: E402
+from notifications.priority import (  # noqa: E402
+    critical_queue,
+    standard_queue,
+    task_options,
+)
+
+app = Celery("bench_priority_routing", broker="memory://", backend="cache+memory://")
+app.conf.update(
+    task_always_eager=False,
+    worker_prefetch_multiplier=1,
+    broker_transport_options={"polling_interval": 0.001},
+)
+
+latencies: list[float] = []
+latencies_lock = threading.Lock()
+service_time = 0.005
+
+
+@app.task(name="bench.deliver")
+def deliver(label: str, enqueued_at: float) -> None:
+    if label == Alert.LabelChoices.THEFT:
+        with latencies_lock:
+            latencies.append(time.perf_counter() - enqueued_at)
+    time.sleep(service_time)
+
+
+# start_worker requires it to be registered
+@app.task(name="celery.ping")
+def ping() -> str:
+    return "pong"
+
+
+def percentile(values: list[float], q: float) -> float:
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def run(routed: bool, backlog: int, thefts: int, theft_interval: float) -> dict:
+    def options(label: str) -> dict:
+        return task_options(label) if routed else {"queue": standard_queue()}
+
+    latencies.clear()
+    with ExitStack() as stack:
+        stack.enter_context(
+            start_worker(
+                app,
+                pool="solo",
+                queues=[critical_queue(), "celery", standard_queue()],
+                perform_ping_check=False,
+                shutdown_timeout=60,
+            )
+        )
+        stack.enter_context(
+            start_worker(
+                app,
+                pool="solo",
+                queues=[critical_queue()],
+                perform_ping_check=False,
+                shutdown_timeout=60,
+            )
+        )
+        for _ in range(backlog):
+            deliver.apply_async(
+                (Alert.LabelChoices.NORMAL, time.perf_counter()),
+                **options(Alert.LabelChoices.NORMAL),
+            )
+        for _ in range(thefts):
+            deliver.apply_async(
+                (Alert.LabelChoices.THEFT, time.perf_counter()),
+                **options(Alert.LabelChoices.THEFT),
+            )
+            time.sleep(theft_interval)
+        while len(latencies) < thefts:
+            time.sleep(0.01)
+        # what is left of the backlog is not part of the next run
+        app.control.purge()
+
+    return {
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> None:
+    global service_time
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backlogs", type=int, nargs="+", default=[0, 250, 1000])
+    parser.add_argument("--thefts", type=int, default=100)
+    parser.add_argument("--theft-interval-ms", type=float, default=10)
+    parser.add_argument("--service-ms", type=float, default=5)
+    args = parser.parse_args()
+    service_time = args.service_ms / 1000
+
+    print(f"{'routing':<8} {'backlog':>8} {'theft p50 ms':>13} {'theft p99 ms':>13}")
+    for routed in (False, True):
+        for backlog in args.backlogs:
+            result = run(routed, backlog, args.thefts, args.theft_interval_ms / 1000)
+            print(
+                f"{'routed' if routed else 'shared':<8} {backlog:>8} "
+                f"{result['p50']:>13.1f} {result['p99']:>13.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
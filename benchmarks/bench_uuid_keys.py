@@ -0,0 +1,188 @@
+"""
+Benchmark of random (uuid4) against time-ordered (notifications.ids.uuid7)
+primary keys: insert throughput and primary key index of a notification-like
+table as it grows to --rows rows.
+
+For each kind of key, a scratch table with the columns of a notification is
+created and filled by multi-row INSERTs of --batch-size rows, as the fan-out
+does (one alert per batch). The key generation is timed apart from the
+INSERTs. It reports:
+
+  rows/s first/last  insert throughput over the first and the last tenth of
+                     the rows, the index outgrows shared_buffers in between
+  index MB           size of the primary key index
+  leaf density       average fill of its leaf pages (pgstattuple, when the
+                     extension can be created)
+  blocks read        index blocks read from outside shared_buffers
+  WAL MB             WAL written, full page images of the touched pages
+                     included
+  gen us/key         time to generate one key in Python
+
+Usage: DATABASE_URL=postgresql://... python benchmarks/bench_uuid_keys.py
+       [--rows 10000000] [--batch-size 1000] [--profiles 500] [--keep]
+
+Needs PostgreSQL. The bench_keys_* tables are dropped at the end, unless
+--keep. Expect a few minutes per 10M rows.
+"""
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from psycopg2.extras import execute_values  # noqa: E402
+
+from notifications.ids import uuid7  # noqa: E402
+
+KEYS: dict[str, Callable[[], uuid.UUID]] = {"uuid4": uuid.uuid4, "uuid7": uuid7}
+COLUMNS = "id, alert_id, user_profile_id, channel, status, created"
+
+
+def create_table(cursor, table: str) -> None:
+    cursor.execute(f'DROP TABLE IF EXISTS "{table}"')
+    cursor.execute(
+        f'CREATE TABLE "{table}" (id uuid PRIMARY KEY, alert_id uuid NOT NULL, '
+        f"user_profile_id uuid NOT NULL, channel varchar(20) NOT NULL, "
+        f"status varchar(20) NOT NULL, created timestamptz NOT NULL)"
+    )
+
+
+def index_stats(cursor, index: str) -> tuple[int, int]:
+    """Blocks of the index read from outside shared_buffers, and hit."""
+    cursor.execute("SELECT pg_stat_force_next_flush()")
+    cursor.execute(
+        "SELECT idx_blks_read, idx_blks_hit FROM pg_statio_user_indexes "
+        "WHERE indexrelid = %s::regclass",
+        [index],
+    )
+    read, hit = cursor.fetchone()
+    return read or 0, hit or 0
+
+
+def wal_position(cursor) -> str:
+    cursor.execute("SELECT pg_current_wal_insert_lsn()")
+    return cursor.fetchone()[0]
+
+
+def leaf_density(cursor, index: str) -> float | None:
+    try:
+        cursor.execute("CREATE EXTENSION IF NOT EXISTS pgstattuple")
+        cursor.execute("SELECT avg_leaf_density FROM pgstatindex(%s)", [index])
+    except Exception:
+        return None
+    return cursor.fetchone()[0]
+
+
+def run(
+    cursor, kind: str, rows: int, batch_size: int, profiles: list[uuid.UUID]
+) -> dict:
+    generate = KEYS[kind]
+    table = f"bench_keys_{kind}"
+    index = f"{table}_pkey"
+    create_table(cursor, table)
+    cursor.execute("CHECKPOINT")
+    wal_start = wal_position(cursor)
+    blocks_start = index_stats(cursor, index)
+
+    tenth = max(rows // 10, batch_size)
+    # insert time of the rows of each tenth
+    elapsed = [0.0] * 10
+    generation = 0.0
+    now = datetime.now(timezone.utc)
+    for start in range(0, rows, batch_size):
+        size = min(batch_size, rows - start)
+        alert = uuid.uuid4()
+        began = time.perf_counter()
+        keys = [generate() for _ in range(size)]
+        generation += time.perf_counter() - began
+        values = [
+            (key, alert, profiles[i % len(profiles)], "webhook", "pending", now)
+            for i, key in enumerate(keys)
+        ]
+        began = time.perf_counter()
+        execute_values(
+            cursor,
+            f'INSERT INTO "{table}" ({COLUMNS}) VALUES %s',
+            values,
+            page_size=batch_size,
+        )
+        elapsed[min(start // tenth, 9)] += time.perf_counter() - began
+        if start // batch_size % 1000 == 999:
+            print(f"  {kind}: {start + size:,} rows", file=sys.stderr)
+
+    blocks_end = index_stats(cursor, index)
+    cursor.execute(
+        "SELECT pg_wal_lsn_diff(pg_current_wal_insert_lsn(), %s), "
+        "pg_relation_size(%s::regclass), pg_relation_size(%s::regclass)",
+        [wal_start, index, table],
+    )
+    wal, index_size, table_size = cursor.fetchone()
+    last = rows - 9 * tenth
+    return {
+        "rows_per_s": rows / sum(elapsed),
+        "first_rows_per_s": tenth / elapsed[0],
+        "last_rows_per_s": last / elapsed[9],
+        "index_mb": index_size / 2**20,
+        "table_mb": table_size / 2**20,
+        "leaf_density": leaf_density(cursor, index),
+        "blocks_read": blocks_end[0] - blocks_start[0],
+        "blocks_hit": blocks_end[1] - blocks_start[1],
+        "wal_mb": float(wal) / 2**20,
+        "gen_us": generation / rows * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--profiles", type=int, default=500)
+    parser.add_argument("--keep", action="store_true")
+    args = parser.parse_args()
+    if connection.vendor != "postgresql":
+        sys.exit("PostgreSQL is needed, set DATABASE_URL")
+
+    profiles = [uuid7() for _ in range(args.profiles)]
+    connection.ensure_connection()
+    cursor = connection.connection.cursor()
+    cursor.execute("SHOW shared_buffers")
+    print(f"{args.rows:,} rows per key, shared_buffers {cursor.fetchone()[0]}")
+    results = {}
+    try:
+        for kind in KEYS:
+            results[kind] = run(cursor, kind, args.rows, args.batch_size, profiles)
+    finally:
+        if not args.keep:
+            for kind in KEYS:
+                cursor.execute(f'DROP TABLE IF EXISTS "bench_keys_{kind}"')
+
+    print(
+        f"{'key':<6} {'rows/s':>9} {'first':>9} {'last':>9} {'index MB':>9} "
+        f"{'leaf %':>7} {'blocks read':>12} {'WAL MB':>8} {'gen us/key':>11}"
+    )
+    for kind, result in results.items():
+        density = result["leaf_density"]
+        print(
+            f"{kind:<6} {result['rows_per_s']:>9,.0f} "
+            f"{result['first_rows_per_s']:>9,.0f} {result['last_rows_per_s']:>9,.0f} "
+            f"{result['index_mb']:>9.1f} "
+            f"{'-' if density is None else f'{density:.1f}':>7} "
+            f"{result['blocks_read']:>12,} {result['wal_mb']:>8.1f} "
+            f"{result['gen_us']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Settings of the processes started by bench_end_to_end.py: the project's,
+plus a count of the SQL queries of each process, added up in Redis under
+bench:queries:<BENCH_COMPONENT> (web, relay, worker or beat).
+"""
+
+import os
+import threading
+import time
+
+import redis
+from django.db.backends.signals import connection_created
+
+from config.settings import *  # noqa: F401,F403
+
+QUERY_COUNT_KEY = "bench:queries"
+FLUSH_INTERVAL = 0.2
+
+_client = redis.Redis.from_url(os.environ["BENCH_REDIS_URL"])
+_key = f"{QUERY_COUNT_KEY}:{os.environ['BENCH_COMPONENT']}"
+_lock = threading.Lock()
+_pending = 0
+
+
+def _count(execute, sql, params, many, context):
+    global _pending
+    with _lock:
+        _pending += 1
+    return execute(sql, params, many, context)
+
+
+def _flush_forever() -> None:
+    global _pending
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        with _lock:
+            count, _pending = _pending, 0
+        if count:
+            _client.incrby(_key, count)
+
+
+def _start_flusher() -> None:
+    global _pending
+    # forked workers: the parent's count is its own
+    _pending = 0
+    threading.Thread(target=_flush_forever, daemon=True).start()
+
+
+def _install(sender, connection, **kwargs) -> None:
+    # the signal fires again on each reconnection of the same wrapper
+    if _count not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count)
+
+
+connection_created.connect(_install)
+_start_flusher()
+os.register_at_fork(after_in_child=_start_flusher)
@@ -0,0 +1,120 @@
+"""
+Local webhook receiver for the benchmarks: accepts the notifications of the
+dispatcher (NOTIFICATION_WEBHOOK_URL=http://127.0.0.1:9000/webhook/) and
+records when each one landed.
+
+Every POST waits --latency-ms (plus up to --jitter-ms), then answers 429 with
+Retry-After for --throttle-rate of the requests, 503 for --error-rate of them,
+and 200 otherwise. Only 200s are recorded as delivered, one per alert of a
+digest.
+
+  GET /stats   {"responses": {"200": n, ...}, "deliveries": [[alert_uuid,
+               target_user_id, received_at], ...]}, received_at in UNIX seconds
+  POST /reset  forgets everything
+
+Usage: python benchmarks/webhook_sink.py [--port 9000] [--latency-ms 20]
+       [--jitter-ms 0] [--error-rate 0] [--throttle-rate 0]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from typing import Any
+
+import uvicorn
+
+
+class WebhookSink:
+    """ASGI application, no framework: the sink must not be the bottleneck."""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        retry_after: int = 1,
+    ) -> None:
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.responses: Counter[int] = Counter()
+        self.deliveries: list[tuple[str, str, float]] = []
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        if scope["method"] == "GET" and scope["path"] == "/stats":
+            stats = {"responses": self.responses, "deliveries": self.deliveries}
+            return await self._respond(send, 200, json.dumps(stats).encode())
+        if scope["method"] == "POST" and scope["path"] == "/reset":
+            self.responses.clear()
+            self.deliveries.clear()
+            return await self._respond(send, 200, b"OK")
+
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        draw = random.random()
+        if draw < self.throttle_rate:
+            status = 429
+        elif draw < self.throttle_rate + self.error_rate:
+            status = 503
+        else:
+            status = 200
+            self._record(json.loads(body), time.time())
+        self.responses[status] += 1
+        headers = [(b"retry-after", str(self.retry_after).encode())]
+        await self._respond(send, status, b"OK", headers if status == 429 else [])
+
+    def _record(self, payload: dict[str, Any], received_at: float) -> None:
+        user = payload["target_user_id"]
+        for alert in payload.get("alerts", [payload]):
+            self.deliveries.append((alert["alert_uuid"], user, received_at))
+
+    @staticmethod
+    async def _respond(
+        send: Any, status: int, body: bytes, headers: list | None = None
+    ) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-length", str(len(body)).encode())]
+                + (headers or []),
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    sink = WebhookSink(
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+    )
+    uvicorn.run(
+        sink, host=args.host, port=args.port, lifespan="off", log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 
@@ -47,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # outermost: times the alert webhooks as answered
+    "notifications.metrics.metrics_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -79,8 +82,13 @@ WSGI_APPLICATION = "config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# persistent connections are per thread: under ASGI, where sync code runs in
+# a thread per request, set DATABASE_CONN_MAX_AGE=0 (or use a pooler)
 DATABASES = {
-    "default": dj_database_url.config(conn_max_age=600, conn_health_checks=True)
+    "default": dj_database_url.config(
+        conn_max_age=int(os.getenv("DATABASE_CONN_MAX_AGE", "600")),
+        conn_health_checks=True,
+    )
 }
 
 
@@ -142,5 +150,222 @@ CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = TIME_ZONE
 
-CELERY_TASK_ALWAYS_EAGER = True
+# tasks run in the calling process (tests, runserver without a broker), the
+# compose services set it to false so that workers consume the broker
+CELERY_TASK_ALWAYS_EAGER = (
+    os.getenv("CELERY_TASK_ALWAYS_EAGER", "true").lower() == "true"
+)
 CELERY_TASK_EAGER_PROPAGATES = True
+
+# notification tasks of critical (theft) alerts have their own queue, see
+# notifications.priority, workers list it first: -Q notifications.critical,...
+NOTIFICATION_CRITICAL_QUEUE = os.getenv(
+    "NOTIFICATION_CRITICAL_QUEUE", "notifications.critical"
+)
+NOTIFICATION_STANDARD_QUEUE = os.getenv("NOTIFICATION_STANDARD_QUEUE", "notifications")
+# order the messages of a queue by alert label with Redis broker priorities
+NOTIFICATION_BROKER_PRIORITIES = (
+    os.getenv("NOTIFICATION_BROKER_PRIORITIES", "false").lower() == "true"
+)
+if NOTIFICATION_BROKER_PRIORITIES:
+    CELERY_BROKER_TRANSPORT_OPTIONS = {
+        # one Redis list per priority 0-9, queues consumed in the -Q order
+        "priority_steps": list(range(10)),
+        "sep": ":",
+        "queue_order_strategy": "priority",
+    }
+    # prefetched messages would skip the priorities
+    CELERY_WORKER_PREFETCH_MULTIPLIER = 1
+
+# Notifications
+# max number of alerts validated and upserted together by the batch endpoint
+NOTIFICATION_ALERT_BATCH_CHUNK_SIZE = int(
+    os.getenv("NOTIFICATION_ALERT_BATCH_CHUNK_SIZE", "500")
+)
+
+# alerts ingested recently, an exact re-delivery within the TTL is acknowledged
+# without touching the database (local LRU, plus Redis when configured)
+NOTIFICATION_SEEN_ALERTS_SIZE = int(
+    os.getenv("NOTIFICATION_SEEN_ALERTS_SIZE", "100000")
+)
+NOTIFICATION_SEEN_ALERTS_TTL = float(os.getenv("NOTIFICATION_SEEN_ALERTS_TTL", "3600"))
+
+# outgoing webhooks
+NOTIFICATION_WEBHOOK_URL = os.getenv(
+    "NOTIFICATION_WEBHOOK_URL",
+    "http://host.docker.internal:9000/webhook/notifications/",
+)
+# fake a successful delivery instead of posting, as long as there is no receiver
+NOTIFICATION_WEBHOOK_DRY_RUN = (
+    os.getenv("NOTIFICATION_WEBHOOK_DRY_RUN", "true").lower() == "true"
+)
+NOTIFICATION_WEBHOOK_TIMEOUT = float(os.getenv("NOTIFICATION_WEBHOOK_TIMEOUT", "10"))
+NOTIFICATION_WEBHOOK_MAX_CONNECTIONS_PER_HOST = int(
+    os.getenv("NOTIFICATION_WEBHOOK_MAX_CONNECTIONS_PER_HOST", "20")
+)
+NOTIFICATION_WEBHOOK_KEEPALIVE_EXPIRY = float(
+    os.getenv("NOTIFICATION_WEBHOOK_KEEPALIVE_EXPIRY", "30")
+)
+# requires the `h2` package (httpx[http2])
+NOTIFICATION_WEBHOOK_HTTP2 = (
+    os.getenv("NOTIFICATION_WEBHOOK_HTTP2", "false").lower() == "true"
+)
+# AIMD floor of the concurrent deliveries to a host, see notifications.health
+NOTIFICATION_WEBHOOK_MIN_CONNECTIONS_PER_HOST = int(
+    os.getenv("NOTIFICATION_WEBHOOK_MIN_CONNECTIONS_PER_HOST", "1")
+)
+# consecutive failures (timeout, 5xx, 429) opening the circuit of a destination,
+# deliveries to it are then deferred for the cooldown (seconds)
+NOTIFICATION_CIRCUIT_FAILURE_THRESHOLD = int(
+    os.getenv("NOTIFICATION_CIRCUIT_FAILURE_THRESHOLD", "5")
+)
+NOTIFICATION_CIRCUIT_COOLDOWN = float(os.getenv("NOTIFICATION_CIRCUIT_COOLDOWN", "30"))
+# requests per second and burst allowed per destination host, e.g.
+# {"hooks.example.com": [50, 100]}, others use the default rate (0 = unlimited)
+NOTIFICATION_WEBHOOK_RATE_LIMITS = json.loads(
+    os.getenv("NOTIFICATION_WEBHOOK_RATE_LIMITS", "{}")
+)
+NOTIFICATION_WEBHOOK_DEFAULT_RATE = float(
+    os.getenv("NOTIFICATION_WEBHOOK_DEFAULT_RATE", "0")
+)
+NOTIFICATION_WEBHOOK_DEFAULT_BURST = int(
+    os.getenv("NOTIFICATION_WEBHOOK_DEFAULT_BURST", "0")
+)
+# seconds an async delivery may wait for a token before being deferred
+NOTIFICATION_RATE_LIMIT_MAX_WAIT = float(
+    os.getenv("NOTIFICATION_RATE_LIMIT_MAX_WAIT", "1")
+)
+# max concurrent deliveries driven by the asyncio dispatcher in one process
+NOTIFICATION_ASYNC_MAX_IN_FLIGHT = int(
+    os.getenv("NOTIFICATION_ASYNC_MAX_IN_FLIGHT", "200")
+)
+# threads (and database connections) per process running the transactions of
+# the async alert webhook, 0 runs them in a new thread per request
+NOTIFICATION_ASYNC_DB_THREADS = int(os.getenv("NOTIFICATION_ASYNC_DB_THREADS", "0"))
+# notifications delivered by one send_notification_batch task
+NOTIFICATION_SEND_BATCH_SIZE = int(os.getenv("NOTIFICATION_SEND_BATCH_SIZE", "50"))
+
+# retries are scheduled on the notification row and picked up by the sweeper
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "6"))
+NOTIFICATION_RETRY_BASE_DELAY = float(os.getenv("NOTIFICATION_RETRY_BASE_DELAY", "30"))
+NOTIFICATION_RETRY_MAX_DELAY = float(os.getenv("NOTIFICATION_RETRY_MAX_DELAY", "3600"))
+# an enqueued delivery is delivered again if not recorded within the lease (seconds)
+NOTIFICATION_DELIVERY_LEASE = float(os.getenv("NOTIFICATION_DELIVERY_LEASE", "600"))
+NOTIFICATION_SWEEP_INTERVAL = float(os.getenv("NOTIFICATION_SWEEP_INTERVAL", "30"))
+# batches of NOTIFICATION_SEND_BATCH_SIZE claimed by one sweep at most
+NOTIFICATION_SWEEP_MAX_BATCHES = int(os.getenv("NOTIFICATION_SWEEP_MAX_BATCHES", "100"))
+
+# standard alerts of profiles in digest mode are delivered together every N seconds
+NOTIFICATION_DIGEST_WINDOW = float(os.getenv("NOTIFICATION_DIGEST_WINDOW", "300"))
+
+# the fan-out of ingested alerts goes through the outbox, see notifications.outbox:
+# messages published per relay batch, seconds the relay sleeps once drained,
+# and seconds published messages are kept before being pruned
+NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.getenv("NOTIFICATION_OUTBOX_BATCH_SIZE", "500"))
+NOTIFICATION_OUTBOX_POLL_INTERVAL = float(
+    os.getenv("NOTIFICATION_OUTBOX_POLL_INTERVAL", "0.1")
+)
+NOTIFICATION_OUTBOX_RETENTION = float(
+    os.getenv("NOTIFICATION_OUTBOX_RETENTION", "86400")
+)
+
+# detection-to-delivery latency rollups, see notifications.latency: seconds
+# between runs, age of the sent notifications they wait for, and retention
+NOTIFICATION_LATENCY_ROLLUP_INTERVAL = float(
+    os.getenv("NOTIFICATION_LATENCY_ROLLUP_INTERVAL", "60")
+)
+NOTIFICATION_LATENCY_ROLLUP_DELAY = float(
+    os.getenv("NOTIFICATION_LATENCY_ROLLUP_DELAY", "30")
+)
+NOTIFICATION_LATENCY_ROLLUP_RETENTION = float(
+    os.getenv("NOTIFICATION_LATENCY_ROLLUP_RETENTION", "604800")
+)
+
+# delivery attempt log (DeliveryAttempt): bytes of the response or error kept
+# per attempt, zlib compression of that body, and seconds attempts are kept
+# before being pruned every NOTIFICATION_ATTEMPT_PRUNE_INTERVAL seconds
+NOTIFICATION_ATTEMPT_BODY_LIMIT = int(
+    os.getenv("NOTIFICATION_ATTEMPT_BODY_LIMIT", "1024")
+)
+NOTIFICATION_ATTEMPT_BODY_COMPRESSION = (
+    os.getenv("NOTIFICATION_ATTEMPT_BODY_COMPRESSION", "false").lower() == "true"
+)
+NOTIFICATION_ATTEMPT_RETENTION = float(
+    os.getenv("NOTIFICATION_ATTEMPT_RETENTION", "2592000")
+)
+NOTIFICATION_ATTEMPT_PRUNE_INTERVAL = float(
+    os.getenv("NOTIFICATION_ATTEMPT_PRUNE_INTERVAL", "3600")
+)
+
+# monthly partitions of the alert and notification tables on PostgreSQL, see
+# notifications.partitions: months created ahead, months kept (0 keeps them
+# all) before being archived to NOTIFICATION_ARCHIVE_DIR and dropped, days a
+# restored partition is kept before being archived again, and seconds between
+# maintenance runs
+NOTIFICATION_PARTITION_PREMAKE = int(os.getenv("NOTIFICATION_PARTITION_PREMAKE", "3"))
+NOTIFICATION_PARTITION_RETENTION = int(
+    os.getenv("NOTIFICATION_PARTITION_RETENTION", "12")
+)
+NOTIFICATION_PARTITION_RESTORE_DAYS = int(
+    os.getenv("NOTIFICATION_PARTITION_RESTORE_DAYS", "7")
+)
+NOTIFICATION_PARTITION_MAINTENANCE_INTERVAL = float(
+    os.getenv("NOTIFICATION_PARTITION_MAINTENANCE_INTERVAL", "3600")
+)
+NOTIFICATION_ARCHIVE_DIR = os.getenv(
+    "NOTIFICATION_ARCHIVE_DIR", str(BASE_DIR / "archive")
+)
+
+CELERY_BEAT_SCHEDULE = {
+    "sweep-due-notifications": {
+        "task": "notifications.tasks.sweep_due_notifications",
+        "schedule": NOTIFICATION_SWEEP_INTERVAL,
+    },
+    "rollup-delivery-latency": {
+        "task": "notifications.tasks.rollup_delivery_latency",
+        "schedule": NOTIFICATION_LATENCY_ROLLUP_INTERVAL,
+    },
+    "prune-delivery-attempts": {
+        "task": "notifications.tasks.prune_delivery_attempts",
+        "schedule": NOTIFICATION_ATTEMPT_PRUNE_INTERVAL,
+    },
+    "maintain-partitions": {
+        "task": "notifications.tasks.maintain_partitions",
+        "schedule": NOTIFICATION_PARTITION_MAINTENANCE_INTERVAL,
+    },
+}
+
+# delivery states are buffered in the worker and written with one UPDATE every
+# N states or T milliseconds, 1 writes each task's outcomes right away
+NOTIFICATION_STATE_FLUSH_SIZE = int(os.getenv("NOTIFICATION_STATE_FLUSH_SIZE", "1"))
+NOTIFICATION_STATE_FLUSH_INTERVAL_MS = int(
+    os.getenv("NOTIFICATION_STATE_FLUSH_INTERVAL_MS", "200")
+)
+
+# shared Redis for the caches of the notifications app, process-local caches only if unset
+NOTIFICATION_REDIS_URL = os.getenv("NOTIFICATION_REDIS_URL")
+# subscribers of a store cached by each worker for fan-out
+NOTIFICATION_ROUTING_CACHE_SIZE = int(
+    os.getenv("NOTIFICATION_ROUTING_CACHE_SIZE", "10000")
+)
+NOTIFICATION_ROUTING_CACHE_TTL = float(
+    os.getenv("NOTIFICATION_ROUTING_CACHE_TTL", "300")
+)
+# alert part of the outgoing payloads, encoded once per alert
+NOTIFICATION_PAYLOAD_CACHE_SIZE = int(
+    os.getenv("NOTIFICATION_PAYLOAD_CACHE_SIZE", "10000")
+)
+NOTIFICATION_PAYLOAD_CACHE_TTL = float(
+    os.getenv("NOTIFICATION_PAYLOAD_CACHE_TTL", "3600")
+)
+# validate single alerts with notifications.validation instead of the DRF serializer
+NOTIFICATION_ALERT_FAST_VALIDATION = (
+    os.getenv("NOTIFICATION_ALERT_FAST_VALIDATION", "false").lower() == "true"
+)
+# stores known by the ingestion path, see notifications.stores
+NOTIFICATION_STORE_CACHE_SIZE = int(os.getenv("NOTIFICATION_STORE_CACHE_SIZE", "10000"))
+NOTIFICATION_STORE_CACHE_TTL = float(os.getenv("NOTIFICATION_STORE_CACHE_TTL", "3600"))
+
+# Prometheus metrics (notifications.metrics): set PROMETHEUS_MULTIPROC_DIR
+# under gunicorn and Celery prefork, workers serve theirs on this port
+NOTIFICATION_METRICS_PORT = int(os.getenv("NOTIFICATION_METRICS_PORT", "0"))
@@ -0,0 +1,11 @@
+"""Settings of the test suite, selected by `manage.py test`."""
+
+from .settings import *  # noqa: F401,F403
+from .settings import NOTIFICATION_REDIS_URL
+
+# The Redis of the environment (the compose services set
+# NOTIFICATION_REDIS_URL) would share circuits, buckets and cached entries
+# between tests: the suite runs without it, and the tests of the Redis-backed
+# code opt in with NOTIFICATION_TEST_REDIS_URL, skipped when it is not set.
+NOTIFICATION_TEST_REDIS_URL = NOTIFICATION_REDIS_URL
+NOTIFICATION_REDIS_URL = None
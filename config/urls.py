@@ -18,7 +18,10 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from notifications.views import metrics_view
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/v1/notifications/", include("notifications.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
@@ -0,0 +1,21 @@
+"""
+Gunicorn hooks, loaded from the working directory: the multiprocess
+Prometheus metrics of the workers (see notifications.metrics).
+"""
+
+import os
+import shutil
+
+
+def on_starting(server):
+    # counters of the previous run would be added to the new ones
+    if path := os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,37 @@
+import zlib
+from typing import NamedTuple
+
+from django.conf import settings
+
+# Bodies of the delivery attempt log (DeliveryAttempt): the response of a
+# destination, or the error of a failed attempt, truncated to
+# NOTIFICATION_ATTEMPT_BODY_LIMIT bytes and, with
+# NOTIFICATION_ATTEMPT_BODY_COMPRESSION, compressed with zlib when that is
+# smaller. Imported by the models, this module does not import them.
+
+
+class EncodedBody(NamedTuple):
+    data: bytes
+    truncated: bool
+    compressed: bool
+
+
+def body_limit() -> int:
+    return getattr(settings, "NOTIFICATION_ATTEMPT_BODY_LIMIT", 1024)
+
+
+def encode_body(text: str) -> EncodedBody:
+    data = text.encode()
+    truncated = len(data) > body_limit()
+    if truncated:
+        # cut on a character boundary
+        data = data[: body_limit()].decode(errors="ignore").encode()
+    if getattr(settings, "NOTIFICATION_ATTEMPT_BODY_COMPRESSION", False):
+        compressed = zlib.compress(data)
+        if len(compressed) < len(data):
+            return EncodedBody(compressed, truncated, True)
+    return EncodedBody(data, truncated, False)
+
+
+def decode_body(data: bytes, compressed: bool) -> str:
+    return (zlib.decompress(data) if compressed else bytes(data)).decode()
@@ -0,0 +1,84 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Generic, TypeVar
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class LocalTTLCache(Generic[K, V]):
+    """Thread-safe in-process cache with LRU eviction and a per-entry TTL."""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: K) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+
+_redis_client: redis.Redis | None = None
+_redis_pid: int | None = None
+
+
+def get_redis() -> redis.Redis | None:
+    """
+    Shared Redis client for the caches of this app, one per process.
+    Returns None when NOTIFICATION_REDIS_URL is not set: caches are then
+    process-local only.
+    """
+    global _redis_client, _redis_pid
+    if not (url := getattr(settings, "NOTIFICATION_REDIS_URL", None)):
+        return None
+    if _redis_client is None or _redis_pid != os.getpid():
+        _redis_client = redis.Redis.from_url(
+            url, socket_timeout=1.0, socket_connect_timeout=1.0
+        )
+        _redis_pid = os.getpid()
+    return _redis_client
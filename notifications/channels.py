@@ -1,17 +1,29 @@
+import asyncio
+import importlib.util
 import logging
+import os
+import threading
+import time
+import weakref
 from abc import abstractmethod
+from contextlib import AbstractAsyncContextManager, nullcontext
+from dataclasses import dataclass
 from typing import Any, Protocol
+from urllib.parse import urlsplit
 
 import httpx
 from django.conf import settings
 
 from notifications.exceptions import (
+    NotificationDeferredError,
     NotificationPermanentError,
     NotificationRetryableError,
 )
-from notifications.serializers import OutgoingNotificationSerializer
 
+from .health import AdaptiveConcurrencyLimit, CircuitBreaker, circuit_breaker
+from .metrics import observe_delivery
 from .models import ChannelChoices, Notification
+from .ratelimit import RateLimiter, rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -27,86 +39,514 @@ class NotificationSendingStrategy(Protocol):
     # TODO: webhook for each user profile, same for email and sms
 
     @abstractmethod
-    def send(self, notification: Notification, payload: dict[str, Any]) -> None:
+    def send(self, notification: Notification, payload: bytes) -> str | None:
         """
-        Sends the notification, mutates notification.status/response_data.
-        Should return None on success.
+        Sends the notification, payload is the JSON body built by
+        notifications.payloads. The caller records the outcome.
+        Should return the response data on success, None if nothing was sent.
         Should raise:
           - NotificationRetryableError for transient errors (task.retry)
           - NotificationPermanentError for permanent failures (no retry)
         """
 
 
-class WebhookChannelStrategy:
-    """Strategy for sending notifications via a webhook."""
-
-    def send(self, notification: Notification, payload: dict[str, Any]) -> None:
-        webhook_url = getattr(
-            settings,
-            "NOTIFICATION_WEBHOOK_URL",
-            # TODO: this should be as a setting in the DB for each user profile
-            "http://host.docker.internal:9000/webhook/notifications/",
+# payloads are pre-encoded, see notifications.payloads
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def get_webhook_url() -> str:
+    return getattr(
+        settings,
+        "NOTIFICATION_WEBHOOK_URL",
+        # TODO: this should be as a setting in the DB for each user profile
+        "http://host.docker.internal:9000/webhook/notifications/",
+    )
+
+
+def get_webhook_client_options() -> dict[str, Any]:
+    """Timeout, per-host limits and protocol shared by the sync and async clients."""
+    max_connections = getattr(
+        settings, "NOTIFICATION_WEBHOOK_MAX_CONNECTIONS_PER_HOST", 20
+    )
+    http2 = getattr(settings, "NOTIFICATION_WEBHOOK_HTTP2", False)
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning("HTTP/2 requested but 'h2' is not installed, using HTTP/1.1")
+        http2 = False
+    return {
+        "timeout": getattr(settings, "NOTIFICATION_WEBHOOK_TIMEOUT", 10.0),
+        "limits": httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=getattr(
+                settings, "NOTIFICATION_WEBHOOK_KEEPALIVE_EXPIRY", 30.0
+            ),
+        ),
+        "http2": http2,
+    }
+
+
+class DeliveryResponse(str):
+    """Response data returned by a strategy, with the HTTP status it came with."""
+
+    status_code: int | None
+
+    def __new__(cls, text: str, status_code: int | None = None) -> "DeliveryResponse":
+        response = super().__new__(cls, text)
+        response.status_code = status_code
+        return response
+
+
+def raise_for_webhook_status(response: httpx.Response) -> DeliveryResponse:
+    """
+    Maps an HTTP error status to a retryable or permanent notification error,
+    returns the response data of a success.
+    """
+    try:
+        response.raise_for_status()
+    except httpx.HTTPStatusError as e:
+        # 4xx → permanent; 5xx, 429 → retryable
+        status = e.response.status_code
+        msg = f"{status}: {e.response.text[:200]}"
+        if 500 <= status < 600 or status == 429:
+            raise NotificationRetryableError(msg, status_code=status) from e
+        else:
+            raise NotificationPermanentError(msg, status_code=status) from e
+    return DeliveryResponse(response.text, response.status_code)
+
+
+def is_destination_failure(response: httpx.Response | None) -> bool:
+    """
+    Whether the outcome says the destination is unhealthy: no response
+    (timeout, connection error), a 5xx or a 429. Other 4xx reject the payload.
+    """
+    return (
+        response is None or response.status_code >= 500 or response.status_code == 429
+    )
+
+
+def check_circuit(breaker: CircuitBreaker, destination: str) -> None:
+    """Defers the delivery, before any I/O, while the destination's circuit is open."""
+    if (retry_after := breaker.check(destination)) is not None:
+        raise NotificationDeferredError(
+            f"Circuit open for {destination}", retry_after=retry_after
         )
+
+
+def reserve_rate_limit(
+    limiter: RateLimiter, destination: str, max_wait: float = 0.0
+) -> float:
+    """
+    Takes a token of the destination's rate limit, returns the seconds to wait
+    before sending. Defers the delivery when no token is available in max_wait.
+    """
+    reservation = limiter.reserve(destination, max_wait)
+    if not reservation.granted:
+        raise NotificationDeferredError(
+            f"Rate limited by {destination}", retry_after=reservation.wait
+        )
+    return reservation.wait
+
+
+class AsyncNotificationSendingStrategy(Protocol):
+    """Async variant of NotificationSendingStrategy, driven by an event loop."""
+
+    @abstractmethod
+    async def send(
+        self,
+        notification: Notification,
+        payload: bytes,
+        slot: AbstractAsyncContextManager[Any] | None = None,
+    ) -> str:
+        """
+        Sends the notification without touching the database (the ORM is
+        sync-only), the caller records the outcome. slot, a slot of the
+        caller's own bound on in-flight deliveries, is only entered once the
+        destination admits the delivery: deliveries waiting on a slow
+        destination do not hold the slots of the others.
+        Should return the response data on success.
+        Should raise:
+          - NotificationRetryableError for transient errors (retry)
+          - NotificationPermanentError for permanent failures (no retry)
+        """
+
+
+@dataclass
+class HostPoolStats:
+    requests: int = 0
+    connections_opened: int = 0
+    connections_reused: int = 0
+    in_flight: int = 0
+
+
+class WebhookClientPool:
+    """
+    Process-wide pool of keep-alive HTTP clients, one per destination host,
+    so that deliveries reuse TCP/TLS connections instead of opening new ones.
+
+    Clients are created lazily and are bound to the process that created them:
+    after a fork (e.g. a Celery prefork child) the inherited clients are dropped
+    and new ones are built on first use.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport | None = None) -> None:
+        # transport is only meant to be overridden in tests (httpx.MockTransport)
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._clients: dict[str, httpx.Client] = {}
+        self._stats: dict[str, HostPoolStats] = {}
+
+    def reset(self) -> None:
+        """
+        Forgets every client without closing it: right after a fork the
+        sockets are shared with the parent process, which still owns them.
+        """
+        with self._lock:
+            self._pid = os.getpid()
+            self._clients = {}
+            self._stats = {}
+
+    def close(self) -> None:
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+
+    def _build_client(self) -> httpx.Client:
+        return httpx.Client(transport=self._transport, **get_webhook_client_options())
+
+    def get_client(self, url: str) -> tuple[httpx.Client, HostPoolStats]:
+        host = urlsplit(url).netloc
+        if self._pid != os.getpid():
+            self.reset()
+        with self._lock:
+            if host not in self._clients:
+                self._clients[host] = self._build_client()
+                self._stats[host] = HostPoolStats()
+            return self._clients[host], self._stats[host]
+
+    def post(self, url: str, **kwargs: Any) -> httpx.Response:
+        client, stats = self.get_client(url)
+        opened = False
+
+        def trace(event: str, info: dict[str, Any]) -> None:
+            nonlocal opened
+            if event == "connection.connect_tcp.started":
+                opened = True
+
+        with self._lock:
+            stats.requests += 1
+            stats.in_flight += 1
+        try:
+            return client.post(url, extensions={"trace": trace}, **kwargs)
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+                if opened:
+                    stats.connections_opened += 1
+                else:
+                    stats.connections_reused += 1
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Per-host counters, meant to size the pool under load."""
+        with self._lock:
+            clients = dict(self._clients)
+            stats = {host: HostPoolStats(**vars(s)) for host, s in self._stats.items()}
+
+        limit = getattr(settings, "NOTIFICATION_WEBHOOK_MAX_CONNECTIONS_PER_HOST", 20)
+        result: dict[str, dict[str, int]] = {}
+        for host, host_stats in stats.items():
+            # httpx does not expose its pool publicly, fall back to 0 if it moves
+            pool = getattr(clients[host]._transport, "_pool", None)
+            connections = pool.connections if pool is not None else []
+            result[host] = {
+                **vars(host_stats),
+                "connections_open": len(connections),
+                "connections_idle": sum(c.is_idle() for c in connections),
+                "waiting": max(0, host_stats.in_flight - limit),
+            }
+        return result
+
+
+webhook_client_pool = WebhookClientPool()
+
+
+class WebhookChannelStrategy:
+    """
+    Strategy for sending notifications via a webhook.
+    Deliveries to a destination whose circuit is open, or that exceed its
+    rate limit, are deferred instead of blocking the worker.
+    """
+
+    def __init__(
+        self,
+        pool: WebhookClientPool = webhook_client_pool,
+        breaker: CircuitBreaker = circuit_breaker,
+        limiter: RateLimiter = rate_limiter,
+    ) -> None:
+        self.pool = pool
+        self.breaker = breaker
+        self.limiter = limiter
+
+    def send(self, notification: Notification, payload: bytes) -> str:
+        webhook_url = get_webhook_url()
         logger.info(
             f"WebhookStrategy: Sending notification {notification.notification_uuid} to {webhook_url}"
         )
-        serializer = OutgoingNotificationSerializer(data=payload)
-        if not serializer.is_valid():
-            msg = f"Invalid outgoing payload: {serializer.errors}"
-            notification.mark_failed(msg)
-            # permanent error—bad schema
-            raise NotificationPermanentError(msg)
+        if getattr(settings, "NOTIFICATION_WEBHOOK_DRY_RUN", False):
+            # no receiver in the dev stack, fake a successful delivery
+            return DeliveryResponse("OK", 200)
 
+        destination = urlsplit(webhook_url).netloc
+        check_circuit(self.breaker, destination)
+        reserve_rate_limit(self.limiter, destination)
+        response = None
         try:
-            with httpx.Client(timeout=10.0) as client:
-                # response = client.post(webhook_url, json=serializer.data)
-                # response.raise_for_status()
-                # TODO: fake response for testing
-                response = httpx.Response(status_code=200, content="OK")
-
+            response = self.pool.post(
+                webhook_url, content=payload, headers=JSON_HEADERS
+            )
         except httpx.RequestError as e:
             # network timeout / DNS failure / etc. → retry
             raise NotificationRetryableError(str(e)) from e
-        except httpx.HTTPStatusError as e:
-            # 4xx → permanent; 5xx → you could choose retryable
-            status = e.response.status_code
-            msg = f"{status}: {e.response.text[:200]}"
-            if 500 <= status < 600:
-                raise NotificationRetryableError(msg) from e
+        finally:
+            if is_destination_failure(response):
+                self.breaker.record_failure(destination)
             else:
-                raise NotificationPermanentError(msg) from e
+                self.breaker.record_success(destination)
 
-        # success → mark and return
-        notification.mark_sent(response.text)
+        return raise_for_webhook_status(response)
 
 
 class EmailChannelStrategy(NotificationSendingStrategy):
     """Strategy for sending notifications via email (Not Implemented)."""
 
-    def send(self, notification: Notification, payload: dict[str, Any]) -> None:
+    def send(self, notification: Notification, payload: bytes) -> None:
         logger.info(
             f"EmailStrategy: Sending notification {notification.notification_uuid} to user {notification.user.email} (Not Implemented)"
         )
-        notification.mark_pending()
 
 
 class SMSChannelStrategy(NotificationSendingStrategy):
     """Strategy for sending notifications via SMS (Not Implemented)."""
 
-    def send(self, notification: Notification, payload: dict[str, Any]) -> None:
+    def send(self, notification: Notification, payload: bytes) -> None:
         logger.info(
             f"SMSStrategy: Sending notification {notification.notification_uuid} to user (Not Implemented)"
         )
-        notification.mark_pending()
+
+
+class AsyncWebhookChannelStrategy:
+    """
+    Strategy for sending notifications via a webhook from an event loop.
+    Keeps one httpx.AsyncClient per destination host for each event loop,
+    with an AIMD limit of the concurrent deliveries to that host. Deliveries
+    to a destination whose circuit is open are deferred. A delivery over the
+    destination's rate limit waits in the loop if a token comes within
+    NOTIFICATION_RATE_LIMIT_MAX_WAIT, and is deferred otherwise.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport | None = None,
+        breaker: CircuitBreaker = circuit_breaker,
+        limiter: RateLimiter = rate_limiter,
+    ) -> None:
+        # transport is only meant to be overridden in tests (httpx.MockTransport)
+        self._transport = transport
+        self.breaker = breaker
+        self.limiter = limiter
+        self._clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]
+        ] = weakref.WeakKeyDictionary()
+        self._limits: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, AdaptiveConcurrencyLimit]
+        ] = weakref.WeakKeyDictionary()
+
+    def get_limit(self, destination: str) -> AdaptiveConcurrencyLimit:
+        limits = self._limits.setdefault(asyncio.get_running_loop(), {})
+        if destination not in limits:
+            limits[destination] = AdaptiveConcurrencyLimit(
+                max_limit=getattr(
+                    settings, "NOTIFICATION_WEBHOOK_MAX_CONNECTIONS_PER_HOST", 20
+                ),
+                min_limit=getattr(
+                    settings, "NOTIFICATION_WEBHOOK_MIN_CONNECTIONS_PER_HOST", 1
+                ),
+            )
+        return limits[destination]
+
+    def _get_client(self, url: str) -> httpx.AsyncClient:
+        clients = self._clients.setdefault(asyncio.get_running_loop(), {})
+        host = urlsplit(url).netloc
+        if host not in clients:
+            clients[host] = httpx.AsyncClient(
+                transport=self._transport, **get_webhook_client_options()
+            )
+        return clients[host]
+
+    async def aclose(self) -> None:
+        """Closes the clients bound to the running event loop."""
+        self._limits.pop(asyncio.get_running_loop(), None)
+        clients = self._clients.pop(asyncio.get_running_loop(), {})
+        for client in clients.values():
+            await client.aclose()
+
+    async def send(
+        self,
+        notification: Notification,
+        payload: bytes,
+        slot: AbstractAsyncContextManager[Any] | None = None,
+    ) -> str:
+        webhook_url = get_webhook_url()
+        logger.info(
+            f"AsyncWebhookStrategy: Sending notification {notification.notification_uuid} to {webhook_url}"
+        )
+        if getattr(settings, "NOTIFICATION_WEBHOOK_DRY_RUN", False):
+            # no receiver in the dev stack, fake a successful delivery
+            async with slot or nullcontext():
+                return DeliveryResponse("OK", 200)
+
+        destination = urlsplit(webhook_url).netloc
+        # the breaker and the limiter may be Redis round trips, which would
+        # block every delivery of the loop: they run in threads. A deferred
+        # delivery does not take a token
+        await asyncio.to_thread(check_circuit, self.breaker, destination)
+        wait = await asyncio.to_thread(
+            reserve_rate_limit,
+            self.limiter,
+            destination,
+            getattr(settings, "NOTIFICATION_RATE_LIMIT_MAX_WAIT", 1.0),
+        )
+        if wait:
+            # waiting here only holds a coroutine, not a worker
+            await asyncio.sleep(wait)
+
+        limit = self.get_limit(destination)
+        await limit.acquire()
+        healthy, response = None, None
+        try:
+            async with slot or nullcontext():
+                try:
+                    response = await self._get_client(webhook_url).post(
+                        webhook_url, content=payload, headers=JSON_HEADERS
+                    )
+                except httpx.RequestError as e:
+                    # network timeout / DNS failure / etc. → retry
+                    raise NotificationRetryableError(str(e)) from e
+                finally:
+                    healthy = not is_destination_failure(response)
+                    record = (
+                        self.breaker.record_success
+                        if healthy
+                        else self.breaker.record_failure
+                    )
+                    await asyncio.to_thread(record, destination)
+        finally:
+            await limit.release(healthy)
+
+        return raise_for_webhook_status(response)
+
+
+def get_destination(channel: str) -> str:
+    """Metrics label of where a channel delivers: the webhook host."""
+    if channel == ChannelChoices.WEBHOOK:
+        return urlsplit(get_webhook_url()).netloc
+    return channel
+
+
+def delivery_outcome(error: BaseException | None) -> str:
+    match error:
+        case None:
+            return "success"
+        case NotificationRetryableError():
+            return "retryable"
+        case NotificationPermanentError():
+            return "permanent"
+        case NotificationDeferredError():
+            return "deferred"
+    return "error"
+
+
+class InstrumentedStrategy:
+    """
+    Times the deliveries of a strategy per channel, destination and outcome
+    (see notifications.metrics). Other attributes are the strategy's.
+    """
+
+    def __init__(self, channel: str, strategy: NotificationSendingStrategy) -> None:
+        self.channel = channel
+        self.strategy = strategy
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.strategy, name)
+
+    def send(self, notification: Notification, payload: bytes) -> str | None:
+        start, error = time.perf_counter(), None
+        try:
+            return self.strategy.send(notification, payload)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            observe_delivery(
+                self.channel,
+                get_destination(self.channel),
+                delivery_outcome(error),
+                time.perf_counter() - start,
+            )
+
+
+class AsyncInstrumentedStrategy(InstrumentedStrategy):
+    """InstrumentedStrategy of an AsyncNotificationSendingStrategy."""
+
+    strategy: AsyncNotificationSendingStrategy
+
+    async def send(
+        self,
+        notification: Notification,
+        payload: bytes,
+        slot: AbstractAsyncContextManager[Any] | None = None,
+    ) -> str:
+        start, error = time.perf_counter(), None
+        try:
+            return await self.strategy.send(notification, payload, slot)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            observe_delivery(
+                self.channel,
+                get_destination(self.channel),
+                delivery_outcome(error),
+                time.perf_counter() - start,
+            )
 
 
 CHANNEL_REGISTRY: dict[str, NotificationSendingStrategy] = {
-    ChannelChoices.WEBHOOK: WebhookChannelStrategy(),
-    ChannelChoices.EMAIL: EmailChannelStrategy(),
-    ChannelChoices.SMS: SMSChannelStrategy(),
+    channel: InstrumentedStrategy(channel, strategy)
+    for channel, strategy in {
+        ChannelChoices.WEBHOOK: WebhookChannelStrategy(),
+        ChannelChoices.EMAIL: EmailChannelStrategy(),
+        ChannelChoices.SMS: SMSChannelStrategy(),
+    }.items()
+}
+
+
+# channels that can be delivered concurrently from an event loop
+ASYNC_CHANNEL_REGISTRY: dict[str, AsyncNotificationSendingStrategy] = {
+    ChannelChoices.WEBHOOK: AsyncInstrumentedStrategy(
+        ChannelChoices.WEBHOOK, AsyncWebhookChannelStrategy()
+    ),
 }
 
 
 def get_channel_strategy(channel_type: str) -> NotificationSendingStrategy | None:
     """Retrieves the appropriate channel strategy from the registry."""
     return CHANNEL_REGISTRY.get(channel_type)
+
+
+def get_async_channel_strategy(
+    channel_type: str,
+) -> AsyncNotificationSendingStrategy | None:
+    """Retrieves the async channel strategy, None if the channel has none."""
+    return ASYNC_CHANNEL_REGISTRY.get(channel_type)
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import logging
+import uuid
+from datetime import datetime
+from typing import Any, NamedTuple
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .cache import LocalTTLCache, get_redis
+
+logger = logging.getLogger(__name__)
+
+SEEN_ALERTS_KEY = "notifications:seen"
+
+
+def alert_fingerprint(
+    url: str, location: str, label: str, time_spotted: datetime
+) -> str:
+    """Digest of the content of an alert, as sent by the source."""
+    content = "\x1f".join([url, str(location), label, str(time_spotted.timestamp())])
+    return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+
+class SeenAlert(NamedTuple):
+    fingerprint: str
+    # response of the single alert webhook, None when ingested in a batch
+    representation: dict[str, Any] | None
+
+
+class SeenAlerts:
+    """
+    Alerts ingested recently, by UUID, with the fingerprint of their content,
+    so that an exact re-delivery of the upstream service is acknowledged
+    without touching the database nor fanning out again.
+
+    Entries live in Redis (one key per alert) when NOTIFICATION_REDIS_URL is
+    set, in a local LRU/TTL cache otherwise, with the same TTL. Redis is then
+    the only one read: an alert may have been updated through another worker
+    since this one saw it (A, B elsewhere, then A again), and a local entry
+    would take the last A for a re-delivery. Entries are only added once the
+    alert is committed and its fan-out enqueued.
+    """
+
+    def __init__(self) -> None:
+        self._cache: LocalTTLCache[uuid.UUID, SeenAlert] = LocalTTLCache(
+            maxsize=getattr(settings, "NOTIFICATION_SEEN_ALERTS_SIZE", 100_000),
+            ttl=getattr(settings, "NOTIFICATION_SEEN_ALERTS_TTL", 3600),
+        )
+
+    @staticmethod
+    def _key(alert_uuid: uuid.UUID) -> str:
+        return f"{SEEN_ALERTS_KEY}:{alert_uuid}"
+
+    @staticmethod
+    def _matching(seen: SeenAlert | None, fingerprint: str) -> SeenAlert | None:
+        if seen is None or seen.fingerprint != fingerprint:
+            return None
+        return seen
+
+    def _get_shared(
+        self, client: redis.Redis, alert_uuid: uuid.UUID
+    ) -> SeenAlert | None:
+        try:
+            raw = client.get(self._key(alert_uuid))
+        except redis.RedisError:
+            # a miss only costs the idempotent upsert
+            logger.exception("Dedupe: Failed to read the shared seen alerts")
+            return None
+        return None if raw is None else SeenAlert(*json.loads(raw))
+
+    def get(self, alert_uuid: uuid.UUID, fingerprint: str) -> SeenAlert | None:
+        """The entry of the alert if it was seen with the same content."""
+        if (client := get_redis()) is None:
+            seen = self._cache.get(alert_uuid)
+        else:
+            seen = self._get_shared(client, alert_uuid)
+        return self._matching(seen, fingerprint)
+
+    async def aget(self, alert_uuid: uuid.UUID, fingerprint: str) -> SeenAlert | None:
+        """get() for async views: Redis is read off the event loop."""
+        if (client := get_redis()) is None:
+            seen = self._cache.get(alert_uuid)
+        else:
+            seen = await sync_to_async(self._get_shared)(client, alert_uuid)
+        return self._matching(seen, fingerprint)
+
+    def get_many(self, fingerprints: dict[uuid.UUID, str]) -> set[uuid.UUID]:
+        """UUIDs of the alerts seen with the same content, one MGET at most."""
+        if not fingerprints:
+            return set()
+        if (client := get_redis()) is None:
+            seen = {
+                alert_uuid: self._cache.get(alert_uuid) for alert_uuid in fingerprints
+            }
+        else:
+            try:
+                values = client.mget(
+                    [self._key(alert_uuid) for alert_uuid in fingerprints]
+                )
+            except redis.RedisError:
+                logger.exception("Dedupe: Failed to read the shared seen alerts")
+                return set()
+            seen = {
+                alert_uuid: None if raw is None else SeenAlert(*json.loads(raw))
+                for alert_uuid, raw in zip(fingerprints, values)
+            }
+        return {
+            alert_uuid
+            for alert_uuid, entry in seen.items()
+            if self._matching(entry, fingerprints[alert_uuid])
+        }
+
+    def add_many(self, fingerprints: dict[uuid.UUID, str]) -> None:
+        """Adds alerts ingested in a batch, one pipelined round trip to Redis."""
+        if not fingerprints:
+            return
+        if (client := get_redis()) is None:
+            for alert_uuid, fingerprint in fingerprints.items():
+                self._cache.set(alert_uuid, SeenAlert(fingerprint, None))
+            return
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for alert_uuid, fingerprint in fingerprints.items():
+                pipeline.set(
+                    self._key(alert_uuid),
+                    json.dumps(SeenAlert(fingerprint, None)),
+                    ex=int(self._cache.ttl),
+                )
+            pipeline.execute()
+        except redis.RedisError:
+            logger.exception("Dedupe: Failed to write the shared seen alerts")
+
+    def add(
+        self,
+        alert_uuid: uuid.UUID,
+        fingerprint: str,
+        representation: dict[str, Any] | None = None,
+    ) -> None:
+        seen = SeenAlert(fingerprint, representation)
+        if (client := get_redis()) is None:
+            self._cache.set(alert_uuid, seen)
+            return
+        try:
+            client.set(self._key(alert_uuid), json.dumps(seen), ex=int(self._cache.ttl))
+        except redis.RedisError:
+            logger.exception("Dedupe: Failed to write the shared seen alerts")
+
+    async def aadd(
+        self,
+        alert_uuid: uuid.UUID,
+        fingerprint: str,
+        representation: dict[str, Any] | None = None,
+    ) -> None:
+        if get_redis() is None:
+            self._cache.set(alert_uuid, SeenAlert(fingerprint, representation))
+        else:
+            await sync_to_async(self.add)(alert_uuid, fingerprint, representation)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+
+seen_alerts = SeenAlerts()
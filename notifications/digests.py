@@ -0,0 +1,77 @@
+import math
+import uuid
+from collections.abc import Iterable
+from dataclasses import replace
+from datetime import datetime, timezone
+
+from django.conf import settings
+
+from .dispatcher import DeliveryOutcome
+from .models import DeliveryState, Notification, UserProfile
+
+# Digest delivery mode: the standard alerts of a profile in DIGEST mode are not
+# enqueued at fan-out. Their notifications are created pending, due at the end
+# of the profile's current window, and the sweeper claims them together once
+# it is over. send_notification_batch then delivers the notifications of the
+# same recipient as a single webhook, and records its outcome on each of them.
+
+
+def digest_window() -> float:
+    return getattr(settings, "NOTIFICATION_DIGEST_WINDOW", 300.0)
+
+
+def digest_due_at(profile_id: uuid.UUID, now: datetime | None = None) -> datetime:
+    """
+    End of the profile's current window. Windows are tumbling, offset per
+    profile so that the digests of every user are not due at the same time.
+    """
+    now = now or datetime.now(timezone.utc)
+    window = digest_window()
+    offset = profile_id.int % int(window * 1000) / 1000
+    end = offset + (math.floor((now.timestamp() - offset) / window) + 1) * window
+    return datetime.fromtimestamp(end, timezone.utc)
+
+
+def is_digested(notification: Notification) -> bool:
+    return (
+        notification.user_profile.delivery_mode
+        == UserProfile.DeliveryModeChoices.DIGEST
+        and not notification.alert.is_critical
+    )
+
+
+def group_digests(
+    notifications: Iterable[Notification],
+) -> tuple[list[Notification], list[list[Notification]]]:
+    """
+    Splits notifications into those delivered on their own and digests,
+    one per recipient and channel.
+    """
+    single: list[Notification] = []
+    digests: dict[tuple[uuid.UUID, str], list[Notification]] = {}
+    for notification in notifications:
+        if is_digested(notification):
+            key = (notification.user_profile_id, notification.channel)
+            digests.setdefault(key, []).append(notification)
+        else:
+            single.append(notification)
+    return single, list(digests.values())
+
+
+def digest_states(
+    outcome: DeliveryOutcome, members: Iterable[Notification]
+) -> list[DeliveryState]:
+    """
+    The outcome of a digest is that of each of its notifications. Those
+    retried share the earliest due time, so that they stay in one digest.
+    """
+    states = [replace(outcome, notification=member).to_state() for member in members]
+    due_times = [state.next_attempt_at for state in states if state.next_attempt_at]
+    return [
+        (
+            state._replace(next_attempt_at=min(due_times))
+            if state.next_attempt_at
+            else state
+        )
+        for state in states
+    ]
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+from notifications.exceptions import (
+    NotificationDeferredError,
+    NotificationPermanentError,
+    NotificationRetryableError,
+)
+
+from . import retries
+from .channels import ASYNC_CHANNEL_REGISTRY, get_async_channel_strategy
+from .models import DeliveryState, Notification
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DeliveryOutcome:
+    notification: Notification
+    response_data: str | None = None
+    error: Exception | None = None
+    attempted_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    # when the delivery started, None if it failed before (invalid payload)
+    started_at: datetime | None = None
+
+    @property
+    def is_success(self) -> bool:
+        return self.error is None
+
+    @property
+    def is_retryable(self) -> bool:
+        return isinstance(self.error, NotificationRetryableError)
+
+    @property
+    def is_deferred(self) -> bool:
+        return isinstance(self.error, NotificationDeferredError)
+
+    def to_state(self) -> DeliveryState:
+        """
+        Notification state to record: sent on success, pending with a backoff
+        due time while a transient error can still be retried, failed otherwise.
+        A success without response data (channel not implemented) stays pending.
+        A deferred delivery was not attempted: it is only rescheduled.
+        The HTTP status and the class of the error (the underlying one, e.g.
+        a timeout) are kept for the attempt log.
+        """
+        next_attempt_at = None
+        if self.is_deferred:
+            return DeliveryState(
+                self.notification.notification_uuid,
+                Notification.StatusChoices.PENDING,
+                None,
+                self.attempted_at,
+                self.attempted_at + timedelta(seconds=self.error.retry_after),
+                attempted=False,
+            )
+        if self.is_success:
+            status = (
+                Notification.StatusChoices.PENDING
+                if self.response_data is None
+                else Notification.StatusChoices.SENT
+            )
+            response_data = self.response_data
+            status_code = getattr(self.response_data, "status_code", None)
+            error_class = ""
+        else:
+            # attempt_count as loaded, before this attempt is recorded
+            attempts = self.notification.attempt_count + 1
+            if self.is_retryable and attempts < retries.max_attempts():
+                status = Notification.StatusChoices.PENDING
+                next_attempt_at = retries.next_attempt_at(attempts, self.attempted_at)
+            else:
+                status = Notification.StatusChoices.FAILED
+            response_data = str(self.error)
+            status_code = getattr(self.error, "status_code", None)
+            error_class = type(self.error.__cause__ or self.error).__name__
+        started_at = self.started_at or self.attempted_at
+        return DeliveryState(
+            self.notification.notification_uuid,
+            status,
+            response_data,
+            self.attempted_at,
+            next_attempt_at,
+            started_at=started_at,
+            queue_wait=(
+                started_at - self.notification.created
+                if self.notification.created
+                else None
+            ),
+            status_code=status_code,
+            error_class=error_class,
+        )
+
+
+class AsyncDeliveryDispatcher:
+    """
+    Delivers many notifications concurrently from a single worker process.
+    In-flight deliveries are bounded by a semaphore, whose slots strategies
+    take once the destination admits the delivery, outcomes are returned
+    instead of written so that the caller can record them from sync code.
+    """
+
+    def __init__(self, max_in_flight: int | None = None) -> None:
+        self.max_in_flight = max_in_flight or getattr(
+            settings, "NOTIFICATION_ASYNC_MAX_IN_FLIGHT", 200
+        )
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pid: int | None = None
+
+    async def _deliver(
+        self,
+        semaphore: asyncio.Semaphore,
+        notification: Notification,
+        payload: bytes,
+    ) -> DeliveryOutcome:
+        if not (strategy := get_async_channel_strategy(notification.channel)):
+            return DeliveryOutcome(
+                notification, error=NotificationPermanentError("No channel strategy")
+            )
+
+        started_at = datetime.now(timezone.utc)
+        try:
+            # the strategy takes a slot once the destination admits the
+            # delivery (rate limit, per-host concurrency)
+            response_data = await strategy.send(notification, payload, semaphore)
+        except (
+            NotificationRetryableError,
+            NotificationPermanentError,
+            NotificationDeferredError,
+        ) as exc:
+            return DeliveryOutcome(notification, error=exc, started_at=started_at)
+        except Exception as exc:
+            # same as send_notification: anything unexpected is permanent
+            logger.exception(
+                f"Dispatch: Unexpected error for notification {notification.notification_uuid}"
+            )
+            return DeliveryOutcome(
+                notification,
+                error=NotificationPermanentError(str(exc)),
+                started_at=started_at,
+            )
+        return DeliveryOutcome(
+            notification, response_data=response_data, started_at=started_at
+        )
+
+    async def dispatch(
+        self, deliveries: Iterable[tuple[Notification, bytes]]
+    ) -> list[DeliveryOutcome]:
+        """Delivers every (notification, payload) pair, outcomes keep input order."""
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+        return await asyncio.gather(
+            *(
+                self._deliver(semaphore, notification, payload)
+                for notification, payload in deliveries
+            )
+        )
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        # one loop per process, so that clients keep their connections between
+        # calls, and a fresh one in forked children
+        if self._loop is None or self._loop.is_closed() or self._pid != os.getpid():
+            self._loop = asyncio.new_event_loop()
+            self._pid = os.getpid()
+        return self._loop
+
+    def run(
+        self, deliveries: Iterable[tuple[Notification, bytes]]
+    ) -> list[DeliveryOutcome]:
+        """Blocking entry point for sync callers such as Celery tasks."""
+        return self._get_loop().run_until_complete(self.dispatch(deliveries))
+
+    def close(self) -> None:
+        if self._loop is None or self._loop.is_closed() or self._pid != os.getpid():
+            return
+        for strategy in ASYNC_CHANNEL_REGISTRY.values():
+            if aclose := getattr(strategy, "aclose", None):
+                self._loop.run_until_complete(aclose())
+        self._loop.close()
+
+
+async_dispatcher = AsyncDeliveryDispatcher()
@@ -2,7 +2,26 @@ class NotificationRetryableError(Exception):
     """Raised by a strategy when the error is transient
     and the task should be retried."""
 
+    def __init__(self, message: str = "", status_code: int | None = None) -> None:
+        super().__init__(message)
+        # HTTP status of the destination's answer, None without one
+        self.status_code = status_code
+
 
 class NotificationPermanentError(Exception):
     """Raised by a strategy when the error is permanent
     and the task should NOT be retried."""
+
+    def __init__(self, message: str = "", status_code: int | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class NotificationDeferredError(Exception):
+    """Raised by a strategy when the notification was not sent, on purpose
+    (e.g. unhealthy destination), and should be delivered again later
+    without counting an attempt."""
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+
+from .cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_KEY = "notifications:circuit"
+
+
+class CircuitState:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class LocalCircuitStore:
+    """In-process circuit state, used when NOTIFICATION_REDIS_URL is not set."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._failures: dict[str, int] = {}
+        self._opened_until: dict[str, float] = {}
+        self._probes: dict[str, float] = {}
+
+    def record_failure(self, destination: str, threshold: int, cooldown: float) -> None:
+        with self._lock:
+            failures = self._failures.get(destination, 0) + 1
+            self._failures[destination] = failures
+            if failures >= threshold:
+                self._opened_until[destination] = time.time() + cooldown
+                self._probes.pop(destination, None)
+
+    def record_success(self, destination: str) -> None:
+        with self._lock:
+            self._failures.pop(destination, None)
+            self._opened_until.pop(destination, None)
+            self._probes.pop(destination, None)
+
+    def opened_until(self, destination: str) -> float | None:
+        with self._lock:
+            return self._opened_until.get(destination)
+
+    def try_probe(self, destination: str, ttl: float) -> bool:
+        with self._lock:
+            if self._probes.get(destination, 0) > time.time():
+                return False
+            self._probes[destination] = time.time() + ttl
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._failures.clear()
+            self._opened_until.clear()
+            self._probes.clear()
+
+
+class RedisCircuitStore:
+    """Circuit state shared by every worker, one hash per destination."""
+
+    def __init__(self, client: redis.Redis) -> None:
+        self.client = client
+
+    @staticmethod
+    def _key(destination: str) -> str:
+        return f"{CIRCUIT_KEY}:{destination}"
+
+    def record_failure(self, destination: str, threshold: int, cooldown: float) -> None:
+        key = self._key(destination)
+        failures = self.client.hincrby(key, "failures", 1)
+        if failures >= threshold:
+            # concurrent failures may both reopen it, the later deadline wins
+            self.client.hset(key, "opened_until", time.time() + cooldown)
+            self.client.delete(f"{key}:probe")
+        # forgotten when the destination stays quiet
+        self.client.expire(key, int(cooldown * 10) + 1)
+
+    def record_success(self, destination: str) -> None:
+        key = self._key(destination)
+        self.client.delete(key, f"{key}:probe")
+
+    def opened_until(self, destination: str) -> float | None:
+        value = self.client.hget(self._key(destination), "opened_until")
+        return float(value) if value is not None else None
+
+    def try_probe(self, destination: str, ttl: float) -> bool:
+        return bool(
+            self.client.set(
+                f"{self._key(destination)}:probe", 1, nx=True, px=int(ttl * 1000)
+            )
+        )
+
+
+class CircuitBreaker:
+    """
+    Per-destination circuit breaker shared across workers through Redis.
+
+    closed: deliveries go through, consecutive failures are counted.
+    open: after NOTIFICATION_CIRCUIT_FAILURE_THRESHOLD failures, deliveries
+        are deferred without being attempted for NOTIFICATION_CIRCUIT_COOLDOWN.
+    half-open: once the cooldown is over, a single delivery probes the
+        destination, its success closes the circuit, its failure reopens it.
+
+    Redis errors fail open: the destination is then considered healthy.
+    """
+
+    def __init__(self) -> None:
+        self._local = LocalCircuitStore()
+
+    def _store(self) -> LocalCircuitStore | RedisCircuitStore:
+        if (client := get_redis()) is None:
+            return self._local
+        return RedisCircuitStore(client)
+
+    @property
+    def threshold(self) -> int:
+        return getattr(settings, "NOTIFICATION_CIRCUIT_FAILURE_THRESHOLD", 5)
+
+    @property
+    def cooldown(self) -> float:
+        return getattr(settings, "NOTIFICATION_CIRCUIT_COOLDOWN", 30.0)
+
+    @property
+    def probe_timeout(self) -> float:
+        # a probe that never reports back must not keep the circuit half-open
+        return getattr(settings, "NOTIFICATION_WEBHOOK_TIMEOUT", 10.0) + 5.0
+
+    def state(self, destination: str) -> str:
+        try:
+            opened_until = self._store().opened_until(destination)
+        except redis.RedisError:
+            logger.exception(f"Circuit: Failed to read the state of {destination}")
+            return CircuitState.CLOSED
+        if opened_until is None:
+            return CircuitState.CLOSED
+        if time.time() < opened_until:
+            return CircuitState.OPEN
+        return CircuitState.HALF_OPEN
+
+    def check(self, destination: str) -> float | None:
+        """None if a delivery may be attempted, else the seconds to wait."""
+        try:
+            store = self._store()
+            if (opened_until := store.opened_until(destination)) is None:
+                return None
+            if (remaining := opened_until - time.time()) > 0:
+                return remaining
+            if store.try_probe(destination, self.probe_timeout):
+                logger.info(f"Circuit: Probing {destination}")
+                return None
+            return self.probe_timeout
+        except redis.RedisError:
+            logger.exception(f"Circuit: Failed to check {destination}")
+            return None
+
+    def record_success(self, destination: str) -> None:
+        try:
+            self._store().record_success(destination)
+        except redis.RedisError:
+            logger.exception(f"Circuit: Failed to record a success of {destination}")
+
+    def record_failure(self, destination: str) -> None:
+        try:
+            self._store().record_failure(destination, self.threshold, self.cooldown)
+        except redis.RedisError:
+            logger.exception(f"Circuit: Failed to record a failure of {destination}")
+
+    def clear(self) -> None:
+        self._local.clear()
+
+
+circuit_breaker = CircuitBreaker()
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    AIMD limit of the concurrent deliveries to one destination from one event
+    loop: +1 per limit successes (additive increase), halved on each failure
+    (multiplicative decrease), between min_limit and max_limit.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1) -> None:
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, success: bool | None) -> None:
+        """success is None when nothing was sent, the limit is then unchanged."""
+        async with self._condition:
+            self.in_flight -= 1
+            if success:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif success is not None:
+                self.limit = max(self.min_limit, self.limit / 2)
+            self._condition.notify_all()
@@ -0,0 +1,270 @@
+import uuid
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+from django.db import connection, transaction
+
+from .ingestion import _upsert_alerts, save_alert
+from .models import (
+    Alert,
+    DeliveryState,
+    Notification,
+    OutboxMessage,
+    Store,
+    UserProfile,
+)
+from .routing import routing_cache
+from .validation import AlertRecord
+
+# Index audit on PostgreSQL (manage.py audit_indexes). The hot paths run for
+# real on a sample alert, in a transaction that is rolled back: every
+# statement they send is first run under EXPLAIN (ANALYZE, BUFFERS) in a
+# savepoint, rolled back too, so that its plan is the one of the real call.
+# Sequential scans of the large tables are flagged, and the catalog is
+# checked for indexes that are never scanned or covered by another one.
+
+AUDITED_MODELS = (Store, Alert, UserProfile, Notification, OutboxMessage)
+EXPLAINED = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class _Rollback(Exception):
+    pass
+
+
+class StatementPlan(NamedTuple):
+    path: str
+    sql: str
+    plan: dict[str, Any]
+
+    @property
+    def execution_ms(self) -> float:
+        return self.plan.get("Execution Time", 0.0)
+
+    @property
+    def buffers(self) -> tuple[int, int]:
+        """Shared blocks hit and read."""
+        root = self.plan["Plan"]
+        return root.get("Shared Hit Blocks", 0), root.get("Shared Read Blocks", 0)
+
+    def nodes(self) -> Iterator[dict[str, Any]]:
+        stack = [self.plan["Plan"]]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(node.get("Plans", ()))
+
+    def seq_scans(self) -> list[str]:
+        return [
+            node["Relation Name"]
+            for node in self.nodes()
+            if node["Node Type"] == "Seq Scan"
+        ]
+
+    def indexes(self) -> list[str]:
+        return [node["Index Name"] for node in self.nodes() if "Index Name" in node]
+
+
+class PlanRecorder:
+    """Execute wrapper explaining each statement before running it."""
+
+    def __init__(self) -> None:
+        self.path = ""
+        self.plans: list[StatementPlan] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith(EXPLAINED):
+            # the DB-API cursor, the wrapped one would come back here
+            cursor = context["cursor"].cursor
+            cursor.execute("SAVEPOINT index_audit")
+            try:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+                [plan] = cursor.fetchone()[0]
+            finally:
+                cursor.execute("ROLLBACK TO SAVEPOINT index_audit")
+            self.plans.append(StatementPlan(self.path, sql, plan))
+        return execute(sql, params, many, context)
+
+
+def _ingestion(alert: Alert) -> None:
+    # an upstream retry of the sample alert, and a new alert, one by one
+    # and as a batch
+    Alert.objects.upsert(
+        alert.alert_uuid, alert.store, alert.url, alert.label, alert.time_spotted
+    )
+    save_alert(
+        AlertRecord(
+            uuid.uuid4(), alert.url, alert.label, alert.time_spotted, alert.store_id
+        ),
+        store=alert.store,
+    )
+    _upsert_alerts(
+        {
+            uuid.uuid4(): {
+                "url": alert.url,
+                "location": alert.store_id,
+                "label": alert.label,
+                "time_spotted": alert.time_spotted,
+            }
+        }
+    )
+
+
+def _fan_out(alert: Alert) -> list[uuid.UUID]:
+    # the queries of fan_out_notifications, without publishing the deliveries
+    alert = Alert.objects.get(alert_uuid=alert.alert_uuid)
+    routing_cache.clear()
+    recipients = [
+        (subscriber.profile_id, subscriber.preferred_channel)
+        for subscriber in routing_cache.get_recipients(alert)
+    ]
+    return Notification.objects.bulk_create_pending(alert, recipients)
+
+
+def _send(notification_uuids: list[uuid.UUID]) -> None:
+    # the queries of send_notification_batch and of the sweeper, without
+    # delivering anything
+    notifications = list(
+        Notification.objects.select_related("alert", "user_profile")
+        .filter(notification_uuid__in=notification_uuids)
+        .exclude(status=Notification.StatusChoices.SENT)
+    )
+    now = datetime.now(timezone.utc)
+    Notification.objects.record_deliveries(
+        DeliveryState(notification.pk, Notification.StatusChoices.SENT, "OK", now)
+        for notification in notifications
+    )
+    Notification.objects.claim_due(50)
+
+
+def explain_hot_paths(alert: Alert) -> list[StatementPlan]:
+    """Plans of the ingestion, fan-out and send statements for the alert."""
+    recorder = PlanRecorder()
+
+    def run(path: str, function: Callable[..., Any], *args: Any) -> Any:
+        recorder.path = path
+        return function(*args)
+
+    try:
+        with transaction.atomic(), connection.execute_wrapper(recorder):
+            run("ingestion", _ingestion, alert)
+            created = run("fan_out_notifications", _fan_out, alert)
+            pending = list(
+                Notification.objects.filter(alert=alert)
+                .exclude(status=Notification.StatusChoices.SENT)
+                .values_list("pk", flat=True)
+            )
+            run("send_notification", _send, created or pending)
+            raise _Rollback
+    except _Rollback:
+        pass
+    return recorder.plans
+
+
+def table_rows() -> dict[str, int]:
+    """Estimated rows of the audited tables, partitions included."""
+    tables = [model._meta.db_table for model in AUDITED_MODELS]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT t.relname, GREATEST(t.reltuples, 0) + COALESCE(("
+            "SELECT SUM(GREATEST(p.reltuples, 0)) FROM pg_inherits h "
+            "JOIN pg_class p ON p.oid = h.inhrelid WHERE h.inhparent = t.oid), 0) "
+            "FROM pg_class t WHERE t.relname = ANY(%s) "
+            "AND t.relnamespace = current_schema()::regnamespace",
+            [tables],
+        )
+        return {table: int(rows) for table, rows in cursor.fetchall()}
+
+
+def partition_parents() -> dict[str, str]:
+    """Partition -> partitioned table or index, for the names in the plans."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, p.relname FROM pg_inherits h "
+            "JOIN pg_class c ON c.oid = h.inhrelid "
+            "JOIN pg_class p ON p.oid = h.inhparent "
+            "WHERE p.relnamespace = current_schema()::regnamespace"
+        )
+        return dict(cursor.fetchall())
+
+
+class IndexInfo(NamedTuple):
+    table: str
+    name: str
+    columns: tuple[str, ...]
+    # operator classes, method and predicate must match for an index to cover another
+    signature: tuple[str, str, str]
+    unique: bool
+    scans: int
+
+
+def indexes() -> list[IndexInfo]:
+    """
+    Indexes of the audited tables (partitioned ones once, with the scans of
+    their partitions), expression indexes excluded.
+    """
+    tables = [model._meta.db_table for model in AUDITED_MODELS]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT t.relname, i.relname, x.indclass::text, "
+            "am.amname, COALESCE(pg_get_expr(x.indpred, x.indrelid), ''), "
+            "x.indisunique, COALESCE(s.idx_scan, 0) + COALESCE(("
+            "SELECT SUM(c.idx_scan) FROM pg_inherits h "
+            "JOIN pg_stat_user_indexes c ON c.indexrelid = h.inhrelid "
+            "WHERE h.inhparent = i.oid), 0), "
+            "ARRAY(SELECT a.attname FROM unnest(x.indkey::int2[]) WITH ORDINALITY k(n, o) "
+            "JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.n "
+            "ORDER BY k.o) "
+            "FROM pg_index x "
+            "JOIN pg_class i ON i.oid = x.indexrelid "
+            "JOIN pg_class t ON t.oid = x.indrelid "
+            "JOIN pg_am am ON am.oid = i.relam "
+            "LEFT JOIN pg_stat_user_indexes s ON s.indexrelid = x.indexrelid "
+            "WHERE t.relname = ANY(%s) AND x.indexprs IS NULL "
+            "AND t.relnamespace = current_schema()::regnamespace "
+            "ORDER BY t.relname, i.relname",
+            [tables],
+        )
+        return [
+            IndexInfo(
+                table,
+                name,
+                tuple(columns),
+                (classes, method, predicate),
+                unique,
+                int(scans),
+            )
+            for table, name, classes, method, predicate, unique, scans, columns in (
+                cursor.fetchall()
+            )
+        ]
+
+
+def _covers(index: IndexInfo, other: IndexInfo) -> bool:
+    """Whether other serves every lookup of index, which is then redundant."""
+    if index.unique or index.table != other.table or index.name == other.name:
+        return False
+    classes, method, predicate = index.signature
+    other_classes, other_method, other_predicate = other.signature
+    width = len(index.columns)
+    return (
+        (method, predicate) == (other_method, other_predicate)
+        and other.columns[:width] == index.columns
+        and other_classes.split()[:width] == classes.split()
+        # of two identical indexes, one only is reported
+        and (len(other.columns) > width or other.unique or other.name < index.name)
+    )
+
+
+def duplicate_indexes(infos: list[IndexInfo]) -> list[tuple[IndexInfo, IndexInfo]]:
+    """(redundant index, an index covering it) pairs."""
+    duplicates = []
+    for index in infos:
+        if cover := next((other for other in infos if _covers(index, other)), None):
+            duplicates.append((index, cover))
+    return duplicates
+
+
+def unused_indexes(infos: list[IndexInfo]) -> list[IndexInfo]:
+    """Indexes never scanned since the statistics were reset, unique ones aside."""
+    return [index for index in infos if not index.unique and not index.scans]
@@ -0,0 +1,238 @@
+import logging
+from collections.abc import Iterable, Iterator
+from itertools import islice
+from typing import Any
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .dedupe import alert_fingerprint, seen_alerts
+from .models import Alert, Store
+from .outbox import enqueue_fan_out
+from .parsers import MalformedItem
+from .serializers import AlertBatchItemSerializer
+from .stores import store_resolver
+from .validation import AlertRecord
+
+logger = logging.getLogger(__name__)
+
+ALERT_UPDATE_FIELDS = ["url", "store", "label", "time_spotted", "modified"]
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _validate(index: int, item: Any) -> tuple[dict[str, Any], dict[str, Any] | None]:
+    if isinstance(item, MalformedItem):
+        return {
+            "index": index,
+            "status": "invalid",
+            "errors": {"non_field_errors": [item.message]},
+        }, None
+
+    serializer = AlertBatchItemSerializer(data=item)
+    if not serializer.is_valid():
+        return {"index": index, "status": "invalid", "errors": serializer.errors}, None
+
+    data = dict(serializer.validated_data)
+    return {"index": index, "alert_uuid": str(data["alert_uuid"])}, data
+
+
+def _upsert_alerts(records: dict[Any, dict[str, Any]]) -> dict[Any, str]:
+    """
+    Upserts the validated records with a constant number of statements:
+    one INSERT and one SELECT for the stores that are not cached yet,
+    one lock, one SELECT, one INSERT and one UPDATE for the alerts. Runs in
+    the caller's transaction, which holds the locks, see AlertManager.lock.
+    Returns the outcome ("created", "updated" or "unchanged") for each alert
+    UUID, alerts sent again with the same content are not written.
+    """
+    store_resolver.ensure_exist(data["location"] for data in records.values())
+
+    # held until the commit: a concurrent request inserting one of these
+    # alerts waits, then finds it
+    Alert.objects.lock(records)
+    existing = Alert.objects.in_bulk(list(records))
+    now = timezone.now()
+    to_create: list[Alert] = []
+    to_update: list[Alert] = []
+    outcomes: dict[Any, str] = {}
+    for alert_uuid, data in records.items():
+        fields = {
+            "url": data["url"],
+            "store_id": data["location"],
+            "label": data["label"],
+            "time_spotted": data["time_spotted"],
+        }
+        if (alert := existing.get(alert_uuid)) is None:
+            to_create.append(Alert(alert_uuid=alert_uuid, **fields))
+            outcomes[alert_uuid] = "created"
+        elif all(getattr(alert, name) == value for name, value in fields.items()):
+            outcomes[alert_uuid] = "unchanged"
+        else:
+            for name, value in fields.items():
+                setattr(alert, name, value)
+            alert.modified = now
+            to_update.append(alert)
+            outcomes[alert_uuid] = "updated"
+
+    # ignore_conflicts: a concurrent request may have inserted the same alert
+    Alert.objects.bulk_create(to_create, ignore_conflicts=True)
+    Alert.objects.bulk_update(to_update, ALERT_UPDATE_FIELDS)
+    return outcomes
+
+
+def _forget_deleted_stores(location_ids: Iterable[str]) -> bool:
+    """
+    Forgets the cached stores that no longer exist, returns whether there were
+    any. A store deleted by another process stays in this process's cache
+    until its TTL expires, and fails the alert foreign key at commit.
+    """
+    if connection.in_atomic_block:
+        # the error is the outer transaction's, which can no longer query
+        return False
+    location_ids = set(location_ids)
+    deleted = location_ids - set(
+        Store.objects.filter(location_id__in=location_ids).values_list(
+            "location_id", flat=True
+        )
+    )
+    for location_id in deleted:
+        logger.warning(f"Stores: {location_id} was deleted, resolving it again")
+        store_resolver.forget(location_id)
+    return bool(deleted)
+
+
+def _write_chunk(records: dict[Any, dict[str, Any]]) -> dict[Any, str]:
+    with transaction.atomic():
+        written = _upsert_alerts(records)
+        # committed with the alerts, published by the outbox relay;
+        # unchanged alerts are not fanned out again
+        enqueue_fan_out(
+            {
+                str(alert_uuid): records[alert_uuid]["label"]
+                for alert_uuid, outcome in written.items()
+                if outcome != "unchanged"
+            }
+        )
+    return written
+
+
+def _write_alerts(records: dict[Any, dict[str, Any]]) -> dict[Any, str]:
+    """
+    Upserts the records and writes the fan-out of the new or changed ones to
+    the outbox in one transaction, tried again once if a cached store was
+    deleted. Returns the outcome of each alert, see _upsert_alerts.
+    """
+    try:
+        return _write_chunk(records)
+    except IntegrityError:
+        if not _forget_deleted_stores(data["location"] for data in records.values()):
+            raise
+    return _write_chunk(records)
+
+
+def _save_alert(record: AlertRecord, store: Store | None) -> tuple[Alert, bool]:
+    with transaction.atomic():
+        alert, changed = Alert.objects.upsert(
+            alert_uuid=record.alert_uuid,
+            store=store or store_resolver.resolve(record.location),
+            url=record.url,
+            label=record.label,
+            time_spotted=record.time_spotted,
+        )
+        # committed with the alert, published by the outbox relay;
+        # unchanged alerts are not fanned out again
+        if changed:
+            enqueue_fan_out({str(alert.alert_uuid): alert.label})
+    return alert, changed
+
+
+def save_alert(record: AlertRecord, store: Store | None = None) -> tuple[Alert, bool]:
+    """
+    Upserts a single alert and, in the same transaction, writes its fan-out to
+    the outbox when it is new or changed. Returns the alert and whether it changed.
+    Tried again once, with the store resolved again, if the store was deleted
+    since it was cached.
+    """
+    try:
+        return _save_alert(record, store)
+    except IntegrityError:
+        if not _forget_deleted_stores([record.location]):
+            raise
+    return _save_alert(record, None)
+
+
+def _ingest_chunk(chunk: list[tuple[int, Any]]) -> list[dict[str, Any]]:
+    results: list[dict[str, Any]] = []
+    # last occurrence wins when the same alert is replayed within a chunk
+    records: dict[Any, dict[str, Any]] = {}
+    pending: list[dict[str, Any]] = []
+    for index, item in chunk:
+        result, data = _validate(index, item)
+        results.append(result)
+        if data is not None:
+            records[data["alert_uuid"]] = data
+            pending.append(result)
+
+    if not records:
+        return results
+
+    # exact re-deliveries of recently ingested alerts need no database work
+    fingerprints = {
+        alert_uuid: alert_fingerprint(
+            data["url"], data["location"], data["label"], data["time_spotted"]
+        )
+        for alert_uuid, data in records.items()
+    }
+    seen = seen_alerts.get_many(fingerprints)
+    outcomes: dict[Any, str] = dict.fromkeys(seen, "unchanged")
+    to_upsert = {
+        alert_uuid: data
+        for alert_uuid, data in records.items()
+        if alert_uuid not in seen
+    }
+    upserted: dict[Any, str] = {}
+    if to_upsert:
+        try:
+            written = _write_alerts(to_upsert)
+        except DatabaseError:
+            logger.exception(
+                "DB error saving alert batch",
+                extra={"alert_uuids": [str(alert_uuid) for alert_uuid in to_upsert]},
+            )
+            outcomes.update(dict.fromkeys(to_upsert, "failed"))
+        else:
+            upserted = written
+    outcomes.update(upserted)
+
+    outcomes_by_str = {
+        str(alert_uuid): outcome for alert_uuid, outcome in outcomes.items()
+    }
+    for result in pending:
+        result["status"] = outcomes_by_str[result["alert_uuid"]]
+        if result["status"] == "failed":
+            result["errors"] = {"non_field_errors": ["Could not persist alert"]}
+
+    seen_alerts.add_many(
+        {alert_uuid: fingerprints[alert_uuid] for alert_uuid in upserted}
+    )
+    return results
+
+
+def ingest_alert_batch(items: Iterable[Any]) -> list[dict[str, Any]]:
+    """
+    Validates and upserts a stream of alert payloads chunk by chunk,
+    writing their fan-out to the outbox in bulk.
+    Returns one result per item, in input order, so that an invalid
+    item never rejects the rest of the batch.
+    """
+    chunk_size = getattr(settings, "NOTIFICATION_ALERT_BATCH_CHUNK_SIZE", 500)
+    results: list[dict[str, Any]] = []
+    for chunk in _chunked(enumerate(items), chunk_size):
+        results.extend(_ingest_chunk(chunk))
+    return results
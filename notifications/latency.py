@@ -0,0 +1,216 @@
+import bisect
+import logging
+import math
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import DeliveryLatencyRollup, JobCursor, Notification
+
+logger = logging.getLogger(__name__)
+
+# Detection-to-delivery latency (sent_at - alert.time_spotted) per store,
+# label and channel. rollup_delivery_latency adds the notifications sent
+# since its last run to per-minute histograms (DeliveryLatencyRollup), found
+# through the recorded_at index: the Notification table is never scanned, and
+# a window is read from its rollups only. The cursor pages on recorded_at, set
+# by the database when the success is written, rather than on sent_at, set by
+# the worker before: a row committed after the cursor passed its sent_at would
+# be skipped.
+
+CURSOR_NAME = "delivery-latency"
+# upper bounds of the histogram buckets in seconds: 10ms to ~1 day, each 10%
+# above the previous one, so that a percentile is within 10% of the real one
+BUCKET_BOUNDS = [0.01 * 1.1**index for index in range(168)]
+DEFAULT_WINDOWS = (300, 3600, 86400)
+
+
+def bucket_index(seconds: float) -> int:
+    """Index of the bucket of a latency, len(BUCKET_BOUNDS) beyond the last."""
+    return bisect.bisect_left(BUCKET_BOUNDS, seconds)
+
+
+def rollup_delay() -> timedelta:
+    """Rows recorded this recently may not be committed yet, they wait a run."""
+    return timedelta(
+        seconds=getattr(settings, "NOTIFICATION_LATENCY_ROLLUP_DELAY", 30.0)
+    )
+
+
+def rollup_retention() -> timedelta:
+    return timedelta(
+        seconds=getattr(settings, "NOTIFICATION_LATENCY_ROLLUP_RETENTION", 604800.0)
+    )
+
+
+class Histogram:
+    """Latencies of a rollup, or of a window once merged."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+        self.buckets: dict[int, int] = defaultdict(int)
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+        self.buckets[bucket_index(seconds)] += 1
+
+    def merge(self, rollup: DeliveryLatencyRollup) -> None:
+        self.count += rollup.count
+        self.total += rollup.total_seconds
+        self.maximum = max(self.maximum, rollup.max_seconds)
+        for index, count in rollup.histogram.items():
+            self.buckets[int(index)] += count
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th latency, at most the max."""
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                if index < len(BUCKET_BOUNDS):
+                    return min(BUCKET_BOUNDS[index], self.maximum)
+                break
+        return self.maximum
+
+    def apply_to(self, rollup: DeliveryLatencyRollup) -> None:
+        rollup.count += self.count
+        rollup.total_seconds += self.total
+        rollup.max_seconds = max(rollup.max_seconds, self.maximum)
+        histogram = {int(index): count for index, count in rollup.histogram.items()}
+        for index, count in self.buckets.items():
+            histogram[index] = histogram.get(index, 0) + count
+        rollup.histogram = {str(index): count for index, count in histogram.items()}
+
+    def summary(self) -> dict[str, float | int]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.maximum,
+        }
+
+
+def rollup_delivery_latency(now: datetime | None = None) -> int:
+    """
+    Adds the notifications recorded as sent since the previous run, up to
+    rollup_delay() ago, to the rollups of their sent_at minute, and prunes
+    the rollups past the retention. The cursor and the rollups are updated
+    in one transaction, under a lock of the cursor: concurrent runs wait for
+    each other. Returns the number of notifications added.
+    """
+    now = now or datetime.now(timezone.utc)
+    upper = now - rollup_delay()
+    with transaction.atomic():
+        cursor, _ = JobCursor.objects.select_for_update().get_or_create(
+            name=CURSOR_NAME, defaults={"position": now - rollup_retention()}
+        )
+        if cursor.position >= upper:
+            return 0
+
+        histograms: dict[tuple[str, str, str, datetime], Histogram] = defaultdict(
+            Histogram
+        )
+        for store_id, label, channel, sent_at, time_spotted in (
+            Notification.objects.filter(
+                recorded_at__gt=cursor.position, recorded_at__lte=upper
+            )
+            .values_list(
+                "alert__store_id",
+                "alert__label",
+                "channel",
+                "sent_at",
+                "alert__time_spotted",
+            )
+            .iterator(chunk_size=2000)
+        ):
+            minute = sent_at.replace(second=0, microsecond=0)
+            latency = max(0.0, (sent_at - time_spotted).total_seconds())
+            histograms[(store_id, label, channel, minute)].add(latency)
+
+        _apply(histograms)
+        cursor.position = upper
+        cursor.save(update_fields=["position"])
+        pruned, _ = DeliveryLatencyRollup.objects.filter(
+            minute__lt=now - rollup_retention()
+        ).delete()
+
+    added = sum(histogram.count for histogram in histograms.values())
+    if added or pruned:
+        logger.info(f"LatencyRollup: Added {added} notifications, pruned {pruned}")
+    return added
+
+
+def _apply(histograms: dict[tuple[str, str, str, datetime], Histogram]) -> None:
+    """Adds the histograms to their existing rollups, creates the others."""
+    if not histograms:
+        return
+    minutes = {minute for _, _, _, minute in histograms}
+    existing = {
+        (rollup.store_id, rollup.label, rollup.channel, rollup.minute): rollup
+        for rollup in DeliveryLatencyRollup.objects.select_for_update().filter(
+            minute__gte=min(minutes), minute__lte=max(minutes)
+        )
+        if (rollup.store_id, rollup.label, rollup.channel, rollup.minute) in histograms
+    }
+    created = []
+    for key, histogram in histograms.items():
+        if (rollup := existing.get(key)) is None:
+            store_id, label, channel, minute = key
+            rollup = DeliveryLatencyRollup(
+                store_id=store_id, label=label, channel=channel, minute=minute
+            )
+            created.append(rollup)
+        histogram.apply_to(rollup)
+    DeliveryLatencyRollup.objects.bulk_update(
+        existing.values(), ["count", "total_seconds", "max_seconds", "histogram"]
+    )
+    DeliveryLatencyRollup.objects.bulk_create(created)
+
+
+def latency_report(
+    windows: Iterable[int] = DEFAULT_WINDOWS,
+    now: datetime | None = None,
+    **filters: Any,
+) -> list[dict[str, Any]]:
+    """
+    Latency summary per store, label and channel over each rolling window
+    (seconds), from the rollups of the minutes it covers. filters narrow the
+    rollups down, e.g. store_id, label or channel.
+    """
+    now = now or datetime.now(timezone.utc)
+    windows = sorted(set(windows))
+    since = {window: now - timedelta(seconds=window) for window in windows}
+    merged: dict[int, dict[tuple[str, str, str], Histogram]] = {
+        window: defaultdict(Histogram) for window in windows
+    }
+    # one query for every window, the largest one covers the others
+    for rollup in DeliveryLatencyRollup.objects.filter(
+        minute__gte=since[windows[-1]].replace(second=0, microsecond=0), **filters
+    ):
+        key = (rollup.store_id, rollup.label, rollup.channel)
+        for window in windows:
+            # a minute is in the window if it ends after the window start
+            if rollup.minute + timedelta(minutes=1) > since[window]:
+                merged[window][key].merge(rollup)
+    return [
+        {
+            "window": window,
+            "results": [
+                {"store": store, "label": label, "channel": channel}
+                | histogram.summary()
+                for (store, label, channel), histogram in sorted(merged[window].items())
+            ],
+        }
+        for window in windows
+    ]
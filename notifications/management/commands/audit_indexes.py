@@ -0,0 +1,95 @@
+from collections import defaultdict
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from notifications.index_audit import (
+    duplicate_indexes,
+    explain_hot_paths,
+    indexes,
+    partition_parents,
+    table_rows,
+    unused_indexes,
+)
+from notifications.models import Alert
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN (ANALYZE, BUFFERS) on the statements of the ingestion, "
+        "fan-out and send paths for a sample alert (rolled back), and flags "
+        "sequential scans and unused or duplicate indexes. PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--alert", help="UUID of the sample alert, the latest one by default."
+        )
+        parser.add_argument(
+            "--min-rows",
+            type=int,
+            default=10_000,
+            help="Sequential scans of smaller tables are not flagged.",
+        )
+        parser.add_argument(
+            "--plans", action="store_true", help="Print every statement and plan."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if connection.vendor != "postgresql":
+            raise CommandError("The index audit needs PostgreSQL.")
+        alerts = Alert.objects.select_related("store").order_by("-created")
+        if options["alert"]:
+            alerts = alerts.filter(alert_uuid=options["alert"])
+        if (alert := alerts.first()) is None:
+            raise CommandError("No alert to audit, ingest some first.")
+
+        rows = table_rows()
+        parents = partition_parents()
+
+        def names(relations: list[str]) -> list[str]:
+            # a partitioned table or index once, whatever its partitions
+            return list(dict.fromkeys(parents.get(name, name) for name in relations))
+
+        flagged = 0
+        self.stdout.write(f"Hot paths of alert {alert.alert_uuid}:")
+        by_path = defaultdict(list)
+        for plan in explain_hot_paths(alert):
+            by_path[plan.path].append(plan)
+        for path, plans in by_path.items():
+            self.stdout.write(f"  {path}")
+            for plan in plans:
+                hit, read = plan.buffers
+                seq_scans = [
+                    table
+                    for table in names(plan.seq_scans())
+                    if rows.get(table, 0) >= options["min_rows"]
+                ]
+                flagged += len(seq_scans)
+                marker = "SEQ SCAN" if seq_scans else "ok"
+                self.stdout.write(
+                    f"    [{marker}] {plan.execution_ms:.2f} ms, buffers "
+                    f"hit={hit} read={read}, indexes: "
+                    f"{', '.join(names(plan.indexes())) or '-'}"
+                    + (f", scans: {', '.join(seq_scans)}" if seq_scans else "")
+                )
+                if options["plans"] or seq_scans:
+                    self.stdout.write(f"      {plan.sql}")
+
+        infos = indexes()
+        duplicates = duplicate_indexes(infos)
+        self.stdout.write("Duplicate indexes:")
+        for index, cover in duplicates:
+            self.stdout.write(
+                f"  {index.table}.{index.name} ({', '.join(index.columns)}) "
+                f"is covered by {cover.name} ({', '.join(cover.columns)})"
+            )
+        unused = unused_indexes(infos)
+        self.stdout.write("Indexes never scanned since the statistics reset:")
+        for index in unused:
+            self.stdout.write(
+                f"  {index.table}.{index.name} ({', '.join(index.columns)})"
+            )
+        flagged += len(duplicates) + len(unused)
+        self.stdout.write(f"{flagged} findings")
@@ -0,0 +1,64 @@
+import logging
+import time
+from typing import Any
+
+from celery import current_app
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from notifications.outbox import prune_outbox, relay_outbox
+
+logger = logging.getLogger(__name__)
+
+# published messages are pruned at most this often (seconds)
+PRUNE_INTERVAL = 60.0
+
+
+class Command(BaseCommand):
+    help = "Publishes the outbox messages to the broker, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=getattr(settings, "NOTIFICATION_OUTBOX_BATCH_SIZE", 500),
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=getattr(settings, "NOTIFICATION_OUTBOX_POLL_INTERVAL", 0.1),
+            help="Seconds to sleep once the outbox is drained.",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Drain the outbox, then exit."
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if current_app.conf.task_always_eager and not options["once"]:
+            # the fan-out and its deliveries would run here, in the transaction
+            # holding the outbox rows, and be sent again if one of them raised
+            raise CommandError(
+                "CELERY_TASK_ALWAYS_EAGER is set: tasks would run in the relay, "
+                "set it to false so that workers consume the broker"
+            )
+        batch_size, interval = options["batch_size"], options["interval"]
+        pruned_at = 0.0
+        while True:
+            try:
+                relayed = relay_outbox(batch_size)
+                if time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                    prune_outbox()
+                    pruned_at = time.monotonic()
+            except Exception:
+                # broker or database unavailable: the messages stay in the
+                # outbox, published once it is back
+                logger.exception("Outbox: Failed to relay messages")
+                close_old_connections()
+                relayed = 0
+                if options["once"]:
+                    raise
+            if relayed < batch_size:
+                if options["once"]:
+                    return
+                time.sleep(interval)
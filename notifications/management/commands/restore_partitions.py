@@ -0,0 +1,36 @@
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from notifications.partitions import is_partitioned, restore_days, restore_partition
+
+
+class Command(BaseCommand):
+    help = (
+        "Loads archived partitions (<table>_pYYYY_MM.ndjson.gz) back into the "
+        "partitioned tables. Partitions older than NOTIFICATION_PARTITION_RETENTION "
+        "months are archived again by the first maintenance after --keep-days."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archives", nargs="+", type=Path)
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            default=restore_days(),
+            help="Days before the maintenance archives them again.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        if not is_partitioned():
+            raise CommandError("The tables are only partitioned on PostgreSQL.")
+        keep_until = timezone.now() + timedelta(days=options["keep_days"])
+        for path in options["archives"]:
+            try:
+                restored = restore_partition(path, keep_until)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"{path}: {error}") from error
+            self.stdout.write(f"{path}: restored {restored} rows")
@@ -0,0 +1,226 @@
+"""
+Prometheus metrics of the hot paths, in the text exposition format.
+
+With PROMETHEUS_MULTIPROC_DIR set, every process (gunicorn workers, Celery
+prefork children) writes its values to files in that directory, and the
+exposition adds them up: scrape the web server on /metrics, and each Celery
+worker on NOTIFICATION_METRICS_PORT. The directory must be emptied when the
+server starts, see gunicorn.conf.py and start_worker_metrics_server.
+
+Instrumentation hooks into the existing code paths rather than call sites:
+the webhooks through metrics_middleware, the tasks through Celery signals, the
+deliveries through the channel registries (see channels.InstrumentedStrategy)
+and the recorded outcomes through the delivery state writer.
+"""
+
+import logging
+import os
+import time
+from collections.abc import Iterable
+from typing import Any, Callable
+
+from asgiref.sync import iscoroutinefunction
+from celery.signals import (
+    before_task_publish,
+    task_postrun,
+    task_prerun,
+    worker_init,
+    worker_process_shutdown,
+)
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    start_http_server,
+)
+
+logger = logging.getLogger(__name__)
+
+if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+    # values are written there as soon as the metrics are declared
+    os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+# alert webhooks are timed, other views are not instrumented
+INGESTION_VIEWS = {"webhook-alerts", "webhook-alerts-async", "webhook-alerts-batch"}
+# header stamped on every task message, see record_published_at
+PUBLISHED_AT_HEADER = "published_at"
+
+alert_ingestion_seconds = Histogram(
+    "notifications_alert_ingestion_seconds",
+    "Time to answer an alert webhook request.",
+    ["endpoint", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+alert_validation_failures = Counter(
+    "notifications_alert_validation_failures_total",
+    "Alerts rejected by validation, batch items included.",
+    ["endpoint"],
+)
+fan_out_size = Histogram(
+    "notifications_fan_out_size",
+    "Notifications created by the fan-out of an alert.",
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000),
+)
+delivery_seconds = Histogram(
+    "notifications_delivery_seconds",
+    "Time spent in a channel strategy for one delivery.",
+    ["channel", "destination", "outcome"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+delivery_states = Counter(
+    "notifications_delivery_states_total",
+    "Recorded delivery outcomes: sent, retry (scheduled), failed (permanent), "
+    "deferred (not attempted) or pending (channel not implemented).",
+    ["status"],
+)
+task_seconds = Histogram(
+    "notifications_task_seconds",
+    "Run time of the Celery tasks, fan-out per alert included.",
+    ["task", "state"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+task_queue_lag_seconds = Histogram(
+    "notifications_task_queue_lag_seconds",
+    "Time between the publication of a task and its start.",
+    ["task", "queue"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+task_db_queries = Histogram(
+    "notifications_task_db_queries",
+    "SQL queries run by a Celery task.",
+    ["task"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500),
+)
+
+
+def registry() -> CollectorRegistry:
+    """Values of every process in multiprocess mode, of this one otherwise."""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    collector_registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collector_registry)
+    return collector_registry
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response: Callable) -> Callable:
+    """Times the alert webhooks, counts the payloads they reject."""
+
+    def observe(request: HttpRequest, response: HttpResponse, start: float) -> None:
+        match = request.resolver_match
+        if match is None or match.url_name not in INGESTION_VIEWS:
+            return
+        alert_ingestion_seconds.labels(match.url_name, response.status_code).observe(
+            time.perf_counter() - start
+        )
+        if response.status_code == 400:
+            alert_validation_failures.labels(match.url_name).inc()
+
+    if iscoroutinefunction(get_response):
+
+        async def middleware(request: HttpRequest) -> HttpResponse:
+            start = time.perf_counter()
+            response = await get_response(request)
+            observe(request, response, start)
+            return response
+
+    else:
+
+        def middleware(request: HttpRequest) -> HttpResponse:
+            start = time.perf_counter()
+            response = get_response(request)
+            observe(request, response, start)
+            return response
+
+    return middleware
+
+
+def observe_delivery(
+    channel: str, destination: str, outcome: str, seconds: float
+) -> None:
+    delivery_seconds.labels(channel, destination, outcome).observe(seconds)
+
+
+def observe_delivery_states(states: Iterable[Any]) -> None:
+    """Counts DeliveryState outcomes as they are recorded."""
+    for state in states:
+        delivery_states.labels(state.outcome).inc()
+
+
+class QueryCounter:
+    """Execute wrapper counting the queries of the connection it is set on."""
+
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+# task_id -> (start, query counter) of the tasks running in this process
+_running: dict[str, tuple[float, QueryCounter]] = {}
+
+
+@before_task_publish.connect
+def record_published_at(headers: dict | None = None, **kwargs: Any) -> None:
+    if headers is not None:
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+@task_prerun.connect
+def start_task_metrics(task_id: str, task: Any, **kwargs: Any) -> None:
+    if (published_at := getattr(task.request, PUBLISHED_AT_HEADER, None)) is not None:
+        queue = (task.request.delivery_info or {}).get("routing_key") or ""
+        task_queue_lag_seconds.labels(task.name, queue).observe(
+            max(0.0, time.time() - published_at)
+        )
+    counter = QueryCounter()
+    connection.execute_wrappers.append(counter)
+    _running[task_id] = (time.perf_counter(), counter)
+
+
+@task_postrun.connect
+def stop_task_metrics(
+    task_id: str, task: Any, state: str | None = None, **kwargs: Any
+) -> None:
+    if (running := _running.pop(task_id, None)) is None:
+        return
+    start, counter = running
+    if counter in connection.execute_wrappers:
+        connection.execute_wrappers.remove(counter)
+    task_seconds.labels(task.name, state or "").observe(time.perf_counter() - start)
+    task_db_queries.labels(task.name).observe(counter.count)
+
+
+@worker_init.connect
+def start_worker_metrics_server(**kwargs: Any) -> None:
+    """
+    Serves the metrics of the worker's processes from its main process, when
+    NOTIFICATION_METRICS_PORT is set. The values of a previous run are dropped.
+    """
+    if not (port := getattr(settings, "NOTIFICATION_METRICS_PORT", None)):
+        return
+    if path := os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        for name in os.listdir(path):
+            os.remove(os.path.join(path, name))
+    start_http_server(port, registry=registry())
+    logger.info(f"Metrics: Serving on port {port}")
+
+
+@worker_process_shutdown.connect
+def mark_worker_process_dead(**kwargs: Any) -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(os.getpid())
@@ -0,0 +1,42 @@
+# Generated by Django 5.2 on 2026-10-17 18:41
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def delete_duplicate_notifications(apps, schema_editor):
+    """Keeps the most recently modified notification of each recipient."""
+    Notification = apps.get_model("notifications", "Notification")
+    duplicates = (
+        Notification.objects.values("alert_id", "user_profile_id", "channel")
+        .annotate(count=Count("pk"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        duplicate.pop("count")
+        stale = Notification.objects.filter(**duplicate).order_by("-modified")[1:]
+        Notification.objects.filter(
+            pk__in=list(stale.values_list("pk", flat=True))
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="notification",
+            name="notificatio_alert_i_8e5f43_idx",
+        ),
+        migrations.RunPython(delete_duplicate_notifications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="notification",
+            constraint=models.UniqueConstraint(
+                fields=("alert", "user_profile", "channel"),
+                name="unique_notification_per_channel",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-17 18:52
+
+from datetime import datetime, timedelta, timezone
+
+from django.db import migrations, models
+
+
+def lease_pending_notifications(apps, schema_editor):
+    """
+    Pending rows get a due time after the Celery retries still queued
+    (300s delay), the sweeper then delivers those that no task recorded.
+    """
+    Notification = apps.get_model("notifications", "Notification")
+    Notification.objects.filter(status="pending").update(
+        next_attempt_at=datetime.now(timezone.utc) + timedelta(minutes=10)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0002_notification_unique_recipient"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="notification",
+            name="notificatio_status_a636d7_idx",
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="next_attempt_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the sweeper should deliver it (again), if pending",
+                null=True,
+                verbose_name="Next Attempt At",
+            ),
+        ),
+        migrations.RunPython(lease_pending_notifications, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                fields=["status", "next_attempt_at"],
+                name="notificatio_status_444bb6_idx",
+            ),
+        ),
+    ]
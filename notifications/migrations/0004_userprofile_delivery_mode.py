@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-17 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0003_notification_next_attempt_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userprofile",
+            name="delivery_mode",
+            field=models.CharField(
+                choices=[
+                    ("immediate", "One notification per alert"),
+                    ("digest", "Standard alerts coalesced per time window"),
+                ],
+                default="immediate",
+                help_text="Whether standard alerts are notified one by one or in a digest every NOTIFICATION_DIGEST_WINDOW seconds",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,176 @@
+# Generated by Django 5.2 on 2026-10-17 19:41
+
+import django.db.models.deletion
+import django.utils.timezone
+import model_utils.fields
+from django.db import migrations, models
+
+
+def backfill_sent_at(apps, schema_editor):
+    """Rows sent before: their last attempt was the successful one."""
+    Notification = apps.get_model("notifications", "Notification")
+    Notification.objects.filter(status="sent").update(
+        sent_at=models.F("last_attempt_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0005_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeliveryLatencyRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "created",
+                    model_utils.fields.AutoCreatedField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="created",
+                    ),
+                ),
+                (
+                    "modified",
+                    model_utils.fields.AutoLastModifiedField(
+                        default=django.utils.timezone.now,
+                        editable=False,
+                        verbose_name="modified",
+                    ),
+                ),
+                (
+                    "label",
+                    models.CharField(
+                        choices=[
+                            ("theft", "Theft"),
+                            ("suspicious", "Suspicious"),
+                            ("normal", "Normal"),
+                        ],
+                        max_length=20,
+                        verbose_name="Label",
+                    ),
+                ),
+                (
+                    "channel",
+                    models.CharField(
+                        choices=[
+                            ("webhook", "Webhook"),
+                            ("email", "Email"),
+                            ("sms", "SMS"),
+                        ],
+                        max_length=20,
+                        verbose_name="Channel",
+                    ),
+                ),
+                ("minute", models.DateTimeField(verbose_name="Minute")),
+                ("count", models.PositiveIntegerField(default=0, verbose_name="Count")),
+                (
+                    "total_seconds",
+                    models.FloatField(default=0, verbose_name="Total Seconds"),
+                ),
+                (
+                    "max_seconds",
+                    models.FloatField(default=0, verbose_name="Max Seconds"),
+                ),
+                (
+                    "histogram",
+                    models.JSONField(
+                        default=dict,
+                        help_text="Count per bucket index, see notifications.latency",
+                        verbose_name="Histogram",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Delivery Latency Rollup",
+                "verbose_name_plural": "Delivery Latency Rollups",
+            },
+        ),
+        migrations.CreateModel(
+            name="JobCursor",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=100,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Name",
+                    ),
+                ),
+                ("position", models.DateTimeField(verbose_name="Position")),
+            ],
+            options={
+                "verbose_name": "Job Cursor",
+                "verbose_name_plural": "Job Cursors",
+            },
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="first_attempt_at",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="First Attempt At"
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="queue_wait",
+            field=models.DurationField(
+                blank=True,
+                help_text="From the creation to the start of the first attempt",
+                null=True,
+                verbose_name="Queue Wait",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="sent_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the destination acknowledged the delivery",
+                null=True,
+                verbose_name="Sent At",
+            ),
+        ),
+        migrations.RunPython(backfill_sent_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("sent_at__isnull", False)),
+                fields=["sent_at"],
+                name="notification_sent_at_idx",
+            ),
+        ),
+        migrations.AddField(
+            model_name="deliverylatencyrollup",
+            name="store",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="notifications.store",
+                verbose_name="Store",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="deliverylatencyrollup",
+            index=models.Index(fields=["minute"], name="notificatio_minute_1b4e7b_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="deliverylatencyrollup",
+            constraint=models.UniqueConstraint(
+                fields=("store", "label", "channel", "minute"),
+                name="unique_latency_rollup",
+            ),
+        ),
+    ]
@@ -0,0 +1,125 @@
+import re
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from notifications import partitions
+
+
+def backfill_alert_time_spotted(apps, schema_editor):
+    Notification = apps.get_model("notifications", "Notification")
+    Alert = apps.get_model("notifications", "Alert")
+    Notification.objects.update(
+        alert_time_spotted=models.Subquery(
+            Alert.objects.filter(alert_uuid=models.OuterRef("alert_id")).values(
+                "time_spotted"
+            )[:1]
+        )
+    )
+
+
+def partition_table(cursor, table: str, pk: str, column: str) -> None:
+    """
+    Replaces the table by a table partitioned by month on column, with the
+    same rows, constraints and indexes. The primary key and the unique
+    constraints get the partition key, as PostgreSQL requires: see
+    notifications.partitions. Rows are copied, for large tables create the
+    partitioned table beforehand and attach the old one as a partition.
+    """
+    old = f"{table}_unpartitioned"
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid), contype FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('f', 'u')",
+        [old],
+    )
+    constraints = cursor.fetchall()
+    # the indexes that do not back a constraint
+    cursor.execute(
+        "SELECT pg_get_indexdef(i.indexrelid) FROM pg_index i "
+        "WHERE i.indrelid = %s::regclass AND NOT EXISTS ("
+        "SELECT 1 FROM pg_constraint c "
+        "WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid)",
+        [old],
+    )
+    indexes = [definition for (definition,) in cursor.fetchall()]
+
+    cursor.execute(
+        f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS '
+        f'INCLUDING CONSTRAINTS) PARTITION BY RANGE ("{column}")'
+    )
+    cursor.execute(
+        f'CREATE TABLE "{partitions.default_partition(table)}" '
+        f'PARTITION OF "{table}" DEFAULT'
+    )
+    cursor.execute(f'SELECT MIN("{column}") FROM "{old}"')
+    (first,) = cursor.fetchone()
+    now = datetime.now(timezone.utc)
+    month = partitions.month_start(min(first or now, now))
+    last = partitions.add_months(partitions.month_start(now), partitions.premake())
+    while month <= last:
+        partitions.create_partition(cursor, table, column, month)
+        month = partitions.add_months(month, 1)
+    cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+    cursor.execute(f'DROP TABLE "{old}"')
+
+    cursor.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY ("{pk}", "{column}")')
+    for name, definition, kind in constraints:
+        if kind == "u":
+            definition = re.sub(r"\)$", f', "{column}")', definition)
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+    for definition in indexes:
+        cursor.execute(definition.replace(old, f'"{table}"'))
+
+
+def partition_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for model_name, column in partitions.PARTITION_KEYS.items():
+            model = apps.get_model("notifications", model_name)
+            partition_table(cursor, model._meta.db_table, model._meta.pk.column, column)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0006_notification_latency"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="alert",
+            field=models.ForeignKey(
+                db_constraint=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="notifications",
+                to="notifications.alert",
+                verbose_name="Alert",
+            ),
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="alert_time_spotted",
+            field=models.DateTimeField(
+                editable=False,
+                help_text="Partition key, the time_spotted of the alert when created",
+                null=True,
+                verbose_name="Alert Time Spotted",
+            ),
+        ),
+        migrations.RunPython(backfill_alert_time_spotted, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="notification",
+            name="alert_time_spotted",
+            field=models.DateTimeField(
+                editable=False,
+                help_text="Partition key, the time_spotted of the alert when created",
+                verbose_name="Alert Time Spotted",
+            ),
+        ),
+        # the tables stay partitioned when unapplied
+        migrations.RunPython(partition_tables, migrations.RunPython.noop),
+    ]
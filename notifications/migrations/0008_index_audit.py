@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-17 19:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0007_partition_alerts_and_notifications"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="alert",
+            name="notificatio_label_45f1a6_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="notification",
+            name="notificatio_status_444bb6_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="userprofile",
+            name="notificatio_user_id_b358fe_idx",
+        ),
+        migrations.AlterField(
+            model_name="alert",
+            name="store",
+            field=models.ForeignKey(
+                db_index=False,
+                help_text="The store where the alert originated",
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="alerts",
+                to="notifications.store",
+                verbose_name="Store",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="notification",
+            name="alert",
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="notifications",
+                to="notifications.alert",
+                verbose_name="Alert",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["next_attempt_at"],
+                name="notification_due_idx",
+            ),
+        ),
+    ]
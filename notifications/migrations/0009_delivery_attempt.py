@@ -0,0 +1,137 @@
+# Generated by Django 5.2 on 2026-10-17 19:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from notifications.attempts import encode_body
+
+
+def move_response_data(apps, schema_editor):
+    """The last response of each notification becomes its first logged attempt."""
+    Notification = apps.get_model("notifications", "Notification")
+    DeliveryAttempt = apps.get_model("notifications", "DeliveryAttempt")
+    attempts = []
+    for notification_uuid, status, response_data, attempted_at, modified in (
+        Notification.objects.filter(response_data__isnull=False)
+        .values_list(
+            "notification_uuid",
+            "status",
+            "response_data",
+            "last_attempt_at",
+            "modified",
+        )
+        .iterator(chunk_size=2000)
+    ):
+        body = encode_body(response_data)
+        attempts.append(
+            DeliveryAttempt(
+                notification_id=notification_uuid,
+                attempted_at=attempted_at or modified,
+                outcome=status,
+                body=body.data,
+                body_truncated=body.truncated,
+                body_compressed=body.compressed,
+            )
+        )
+        if len(attempts) >= 2000:
+            DeliveryAttempt.objects.bulk_create(attempts)
+            attempts = []
+    DeliveryAttempt.objects.bulk_create(attempts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0008_index_audit"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeliveryAttempt",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("attempted_at", models.DateTimeField(verbose_name="Attempted At")),
+                (
+                    "outcome",
+                    models.CharField(
+                        help_text="sent, retry, failed or pending (channel not implemented)",
+                        max_length=20,
+                        verbose_name="Outcome",
+                    ),
+                ),
+                (
+                    "status_code",
+                    models.PositiveSmallIntegerField(
+                        blank=True, null=True, verbose_name="Status Code"
+                    ),
+                ),
+                (
+                    "duration",
+                    models.DurationField(
+                        blank=True, null=True, verbose_name="Duration"
+                    ),
+                ),
+                (
+                    "error_class",
+                    models.CharField(
+                        blank=True, max_length=100, verbose_name="Error Class"
+                    ),
+                ),
+                (
+                    "body",
+                    models.BinaryField(
+                        blank=True,
+                        help_text="Response or error, truncated to NOTIFICATION_ATTEMPT_BODY_LIMIT",
+                        null=True,
+                        verbose_name="Body",
+                    ),
+                ),
+                (
+                    "body_truncated",
+                    models.BooleanField(default=False, verbose_name="Body Truncated"),
+                ),
+                (
+                    "body_compressed",
+                    models.BooleanField(default=False, verbose_name="Body Compressed"),
+                ),
+                (
+                    "notification",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="attempts",
+                        to="notifications.notification",
+                        verbose_name="Notification",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Delivery Attempt",
+                "verbose_name_plural": "Delivery Attempts",
+                "ordering": ["-attempted_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["notification", "attempted_at"],
+                        name="notificatio_notific_c00beb_idx",
+                    ),
+                    models.Index(
+                        fields=["attempted_at"], name="notificatio_attempt_329d40_idx"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(move_response_data, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="notification",
+            name="response_data",
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2 on 2026-10-17 19:57
+
+import notifications.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0009_delivery_attempt"),
+    ]
+
+    # New keys only, the default is applied in Python (no SQL). Existing keys
+    # are kept: they are referenced by queued tasks, outbox messages and the
+    # attempt log, and version 4 and 7 UUIDs share the column. Inserts go to
+    # the right edge of the indexes from now on; old notifications leave with
+    # their partitions, REINDEX INDEX CONCURRENTLY compacts the rest.
+    operations = [
+        migrations.AlterField(
+            model_name="notification",
+            name="notification_uuid",
+            field=models.UUIDField(
+                default=notifications.ids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+                verbose_name="Notification UUID",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="userprofile",
+            name="id",
+            field=models.UUIDField(
+                default=notifications.ids.uuid7,
+                editable=False,
+                primary_key=True,
+                serialize=False,
+            ),
+        ),
+    ]
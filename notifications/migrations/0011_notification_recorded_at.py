@@ -0,0 +1,44 @@
+# Generated by Django 5.2 on 2026-10-17 20:25
+
+from django.db import migrations, models
+
+
+def backfill_recorded_at(apps, schema_editor):
+    """Rows sent before: the rollup cursor already went by their sent_at."""
+    Notification = apps.get_model("notifications", "Notification")
+    Notification.objects.filter(sent_at__isnull=False).update(
+        recorded_at=models.F("sent_at")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0010_time_ordered_keys"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="notification",
+            name="notification_sent_at_idx",
+        ),
+        migrations.AddField(
+            model_name="notification",
+            name="recorded_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When sent_at was written, by the database clock",
+                null=True,
+                verbose_name="Recorded At",
+            ),
+        ),
+        migrations.RunPython(backfill_recorded_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="notification",
+            index=models.Index(
+                condition=models.Q(("recorded_at__isnull", False)),
+                fields=["recorded_at"],
+                name="notification_recorded_at_idx",
+            ),
+        ),
+    ]
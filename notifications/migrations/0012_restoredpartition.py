@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0011_notification_recorded_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RestoredPartition",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=100,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="Name",
+                    ),
+                ),
+                (
+                    "keep_until",
+                    models.DateTimeField(
+                        help_text="The maintenance does not archive it again before",
+                        verbose_name="Keep Until",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Restored Partition",
+                "verbose_name_plural": "Restored Partitions",
+            },
+        ),
+    ]
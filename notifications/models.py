@@ -1,13 +1,19 @@
 import uuid
-from datetime import datetime, timezone
-from typing import Any
+from collections.abc import Callable, Iterable, Mapping
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
 
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import F
+from django.db import connections, models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Cast, Coalesce, Now
 from django.utils.translation import gettext_lazy as _
 from model_utils.models import TimeStampedModel
 
+from . import retries
+from .attempts import decode_body, encode_body
+from .ids import uuid7
+
 User = get_user_model()
 
 
@@ -33,6 +39,77 @@ class Store(TimeStampedModel):
         return self.location_id
 
 
+class AlertManager(models.Manager["Alert"]):
+    # first key of the transaction advisory locks taken on alert UUIDs
+    LOCK_CLASS = 0x616C7274  # "alrt"
+
+    def lock(self, alert_uuids: Iterable[uuid.UUID]) -> None:
+        """
+        Serializes the inserts of the same alerts on PostgreSQL, where the
+        partitioned table cannot enforce the uniqueness of alert_uuid (see
+        notifications.partitions): takes a transaction advisory lock per alert
+        UUID, in one order so that batches do not deadlock. A concurrent insert
+        of the same alert waits for the commit, then finds the row.
+        """
+        connection = connections[self.db]
+        keys = sorted({str(alert_uuid) for alert_uuid in alert_uuids})
+        if connection.vendor != "postgresql" or not keys:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, key) FROM ("
+                "SELECT hashtext(alert_uuid) AS key "
+                "FROM unnest(%s::text[]) AS alert_uuid ORDER BY key) AS keys",
+                [self.LOCK_CLASS, keys],
+            )
+
+    def upsert(
+        self,
+        alert_uuid: uuid.UUID,
+        store: Store,
+        url: str,
+        label: str,
+        time_spotted: datetime,
+    ) -> tuple["Alert", bool]:
+        """
+        Creates the alert or updates it when the source sends it again.
+        Returns whether anything changed: an exact re-delivery writes nothing.
+        """
+        with transaction.atomic(using=self.db):
+            self.lock([alert_uuid])
+            alert, created = self.get_or_create(
+                alert_uuid=alert_uuid,
+                defaults={
+                    "store": store,
+                    "url": url,
+                    "label": label,
+                    "time_spotted": time_spotted,
+                },
+            )
+        if created:
+            return alert, True
+
+        changed = [
+            name
+            for name, value in (
+                ("url", url),
+                ("label", label),
+                ("time_spotted", time_spotted),
+            )
+            if getattr(alert, name) != value
+        ]
+        if alert.store_id != store.pk:
+            changed.append("store")
+        # same row or not, the caller's instance saves a query on alert.store
+        alert.store = store
+        if not changed:
+            return alert, False
+
+        alert.url, alert.label, alert.time_spotted = url, label, time_spotted
+        alert.save(update_fields=[*changed, "modified"])
+        return alert, True
+
+
 class Alert(TimeStampedModel):
     class LabelChoices(models.TextChoices):
         THEFT = "theft", _("Theft")
@@ -51,6 +128,8 @@ class Alert(TimeStampedModel):
         related_name="alerts",
         verbose_name=_("Store"),
         help_text=_("The store where the alert originated"),
+        # the (store, time_spotted) index serves the lookups by store
+        db_index=False,
     )
     label = models.CharField(
         max_length=20,
@@ -61,13 +140,14 @@ class Alert(TimeStampedModel):
         help_text=_("Timestamp of when the alert was detected by the source")
     )
 
+    objects = AlertManager()
+
     class Meta(TimeStampedModel.Meta):
         verbose_name = _("Alert")
         verbose_name_plural = _("Alerts")
         indexes = [
             # fetch alerts in a given timeframe...
             models.Index(fields=["store", "time_spotted"]),
-            models.Index(fields=["label"]),
         ]
         ordering = ["-time_spotted"]
 
@@ -96,7 +176,12 @@ class UserProfile(TimeStampedModel):
         STANDARD = "standard", _("Standard alerts only")  # label: suspicious or normal
         ALL = "all", _("All alerts")
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    class DeliveryModeChoices(models.TextChoices):
+        IMMEDIATE = "immediate", _("One notification per alert")
+        # critical alerts are still delivered immediately
+        DIGEST = "digest", _("Standard alerts coalesced per time window")
+
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user_id = models.UUIDField(help_text="Opaque ID of the user in the external system")
 
     store = models.ForeignKey(
@@ -120,6 +205,28 @@ class UserProfile(TimeStampedModel):
             "User's preferred channel for receiving notifications (e.g., webhook, email)"
         ),
     )
+    delivery_mode = models.CharField(
+        max_length=20,
+        choices=DeliveryModeChoices.choices,
+        default=DeliveryModeChoices.IMMEDIATE,
+        help_text=_(
+            "Whether standard alerts are notified one by one or in a digest "
+            "every NOTIFICATION_DIGEST_WINDOW seconds"
+        ),
+    )
+
+    @classmethod
+    def preferences_for(cls, alert: Alert) -> list[str]:
+        """Notification preferences that should be notified of the alert."""
+        if alert.is_critical:
+            return [
+                cls.NotificationPreferenceChoices.ALL,
+                cls.NotificationPreferenceChoices.CRITICAL,
+            ]
+        return [
+            cls.NotificationPreferenceChoices.ALL,
+            cls.NotificationPreferenceChoices.STANDARD,
+        ]
 
     def should_notify(self, alert: Alert) -> bool:
         pref = self.notification_preference
@@ -138,7 +245,6 @@ class UserProfile(TimeStampedModel):
         verbose_name_plural = _("User Profiles")
         # one user profile per store
         unique_together = [["user_id", "store"]]
-        indexes = [models.Index(fields=["user_id", "store"])]
         ordering = ["-created"]
 
     def __str__(self) -> str:
@@ -146,20 +252,275 @@ class UserProfile(TimeStampedModel):
 
 
 class NotificationManager(models.Manager["Notification"]):
+    PENDING_DEFAULTS = {
+        "last_attempt_at": None,
+        "attempt_count": 0,
+        "first_attempt_at": None,
+        "queue_wait": None,
+    }
+
     def get_or_create_pending(
         self, alert: Alert, user_profile: UserProfile, channel: str
     ):
-        return self.update_or_create(
+        """
+        Creates the pending notification, or resets an existing one that was
+        not sent yet. A sent notification is returned as is.
+        """
+        notification, created = self.get_or_create(
             alert=alert,
             user_profile=user_profile,
             channel=channel,
             defaults={
                 "status": self.model.StatusChoices.PENDING,
-                "last_attempt_at": None,
-                "attempt_count": 0,
-                "response_data": None,
+                "next_attempt_at": retries.lease_expiry(),
+                **self.PENDING_DEFAULTS,
             },
         )
+        if not created and not notification.is_sent:
+            notification.status = self.model.StatusChoices.PENDING
+            notification.next_attempt_at = retries.lease_expiry()
+            for name, value in self.PENDING_DEFAULTS.items():
+                setattr(notification, name, value)
+            notification.save()
+        return notification, created
+
+    def bulk_create_pending(
+        self,
+        alert: Alert,
+        recipients: Iterable[tuple[uuid.UUID, str]],
+        due_at: Mapping[uuid.UUID, datetime] | None = None,
+    ) -> list[uuid.UUID]:
+        """
+        Set-based get_or_create_pending for many (user profile ID, channel) pairs:
+        one SELECT of the existing rows, one INSERT ... ON CONFLICT DO NOTHING
+        of the missing ones and, when the alert is fanned out again, one UPDATE
+        resetting the failed rows. Sent rows are never dispatched again, and
+        pending ones are already on their way (they read the alert when sent).
+
+        Profiles in due_at (digests) get that due time and are left to the
+        sweeper, only the UUIDs of the rows to enqueue now are returned.
+        """
+        recipients = set(recipients)
+        if not recipients:
+            return []
+
+        due_at = due_at or {}
+        # leased until the enqueued delivery records its outcome
+        lease_expiry = retries.lease_expiry()
+        existing = {
+            (profile_id, channel): (notification_uuid, status)
+            for notification_uuid, profile_id, channel, status in self.filter(
+                alert=alert
+            ).values_list("notification_uuid", "user_profile_id", "channel", "status")
+        }
+        # a concurrent fan-out may insert the same rows: its own UUIDs win
+        # and its deliveries send them, ours are then not found by the batch
+        created = self.bulk_create(
+            [
+                self.model(
+                    alert=alert,
+                    alert_time_spotted=alert.time_spotted,
+                    user_profile_id=profile_id,
+                    channel=channel,
+                    status=self.model.StatusChoices.PENDING,
+                    next_attempt_at=due_at.get(profile_id, lease_expiry),
+                    **self.PENDING_DEFAULTS,
+                )
+                for profile_id, channel in recipients
+                if (profile_id, channel) not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        reset = {
+            notification_uuid: profile_id
+            for (profile_id, channel), (notification_uuid, status) in existing.items()
+            if (profile_id, channel) in recipients
+            and status == self.model.StatusChoices.FAILED
+        }
+        if reset:
+            self.filter(
+                notification_uuid__in=list(reset),
+                status=self.model.StatusChoices.FAILED,
+            ).update(
+                status=self.model.StatusChoices.PENDING,
+                next_attempt_at=Case(
+                    *(
+                        When(user_profile_id=profile_id, then=Value(due))
+                        for profile_id, due in due_at.items()
+                        if profile_id in reset.values()
+                    ),
+                    default=Value(lease_expiry),
+                    output_field=models.DateTimeField(),
+                ),
+                **self.PENDING_DEFAULTS,
+            )
+        return [
+            notification.notification_uuid
+            for notification in created
+            if notification.user_profile_id not in due_at
+        ] + [
+            notification_uuid
+            for notification_uuid, profile_id in reset.items()
+            if profile_id not in due_at
+        ]
+
+    def record_deliveries(self, states: Iterable["DeliveryState"]) -> int:
+        """
+        Records the attempt and the outcome of many deliveries with a single
+        conditional UPDATE: attempt_count is incremented, status and
+        next_attempt_at are set per row, and rows already sent are left alone.
+        Deliveries that were not attempted (deferred) keep their attempt
+        fields. The responses go to the attempt log, see DeliveryAttempt.
+        The first attempt sets first_attempt_at and queue_wait, a success
+        sets sent_at, and recorded_at from the database clock.
+        """
+        states = {state.notification_uuid: state for state in states}
+        if not states:
+            return 0
+        attempted = [pk for pk, state in states.items() if state.attempted]
+        sent = [
+            pk
+            for pk, state in states.items()
+            if state.status == self.model.StatusChoices.SENT
+        ]
+        return (
+            self.filter(notification_uuid__in=list(states))
+            .exclude(status=self.model.StatusChoices.SENT)
+            .update(
+                attempt_count=Case(
+                    When(notification_uuid__in=attempted, then=F("attempt_count") + 1),
+                    default=F("attempt_count"),
+                    output_field=models.PositiveIntegerField(),
+                ),
+                first_attempt_at=Case(
+                    *(
+                        When(
+                            notification_uuid=pk,
+                            then=Coalesce(
+                                F("first_attempt_at"),
+                                Value(state.started_at or state.attempted_at),
+                            ),
+                        )
+                        for pk, state in states.items()
+                        if state.attempted
+                    ),
+                    default=F("first_attempt_at"),
+                    output_field=models.DateTimeField(),
+                ),
+                queue_wait=Case(
+                    *(
+                        When(
+                            notification_uuid=pk,
+                            then=Coalesce(F("queue_wait"), Value(state.queue_wait)),
+                        )
+                        for pk, state in states.items()
+                        if state.attempted and state.queue_wait is not None
+                    ),
+                    default=F("queue_wait"),
+                    output_field=models.DurationField(),
+                ),
+                sent_at=Case(
+                    *(
+                        When(notification_uuid=pk, then=Value(state.attempted_at))
+                        for pk, state in states.items()
+                        if state.status == self.model.StatusChoices.SENT
+                    ),
+                    default=F("sent_at"),
+                    output_field=models.DateTimeField(),
+                ),
+                recorded_at=Case(
+                    When(notification_uuid__in=sent, then=Now()),
+                    default=F("recorded_at"),
+                    output_field=models.DateTimeField(),
+                ),
+                last_attempt_at=Case(
+                    *(
+                        When(notification_uuid=pk, then=Value(state.attempted_at))
+                        for pk, state in states.items()
+                        if state.attempted
+                    ),
+                    default=F("last_attempt_at"),
+                    output_field=models.DateTimeField(),
+                ),
+                status=Case(
+                    *(
+                        When(notification_uuid=pk, then=Value(state.status))
+                        for pk, state in states.items()
+                    ),
+                    default=F("status"),
+                    output_field=models.CharField(),
+                ),
+                next_attempt_at=Case(
+                    *(
+                        When(
+                            notification_uuid=pk,
+                            # cast: a CASE of NULLs only is text on PostgreSQL
+                            then=Cast(
+                                Value(state.next_attempt_at),
+                                models.DateTimeField(),
+                            ),
+                        )
+                        for pk, state in states.items()
+                    ),
+                    output_field=models.DateTimeField(),
+                ),
+            )
+        )
+
+    def claim_due(self, limit: int) -> list[tuple[uuid.UUID, str]]:
+        """
+        Claims up to `limit` pending notifications whose next attempt is due,
+        retries as well as deliveries whose lease expired. Rows are locked with
+        SELECT ... FOR UPDATE SKIP LOCKED so that concurrent sweepers claim
+        disjoint sets, and leased again before the lock is released.
+        Returns (notification_uuid, alert label) pairs, to route them.
+        """
+        now = datetime.now(timezone.utc)
+        with transaction.atomic():
+            due = list(
+                # only the notification rows are locked, not their alert
+                self.select_for_update(skip_locked=True, of=("self",))
+                .filter(
+                    status=self.model.StatusChoices.PENDING,
+                    next_attempt_at__lte=now,
+                )
+                .order_by("next_attempt_at")
+                .values_list("notification_uuid", "alert__label")[:limit]
+            )
+            self.filter(
+                notification_uuid__in=[
+                    notification_uuid for notification_uuid, _ in due
+                ]
+            ).update(next_attempt_at=retries.lease_expiry(now))
+        return due
+
+
+class DeliveryState(NamedTuple):
+    """State of a notification after a delivery attempt, see record_deliveries."""
+
+    notification_uuid: uuid.UUID
+    status: str
+    response_data: str | None
+    attempted_at: datetime
+    # None when no further attempt is scheduled
+    next_attempt_at: datetime | None = None
+    # False when the delivery was deferred without being sent
+    attempted: bool = True
+    # when the attempt started, and how long the notification waited for it
+    started_at: datetime | None = None
+    queue_wait: timedelta | None = None
+    # HTTP status and exception class of the attempt, for the attempt log
+    status_code: int | None = None
+    error_class: str = ""
+
+    @property
+    def outcome(self) -> str:
+        """sent, retry (scheduled), failed, deferred (not attempted) or pending."""
+        if not self.attempted:
+            return "deferred"
+        if self.next_attempt_at is not None:
+            return "retry"
+        return self.status
 
 
 class Notification(TimeStampedModel):
@@ -170,13 +531,23 @@ class Notification(TimeStampedModel):
         FAILED = "failed", _("Failed")
 
     notification_uuid = models.UUIDField(
-        _("Notification UUID"), primary_key=True, default=uuid.uuid4, editable=False
+        _("Notification UUID"), primary_key=True, default=uuid7, editable=False
     )
     alert = models.ForeignKey(
         Alert,
         on_delete=models.CASCADE,
         related_name="notifications",
         verbose_name=_("Alert"),
+        # alerts are partitioned on PostgreSQL, their primary key includes
+        # time_spotted: see notifications.partitions
+        db_constraint=False,
+        # unique_notification_per_channel serves the lookups by alert
+        db_index=False,
+    )
+    alert_time_spotted = models.DateTimeField(
+        _("Alert Time Spotted"),
+        editable=False,
+        help_text=_("Partition key, the time_spotted of the alert when created"),
     )
     user_profile = models.ForeignKey(
         UserProfile,
@@ -197,8 +568,34 @@ class Notification(TimeStampedModel):
         default=StatusChoices.PENDING,
     )
     last_attempt_at = models.DateTimeField(_("Last Attempt At"), null=True, blank=True)
+    next_attempt_at = models.DateTimeField(
+        _("Next Attempt At"),
+        null=True,
+        blank=True,
+        help_text=_("When the sweeper should deliver it (again), if pending"),
+    )
     attempt_count = models.PositiveIntegerField(_("Attempt Count"), default=0)
-    response_data = models.TextField(_("Response Data"), blank=True, null=True)
+    first_attempt_at = models.DateTimeField(
+        _("First Attempt At"), null=True, blank=True
+    )
+    queue_wait = models.DurationField(
+        _("Queue Wait"),
+        null=True,
+        blank=True,
+        help_text=_("From the creation to the start of the first attempt"),
+    )
+    sent_at = models.DateTimeField(
+        _("Sent At"),
+        null=True,
+        blank=True,
+        help_text=_("When the destination acknowledged the delivery"),
+    )
+    recorded_at = models.DateTimeField(
+        _("Recorded At"),
+        null=True,
+        blank=True,
+        help_text=_("When sent_at was written, by the database clock"),
+    )
 
     objects = NotificationManager()
 
@@ -206,6 +603,11 @@ class Notification(TimeStampedModel):
     def is_sent(self) -> bool:
         return self.status == self.StatusChoices.SENT
 
+    def save(self, *args, **kwargs):
+        if self.alert_time_spotted is None:
+            self.alert_time_spotted = self.alert.time_spotted
+        super().save(*args, **kwargs)
+
     def mark_attempt(self):
         self.attempt_count = F("attempt_count") + 1
         self.last_attempt_at = datetime.now(timezone.utc)
@@ -214,14 +616,24 @@ class Notification(TimeStampedModel):
 
     def mark_sent(self, response_data: str):
         self.status = self.StatusChoices.SENT
-        self.response_data = response_data
-        self.save(update_fields=["status", "response_data"])
+        self.sent_at = datetime.now(timezone.utc)
+        self.recorded_at = Now()
+        self.save(update_fields=["status", "sent_at", "recorded_at"])
+        DeliveryAttempt.objects.record(
+            [DeliveryState(self.pk, self.status, response_data, self.sent_at)]
+        )
         return True
 
     def mark_failed(self, response_data: str):
         self.status = self.StatusChoices.FAILED
-        self.response_data = response_data
-        self.save(update_fields=["status", "response_data"])
+        self.save(update_fields=["status"])
+        DeliveryAttempt.objects.record(
+            [
+                DeliveryState(
+                    self.pk, self.status, response_data, datetime.now(timezone.utc)
+                )
+            ]
+        )
         return False
 
     def mark_pending(self):
@@ -229,22 +641,31 @@ class Notification(TimeStampedModel):
         self.save(update_fields=["status"])
         return True
 
-    def build_payload(self) -> dict[str, Any]:
-        return {
-            "url": self.alert.url,
-            "alert_uuid": str(self.alert.alert_uuid),
-            "location": self.alert.store.location_id,
-            "label": self.alert.label,
-            "target_user_id": str(self.user_profile.user_id),
-        }
-
     class Meta:
         verbose_name = _("Notification")
         verbose_name_plural = _("Notifications")
         ordering = ["-created"]
+        constraints = [
+            # one notification per recipient and channel, fan-out upserts on it
+            models.UniqueConstraint(
+                fields=["alert", "user_profile", "channel"],
+                name="unique_notification_per_channel",
+            ),
+        ]
         indexes = [
-            models.Index(fields=["alert", "user_profile", "channel"]),
-            models.Index(fields=["status", "last_attempt_at"]),
+            # claim_due: pending rows by due time, sent and failed rows are
+            # never scanned
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=Q(status="pending"),
+                name="notification_due_idx",
+            ),
+            # rollup_delivery_latency: rows recorded as sent since its last run
+            models.Index(
+                fields=["recorded_at"],
+                condition=Q(recorded_at__isnull=False),
+                name="notification_recorded_at_idx",
+            ),
         ]
 
     def __str__(self) -> str:
@@ -253,3 +674,265 @@ class Notification(TimeStampedModel):
             f"to user {self.user_profile.user_id} via {self.get_channel_display()} "
             f"({self.get_status_display()})"
         )
+
+
+class DeliveryAttemptManager(models.Manager["DeliveryAttempt"]):
+    def record(self, states: Iterable[DeliveryState]) -> list["DeliveryAttempt"]:
+        """
+        Appends the attempts to the log with a single INSERT, deliveries that
+        were not attempted (deferred) are not logged.
+        """
+        attempts = []
+        for state in states:
+            if not state.attempted:
+                continue
+            body = (
+                encode_body(state.response_data)
+                if state.response_data is not None
+                else None
+            )
+            attempts.append(
+                self.model(
+                    notification_id=state.notification_uuid,
+                    attempted_at=state.attempted_at,
+                    outcome=state.outcome,
+                    status_code=state.status_code,
+                    duration=(
+                        state.attempted_at - state.started_at
+                        if state.started_at
+                        else None
+                    ),
+                    error_class=state.error_class,
+                    body=body.data if body else None,
+                    body_truncated=bool(body and body.truncated),
+                    body_compressed=bool(body and body.compressed),
+                )
+            )
+        return self.bulk_create(attempts)
+
+    def prune(self, before: datetime, batch_size: int = 10_000) -> int:
+        """
+        Deletes the attempts made before `before`, batch_size rows per
+        statement so that no DELETE holds its locks for long.
+        """
+        pruned = 0
+        while batch := list(
+            self.filter(attempted_at__lt=before).values_list("id", flat=True)[
+                :batch_size
+            ]
+        ):
+            deleted, _ = self.filter(id__in=batch).delete()
+            pruned += deleted
+        return pruned
+
+
+class DeliveryAttempt(models.Model):
+    """
+    Append-only log of the delivery attempts, written in bulk with the
+    delivery states and pruned after NOTIFICATION_ATTEMPT_RETENTION seconds.
+    The notification row only keeps the latest state.
+    """
+
+    notification = models.ForeignKey(
+        Notification,
+        # rows are never deleted with their notification, they age out
+        on_delete=models.DO_NOTHING,
+        # notifications are partitioned on PostgreSQL, see notifications.partitions
+        db_constraint=False,
+        # the (notification, attempted_at) index serves the lookups
+        db_index=False,
+        related_name="attempts",
+        verbose_name=_("Notification"),
+    )
+    attempted_at = models.DateTimeField(_("Attempted At"))
+    outcome = models.CharField(
+        _("Outcome"),
+        max_length=20,
+        help_text=_("sent, retry, failed or pending (channel not implemented)"),
+    )
+    status_code = models.PositiveSmallIntegerField(
+        _("Status Code"), null=True, blank=True
+    )
+    duration = models.DurationField(_("Duration"), null=True, blank=True)
+    error_class = models.CharField(_("Error Class"), max_length=100, blank=True)
+    body = models.BinaryField(
+        _("Body"),
+        null=True,
+        blank=True,
+        help_text=_("Response or error, truncated to NOTIFICATION_ATTEMPT_BODY_LIMIT"),
+    )
+    body_truncated = models.BooleanField(_("Body Truncated"), default=False)
+    body_compressed = models.BooleanField(_("Body Compressed"), default=False)
+
+    objects = DeliveryAttemptManager()
+
+    class Meta:
+        verbose_name = _("Delivery Attempt")
+        verbose_name_plural = _("Delivery Attempts")
+        ordering = ["-attempted_at"]
+        indexes = [
+            # history of a notification
+            models.Index(fields=["notification", "attempted_at"]),
+            # prune
+            models.Index(fields=["attempted_at"]),
+        ]
+
+    @property
+    def response_body(self) -> str | None:
+        if self.body is None:
+            return None
+        return decode_body(self.body, self.body_compressed)
+
+    def __str__(self) -> str:
+        return (
+            f"Attempt of notification {self.notification_id} at "
+            f"{self.attempted_at:%Y-%m-%d %H:%M:%S}: {self.outcome}"
+        )
+
+
+class OutboxMessageManager(models.Manager["OutboxMessage"]):
+    def relay(
+        self, limit: int, publish: Callable[[list["OutboxMessage"]], None]
+    ) -> int:
+        """
+        Publishes up to `limit` unpublished messages, oldest first, and marks
+        them published. Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED
+        so that concurrent relays publish disjoint sets, and marked in the same
+        transaction: if publish raises, the whole batch is published again
+        (at-least-once, consumers must be idempotent).
+        """
+        with transaction.atomic():
+            messages = list(
+                self.select_for_update(skip_locked=True)
+                .filter(published_at__isnull=True)
+                .order_by("id")[:limit]
+            )
+            if not messages:
+                return 0
+            publish(messages)
+            self.filter(id__in=[message.id for message in messages]).update(
+                published_at=datetime.now(timezone.utc)
+            )
+        return len(messages)
+
+    def prune(self, before: datetime) -> int:
+        """Deletes the messages published before `before`."""
+        deleted, _ = self.filter(published_at__lt=before).delete()
+        return deleted
+
+
+class OutboxMessage(TimeStampedModel):
+    """
+    Task to publish to the broker, written in the transaction of the change
+    that requires it and relayed once committed (see notifications.outbox).
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    task = models.CharField(_("Task"), max_length=255)
+    args = models.JSONField(_("Arguments"), default=list)
+    options = models.JSONField(
+        _("Options"),
+        default=dict,
+        help_text=_("apply_async options, e.g. the queue and priority"),
+    )
+    published_at = models.DateTimeField(_("Published At"), null=True, blank=True)
+
+    objects = OutboxMessageManager()
+
+    class Meta:
+        verbose_name = _("Outbox Message")
+        verbose_name_plural = _("Outbox Messages")
+        ordering = ["id"]
+        indexes = [
+            # relay: only the unpublished rows, in order
+            models.Index(
+                fields=["id"],
+                condition=Q(published_at__isnull=True),
+                name="outbox_unpublished_idx",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        state = "published" if self.published_at else "unpublished"
+        return f"Outbox message {self.id}: {self.task}{tuple(self.args)} ({state})"
+
+
+class DeliveryLatencyRollup(TimeStampedModel):
+    """
+    Histogram of the detection-to-delivery latencies (sent_at - time_spotted)
+    of the notifications sent in a minute, per store, label and channel.
+    Maintained by notifications.latency.rollup_delivery_latency.
+    """
+
+    store = models.ForeignKey(
+        Store,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name=_("Store"),
+    )
+    label = models.CharField(
+        _("Label"), max_length=20, choices=Alert.LabelChoices.choices
+    )
+    channel = models.CharField(
+        _("Channel"), max_length=20, choices=ChannelChoices.choices
+    )
+    minute = models.DateTimeField(_("Minute"))
+    count = models.PositiveIntegerField(_("Count"), default=0)
+    total_seconds = models.FloatField(_("Total Seconds"), default=0)
+    max_seconds = models.FloatField(_("Max Seconds"), default=0)
+    histogram = models.JSONField(
+        _("Histogram"),
+        default=dict,
+        help_text=_("Count per bucket index, see notifications.latency"),
+    )
+
+    class Meta:
+        verbose_name = _("Delivery Latency Rollup")
+        verbose_name_plural = _("Delivery Latency Rollups")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["store", "label", "channel", "minute"],
+                name="unique_latency_rollup",
+            ),
+        ]
+        indexes = [
+            # rolling windows and pruning
+            models.Index(fields=["minute"]),
+        ]
+
+    def __str__(self) -> str:
+        return (
+            f"Latency of {self.label} alerts of {self.store_id} via {self.channel} "
+            f"at {self.minute:%Y-%m-%d %H:%M} ({self.count})"
+        )
+
+
+class JobCursor(models.Model):
+    """Position of an incremental job in the rows it processes."""
+
+    name = models.CharField(_("Name"), max_length=100, primary_key=True)
+    position = models.DateTimeField(_("Position"))
+
+    class Meta:
+        verbose_name = _("Job Cursor")
+        verbose_name_plural = _("Job Cursors")
+
+    def __str__(self) -> str:
+        return f"{self.name} at {self.position}"
+
+
+class RestoredPartition(models.Model):
+    """A partition loaded back from its archive, see notifications.partitions."""
+
+    name = models.CharField(_("Name"), max_length=100, primary_key=True)
+    keep_until = models.DateTimeField(
+        _("Keep Until"),
+        help_text=_("The maintenance does not archive it again before"),
+    )
+
+    class Meta:
+        verbose_name = _("Restored Partition")
+        verbose_name_plural = _("Restored Partitions")
+
+    def __str__(self) -> str:
+        return f"{self.name} until {self.keep_until}"
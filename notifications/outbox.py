@@ -0,0 +1,59 @@
+import logging
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+
+from celery import current_app, group
+from django.conf import settings
+
+from .models import OutboxMessage
+from .priority import task_options
+from .tasks import fan_out_notifications
+
+logger = logging.getLogger(__name__)
+
+# Transactional outbox: the ingestion path does not publish to the broker, it
+# writes an OutboxMessage in the transaction of the alert. A relay process
+# (manage.py relay_outbox) drains the committed messages in batches, publishes
+# each batch in one go and marks its rows published. A broker outage only
+# delays the fan-out, and no request waits on a broker round trip.
+
+
+def enqueue_fan_out(alert_labels: Mapping[str, str]) -> None:
+    """
+    Writes the fan-out of several alerts, given as alert_uuid -> label, to the
+    outbox with a single INSERT. Must be called in the transaction of the alerts.
+    """
+    OutboxMessage.objects.bulk_create(
+        [
+            OutboxMessage(
+                task=fan_out_notifications.name,
+                args=[alert_uuid],
+                options=task_options(label),
+            )
+            for alert_uuid, label in alert_labels.items()
+        ]
+    )
+
+
+def publish(messages: list[OutboxMessage]) -> None:
+    """Publishes the messages as one group: one producer and connection."""
+    group(
+        current_app.signature(message.task, args=message.args, **message.options)
+        for message in messages
+    ).apply_async()
+
+
+def relay_outbox(batch_size: int | None = None) -> int:
+    """Publishes one batch of the outbox, returns its size."""
+    batch_size = batch_size or getattr(settings, "NOTIFICATION_OUTBOX_BATCH_SIZE", 500)
+    relayed = OutboxMessage.objects.relay(batch_size, publish)
+    if relayed:
+        logger.info(f"Outbox: Published {relayed} messages")
+    return relayed
+
+
+def prune_outbox() -> int:
+    """Deletes the messages published more than NOTIFICATION_OUTBOX_RETENTION ago."""
+    retention = getattr(settings, "NOTIFICATION_OUTBOX_RETENTION", 86400.0)
+    before = datetime.now(timezone.utc) - timedelta(seconds=retention)
+    return OutboxMessage.objects.prune(before)
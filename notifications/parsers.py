@@ -0,0 +1,155 @@
+import codecs
+import json
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import IO, Any
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class MalformedItem:
+    """Placeholder yielded for a batch item that could not be decoded."""
+
+    message: str
+
+
+def _get_encoding(parser_context: dict[str, Any] | None) -> str:
+    parser_context = parser_context or {}
+    return parser_context.get("encoding", settings.DEFAULT_CHARSET)
+
+
+def iter_json_array(stream: IO[bytes], encoding: str = "utf-8") -> Iterator[Any]:
+    """
+    Incrementally decodes a top-level JSON array, yielding one element at a time
+    so that a large batch is never fully materialised in memory.
+    A syntax error yields a MalformedItem and stops the iteration,
+    since the position of the next element cannot be recovered.
+    Bytes that are not valid in the encoding do the same once items were
+    yielded, and reject the body before.
+    """
+    decoded = False
+    try:
+        for item in _iter_json_array(stream, encoding):
+            decoded = True
+            yield item
+    except UnicodeDecodeError as exc:
+        if not decoded:
+            raise ParseError(f"JSON parse error - {exc.reason}") from exc
+        yield MalformedItem(f"JSON parse error - {exc.reason}")
+
+
+def _iter_json_array(stream: IO[bytes], encoding: str) -> Iterator[Any]:
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder(encoding)()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buffer, pos, eof
+        if eof:
+            return False
+        chunk = stream.read(CHUNK_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + text_decoder.decode(chunk or b"", final=eof)
+        pos = 0
+        return True
+
+    def skip_whitespace() -> str | None:
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return buffer[pos]
+            if not fill():
+                return None
+
+    if skip_whitespace() != "[":
+        raise ParseError("Expected a JSON array of alerts.")
+    pos += 1
+
+    if skip_whitespace() == "]":
+        return
+
+    while True:
+        if skip_whitespace() is None:
+            yield MalformedItem("Unexpected end of JSON array.")
+            return
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as exc:
+            # the element may simply be cut by the chunk boundary
+            if fill():
+                continue
+            yield MalformedItem(f"JSON parse error - {exc.msg}")
+            return
+        if end == len(buffer) and fill():
+            # a trailing scalar (e.g. a number) may continue in the next chunk
+            continue
+        pos = end
+        yield item
+
+        match skip_whitespace():
+            case ",":
+                pos += 1
+            case "]":
+                return
+            case None:
+                yield MalformedItem("Unexpected end of JSON array.")
+                return
+            case _:
+                yield MalformedItem("JSON parse error - Expecting ',' delimiter")
+                return
+
+
+def iter_ndjson(stream: IO[bytes], encoding: str = "utf-8") -> Iterator[Any]:
+    """
+    Decodes a newline-delimited JSON stream line by line.
+    Each malformed line yields a MalformedItem, the following lines are still read.
+    """
+    for raw_line in stream:
+        try:
+            line = raw_line.decode(encoding).strip()
+        except UnicodeDecodeError as exc:
+            yield MalformedItem(f"JSON parse error - {exc.reason}")
+            continue
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield MalformedItem(f"JSON parse error - {exc.msg}")
+
+
+class JSONArrayStreamParser(BaseParser):
+    """Parses a JSON array lazily, `request.data` is an iterator of items."""
+
+    media_type = "application/json"
+
+    def parse(
+        self,
+        stream: IO[bytes],
+        media_type: str | None = None,
+        parser_context: dict[str, Any] | None = None,
+    ) -> Iterator[Any]:
+        return iter_json_array(stream, _get_encoding(parser_context))
+
+
+class NDJSONParser(BaseParser):
+    """Parses an NDJSON stream lazily, `request.data` is an iterator of items."""
+
+    media_type = "application/x-ndjson"
+
+    def parse(
+        self,
+        stream: IO[bytes],
+        media_type: str | None = None,
+        parser_context: dict[str, Any] | None = None,
+    ) -> Iterator[Any]:
+        return iter_ndjson(stream, _get_encoding(parser_context))
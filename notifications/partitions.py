@@ -0,0 +1,290 @@
+import gzip
+import logging
+import os
+import re
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Alert, Notification, RestoredPartition
+
+logger = logging.getLogger(__name__)
+
+# Alert and Notification are range partitioned by month on PostgreSQL (see
+# migration 0007): alerts on time_spotted, notifications on the time_spotted
+# of their alert, so that an alert and its notifications share a month and
+# age out together. Rows outside of the existing partitions go to a default
+# partition, never archived.
+#
+# PostgreSQL requires the partition key in every primary key and unique
+# constraint, the database keys are therefore (alert_uuid, time_spotted),
+# (notification_uuid, alert_time_spotted) and (alert, user_profile, channel,
+# alert_time_spotted). A fan-out run again still conflicts with the existing
+# rows, as the key comes from the alert, but an alert redelivered with another
+# time_spotted would not: inserts of an alert are serialized by an advisory
+# lock on its UUID instead (AlertManager.lock), and find the existing row.
+# Django keeps the single column primary keys, and notifications have no
+# database foreign key to their alert. New unique constraints on these tables
+# must include the partition key.
+#
+# maintain_partitions creates the partitions of the next
+# NOTIFICATION_PARTITION_PREMAKE months, and archives the ones older than
+# NOTIFICATION_PARTITION_RETENTION months: each is detached, exported to
+# NOTIFICATION_ARCHIVE_DIR as gzipped NDJSON (one row_to_json object per
+# line) and dropped. manage.py restore_partitions loads them back, and the
+# maintenance leaves a restored partition alone for
+# NOTIFICATION_PARTITION_RESTORE_DAYS days (RestoredPartition).
+
+PARTITION_KEYS = {"Alert": "time_spotted", "Notification": "alert_time_spotted"}
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+ARCHIVE_SUFFIX = ".ndjson.gz"
+# session advisory lock held by maintain_partitions, runs do not overlap
+LOCK_KEY = 0x6E6F7469  # "noti"
+EXPORT_CHUNK_SIZE = 2000
+RESTORE_BATCH_SIZE = 1000
+
+
+def partitioned_tables() -> dict[str, str]:
+    """Table -> partition key column."""
+    return {
+        model._meta.db_table: PARTITION_KEYS[model.__name__]
+        for model in (Alert, Notification)
+    }
+
+
+def premake() -> int:
+    return getattr(settings, "NOTIFICATION_PARTITION_PREMAKE", 3)
+
+
+def retention() -> int:
+    """Months of partitions kept, 0 keeps them all."""
+    return getattr(settings, "NOTIFICATION_PARTITION_RETENTION", 12)
+
+
+def restore_days() -> int:
+    """Days a restored partition is kept before being archived again."""
+    return getattr(settings, "NOTIFICATION_PARTITION_RESTORE_DAYS", 7)
+
+
+def archive_dir() -> Path:
+    return Path(getattr(settings, "NOTIFICATION_ARCHIVE_DIR", "archive"))
+
+
+def month_start(moment: datetime) -> datetime:
+    moment = moment.astimezone(timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def default_partition(table: str) -> str:
+    return f"{table}_default"
+
+
+def parse_partition_name(name: str) -> tuple[str, datetime] | None:
+    """(table, month) of a partition name, None for other tables."""
+    if (match := PARTITION_NAME.match(name)) is None:
+        return None
+    month = datetime(int(match["year"]), int(match["month"]), 1, tzinfo=timezone.utc)
+    return match["table"], month
+
+
+def is_partitioned() -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)",
+            [Alert._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def attached_partitions(cursor, table: str) -> set[str]:
+    cursor.execute(
+        "SELECT inhrelid::regclass::text FROM pg_inherits "
+        "WHERE inhparent = %s::regclass",
+        [table],
+    )
+    return {name.strip('"') for (name,) in cursor.fetchall()}
+
+
+def create_partition(cursor, table: str, column: str, month: datetime) -> str:
+    """
+    Creates the partition of the month and moves its rows out of the default
+    partition, which would otherwise prevent the attachment. The partition
+    gets its indexes and foreign keys from the parent when attached.
+    """
+    name = partition_name(table, month)
+    bounds = [month, add_months(month, 1)]
+    cursor.execute(
+        f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS '
+        f"INCLUDING CONSTRAINTS)"
+    )
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{default_partition(table)}" '
+        f'WHERE "{column}" >= %s AND "{column}" < %s RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved',
+        bounds,
+    )
+    cursor.execute(
+        f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" '
+        f"FOR VALUES FROM (%s) TO (%s)",
+        bounds,
+    )
+    return name
+
+
+def ensure_partitions(now: datetime | None = None) -> list[str]:
+    """
+    Creates the missing partitions of the current month and of the next
+    premake() months, returns their names.
+    """
+    now = now or datetime.now(timezone.utc)
+    current = month_start(now)
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for table, column in partitioned_tables().items():
+            existing = attached_partitions(cursor, table)
+            for offset in range(premake() + 1):
+                month = add_months(current, offset)
+                if partition_name(table, month) not in existing:
+                    created.append(create_partition(cursor, table, column, month))
+    if created:
+        logger.info(f"Partitions: Created {', '.join(created)}")
+    return created
+
+
+def _export(cursor, name: str) -> Path:
+    """Writes the rows of the table to the archive, returns the file."""
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}{ARCHIVE_SUFFIX}"
+    partial = path.with_name(f"{path.name}.partial")
+    with gzip.open(partial, "wt", encoding="utf-8") as archive:
+        cursor.execute(f'SELECT row_to_json(t)::text FROM "{name}" t')
+        while rows := cursor.fetchmany(EXPORT_CHUNK_SIZE):
+            archive.writelines(f"{row}\n" for (row,) in rows)
+        archive.flush()
+        os.fsync(archive.fileno())
+    # a complete archive only, once written
+    os.replace(partial, path)
+    return path
+
+
+def archive_partitions(now: datetime | None = None) -> list[Path]:
+    """
+    Detaches the partitions older than retention() months, exports them and
+    drops them, returns the archives. Restored partitions are skipped until
+    their keep_until. A partition detached by an interrupted run is exported
+    and dropped by the next one.
+    """
+    if not retention():
+        return []
+    now = now or datetime.now(timezone.utc)
+    cutoff = add_months(month_start(now), -retention())
+    tables = partitioned_tables()
+    RestoredPartition.objects.filter(keep_until__lte=now).delete()
+    kept = set(RestoredPartition.objects.values_list("name", flat=True))
+    archived = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_class c WHERE c.relkind = 'r' "
+            "AND c.relnamespace = current_schema()::regnamespace "
+            "AND NOT c.relispartition"
+        )
+        detached = [
+            name
+            for (name,) in cursor.fetchall()
+            if (parsed := parse_partition_name(name)) and parsed[0] in tables
+        ]
+        for table in tables:
+            for name in sorted(attached_partitions(cursor, table)):
+                parsed = parse_partition_name(name)
+                if parsed and parsed[1] < cutoff and name not in kept:
+                    # no write reaches the partition once detached
+                    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                    detached.append(name)
+    for name in detached:
+        with transaction.atomic(), connection.chunked_cursor() as cursor:
+            path = _export(cursor, name)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE "{name}"')
+        logger.info(f"Partitions: Archived {name} to {path}")
+        archived.append(path)
+    return archived
+
+
+def maintain_partitions(now: datetime | None = None) -> None:
+    """Creates the upcoming partitions and archives the expired ones."""
+    if not is_partitioned():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [LOCK_KEY])
+        if not cursor.fetchone()[0]:
+            logger.info("Partitions: Maintenance already running")
+            return
+        try:
+            ensure_partitions(now)
+            archive_partitions(now)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [LOCK_KEY])
+
+
+def _read_archive(path: Path) -> Iterator[list[str]]:
+    batch = []
+    with gzip.open(path, "rt", encoding="utf-8") as archive:
+        for line in archive:
+            if line := line.strip():
+                batch.append(line)
+            if len(batch) >= RESTORE_BATCH_SIZE:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def restore_partition(path: Path, keep_until: datetime | None = None) -> int:
+    """
+    Loads an archive back into its partition, created if missing, in one
+    transaction. Rows already there are skipped, returns the number of rows
+    inserted. A partition older than retention() months is archived again
+    by the first maintenance after keep_until, restore_days() from now by
+    default.
+    """
+    name = path.name.removesuffix(ARCHIVE_SUFFIX)
+    tables = partitioned_tables()
+    if (parsed := parse_partition_name(name)) is None or parsed[0] not in tables:
+        raise ValueError(f"{path.name} is not a partition archive")
+    table, month = parsed
+    restored = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        if name not in attached_partitions(cursor, table):
+            create_partition(cursor, table, tables[table], month)
+        for batch in _read_archive(path):
+            cursor.execute(
+                f'INSERT INTO "{table}" SELECT * FROM '
+                f'jsonb_populate_recordset(NULL::"{table}", %s::jsonb) '
+                f"ON CONFLICT DO NOTHING",
+                [f"[{','.join(batch)}]"],
+            )
+            restored += cursor.rowcount
+        RestoredPartition.objects.update_or_create(
+            name=name,
+            defaults={
+                "keep_until": keep_until
+                or datetime.now(timezone.utc) + timedelta(days=restore_days())
+            },
+        )
+    logger.info(f"Partitions: Restored {restored} rows of {name} from {path}")
+    return restored
@@ -0,0 +1,120 @@
+import json
+import logging
+import uuid
+from collections.abc import Sequence
+from datetime import datetime
+
+import redis
+from django.conf import settings
+
+from notifications.exceptions import NotificationPermanentError
+
+from .cache import LocalTTLCache, get_redis
+from .models import Alert, Notification
+from .serializers import OutgoingAlertSerializer
+
+logger = logging.getLogger(__name__)
+
+SHARED_PAYLOADS_KEY = "notifications:payloads"
+
+
+class PayloadTemplateCache:
+    """
+    Outgoing payloads share everything but target_user_id between the
+    recipients of an alert. The alert part is validated and JSON-encoded once,
+    at fan-out, and each delivery only splices the recipient in.
+
+    Templates are cached per worker and in Redis when NOTIFICATION_REDIS_URL
+    is set. Keys carry the alert's modified timestamp, so that an alert sent
+    again with new data gets a new template.
+    """
+
+    def __init__(self) -> None:
+        self._cache: LocalTTLCache[str, bytes] = LocalTTLCache(
+            maxsize=getattr(settings, "NOTIFICATION_PAYLOAD_CACHE_SIZE", 10_000),
+            ttl=getattr(settings, "NOTIFICATION_PAYLOAD_CACHE_TTL", 3600),
+        )
+
+    @staticmethod
+    def _key(alert_uuid: uuid.UUID, modified: datetime) -> str:
+        return f"{SHARED_PAYLOADS_KEY}:{alert_uuid}:{modified.timestamp()}"
+
+    @staticmethod
+    def _build(alert: Alert) -> bytes:
+        serializer = OutgoingAlertSerializer(
+            data={
+                "url": alert.url,
+                "alert_uuid": str(alert.alert_uuid),
+                # store_id is the location ID, no need to load the store
+                "location": alert.store_id,
+                "label": alert.label,
+            }
+        )
+        if not serializer.is_valid():
+            # permanent error—bad schema
+            raise NotificationPermanentError(
+                f"Invalid outgoing payload: {serializer.errors}"
+            )
+        body = json.dumps(serializer.data, separators=(",", ":")).encode()
+        # left open, render() appends the recipient and closes the object
+        return body[:-1] + b',"target_user_id":"'
+
+    def _get_shared(self, key: str) -> bytes | None:
+        if (client := get_redis()) is None:
+            return None
+        try:
+            return client.get(key)
+        except redis.RedisError:
+            logger.exception("Payloads: Failed to read the shared payload cache")
+            return None
+
+    def _set_shared(self, key: str, template: bytes) -> None:
+        if (client := get_redis()) is None:
+            return
+        try:
+            client.set(key, template, ex=int(self._cache.ttl))
+        except redis.RedisError:
+            logger.exception("Payloads: Failed to write the shared payload cache")
+
+    def get(self, alert: Alert) -> bytes:
+        """Template of the alert, raises NotificationPermanentError if invalid."""
+        key = self._key(alert.alert_uuid, alert.modified)
+        if (template := self._cache.get(key)) is None:
+            if (template := self._get_shared(key)) is None:
+                template = self._build(alert)
+                self._set_shared(key, template)
+            self._cache.set(key, template)
+        return template
+
+    def render(self, alert: Alert, target_user_id: uuid.UUID) -> bytes:
+        # str() of a UUID is hex and dashes, safe to splice in without escaping
+        return self.get(alert) + str(target_user_id).encode() + b'"}'
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+
+payload_templates = PayloadTemplateCache()
+
+
+def build_payload(notification: Notification) -> bytes:
+    """JSON body sent for the notification."""
+    return payload_templates.render(
+        notification.alert, notification.user_profile.user_id
+    )
+
+
+def build_digest_payload(notifications: Sequence[Notification]) -> bytes:
+    """
+    JSON body of a digest: the recipient, and the payload each notification
+    would have been sent with on its own.
+    """
+    user_id = notifications[0].user_profile.user_id
+    alerts = b",".join(
+        payload_templates.render(notification.alert, user_id)
+        for notification in notifications
+    )
+    return b'{"target_user_id":"%s","alerts":[%s]}' % (str(user_id).encode(), alerts)
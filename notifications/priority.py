@@ -0,0 +1,56 @@
+from collections.abc import Iterable
+from typing import Any
+
+from django.conf import settings
+
+from .models import Alert
+
+# Celery routing of the notification tasks. Critical (theft) alerts go to their
+# own queue, consumed by a dedicated worker, so that a backlog of standard
+# alerts never delays them. Within a queue, broker priorities (Redis: 0 is the
+# highest) order the messages by label, first attempts ahead of retries.
+
+LABEL_PRIORITIES = {
+    Alert.LabelChoices.THEFT: 0,
+    Alert.LabelChoices.SUSPICIOUS: 3,
+    Alert.LabelChoices.NORMAL: 6,
+}
+# added to the priority of the deliveries enqueued again by the sweeper
+RETRY_PRIORITY_PENALTY = 3
+LOWEST_PRIORITY = 9
+
+
+def critical_queue() -> str:
+    return getattr(settings, "NOTIFICATION_CRITICAL_QUEUE", "notifications.critical")
+
+
+def standard_queue() -> str:
+    return getattr(settings, "NOTIFICATION_STANDARD_QUEUE", "notifications")
+
+
+def queue_for(label: str) -> str:
+    if label == Alert.LabelChoices.THEFT:
+        return critical_queue()
+    return standard_queue()
+
+
+def task_options(label: str, retry: bool = False) -> dict[str, Any]:
+    """apply_async options of a task handling an alert with the given label."""
+    options: dict[str, Any] = {"queue": queue_for(label)}
+    if getattr(settings, "NOTIFICATION_BROKER_PRIORITIES", False):
+        priority = LABEL_PRIORITIES.get(label, LOWEST_PRIORITY)
+        if retry:
+            priority += RETRY_PRIORITY_PENALTY
+        options["priority"] = min(priority, LOWEST_PRIORITY)
+    return options
+
+
+def batch_options(labels: Iterable[str], retry: bool = False) -> dict[str, Any]:
+    """
+    Options of a task handling alerts of a single queue but several labels:
+    the priority of the most urgent one.
+    """
+    return min(
+        (task_options(label, retry) for label in labels),
+        key=lambda options: options.get("priority", 0),
+    )
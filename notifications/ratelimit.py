@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+import redis
+from django.conf import settings
+
+from .cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KEY = "notifications:ratelimit"
+
+# Token bucket refilled at `rate` tokens per second up to `burst`. A token is
+# reserved if it is available within `max_wait` seconds: the bucket may then go
+# below zero and the caller waits before sending. Otherwise nothing is taken.
+# The key expires once the bucket would be full again, up to `max_wait` later
+# for the tokens owed.
+# Redis' clock is used so that every worker shares the same time.
+# Returns the wait in seconds, negative when the token was not reserved.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_wait = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or burst
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+
+local wait = math.max(0, (1 - tokens) / rate)
+if wait > max_wait then
+    return tostring(-wait)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens - 1, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate + max_wait) + 1)
+return tostring(wait)
+"""
+
+
+class Reservation(NamedTuple):
+    granted: bool
+    # seconds to wait before sending if granted, until a token is available if not
+    wait: float
+
+
+class RateLimit(NamedTuple):
+    rate: float
+    burst: int
+
+
+def get_rate_limit(destination: str) -> RateLimit | None:
+    """
+    Limit of a destination from NOTIFICATION_WEBHOOK_RATE_LIMITS, else the
+    default rate, None when the destination is not limited.
+    """
+    limits = getattr(settings, "NOTIFICATION_WEBHOOK_RATE_LIMITS", {})
+    if destination in limits:
+        rate, burst = limits[destination]
+    else:
+        rate = getattr(settings, "NOTIFICATION_WEBHOOK_DEFAULT_RATE", 0)
+        burst = getattr(settings, "NOTIFICATION_WEBHOOK_DEFAULT_BURST", 0) or rate
+    if rate <= 0:
+        return None
+    return RateLimit(float(rate), max(1, int(burst)))
+
+
+class LocalTokenBuckets:
+    """Same algorithm as TOKEN_BUCKET_SCRIPT, for a single process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def reserve(self, key: str, limit: RateLimit, max_wait: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated_at = self._buckets.get(key, (limit.burst, now))
+            tokens = min(limit.burst, tokens + max(0.0, now - updated_at) * limit.rate)
+            wait = max(0.0, (1 - tokens) / limit.rate)
+            if wait > max_wait:
+                return -wait
+            self._buckets[key] = (tokens - 1, now)
+            return wait
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RateLimiter:
+    """
+    Token bucket per destination shared by every worker: an atomic Lua script
+    in Redis when NOTIFICATION_REDIS_URL is set, process-local buckets otherwise.
+    Redis errors fail open: the delivery is then not throttled.
+    """
+
+    def __init__(self) -> None:
+        self._local = LocalTokenBuckets()
+        self._script: redis.commands.core.Script | None = None
+        self._script_client: redis.Redis | None = None
+
+    def _get_script(self, client: redis.Redis) -> redis.commands.core.Script:
+        # registered once per client, then run by its SHA (EVALSHA)
+        if self._script is None or self._script_client is not client:
+            self._script = client.register_script(TOKEN_BUCKET_SCRIPT)
+            self._script_client = client
+        return self._script
+
+    def reserve(self, destination: str, max_wait: float = 0.0) -> Reservation:
+        """
+        Takes a token of the destination if one is available within max_wait
+        seconds. When not granted, nothing is taken and wait tells when to
+        come back.
+        """
+        if (limit := get_rate_limit(destination)) is None:
+            return Reservation(True, 0.0)
+
+        key = f"{RATE_LIMIT_KEY}:{destination}"
+        if (client := get_redis()) is None:
+            wait = self._local.reserve(key, limit, max_wait)
+        else:
+            try:
+                wait = float(
+                    self._get_script(client)(
+                        keys=[key], args=[limit.rate, limit.burst, max_wait]
+                    )
+                )
+            except redis.RedisError:
+                logger.exception(f"RateLimit: Failed to reserve for {destination}")
+                return Reservation(True, 0.0)
+        return Reservation(wait >= 0, abs(wait))
+
+    def clear(self) -> None:
+        self._local.clear()
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,40 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from django.conf import settings
+
+# Retry policy of the deliveries. Due times are stored on the notification
+# (next_attempt_at) and picked up by the sweep_due_notifications task, so that
+# no retry waits in the broker and a crashed worker's rows come back on their own.
+
+
+def max_attempts() -> int:
+    return getattr(settings, "NOTIFICATION_MAX_ATTEMPTS", 6)
+
+
+def retry_delay(attempt_count: int) -> float:
+    """
+    Exponential backoff with equal jitter, in seconds, after attempt_count
+    attempts: half of the delay is fixed, the other half random, so that
+    retries of a burst spread out without ever being immediate.
+    """
+    base = getattr(settings, "NOTIFICATION_RETRY_BASE_DELAY", 30.0)
+    cap = getattr(settings, "NOTIFICATION_RETRY_MAX_DELAY", 3600.0)
+    delay = min(cap, base * 2 ** max(0, attempt_count - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def next_attempt_at(attempt_count: int, now: datetime | None = None) -> datetime:
+    now = now or datetime.now(timezone.utc)
+    return now + timedelta(seconds=retry_delay(attempt_count))
+
+
+def lease_expiry(now: datetime | None = None) -> datetime:
+    """
+    Due time of an enqueued delivery: if its worker dies before recording
+    the outcome, the sweeper delivers it again once the lease expires.
+    """
+    now = now or datetime.now(timezone.utc)
+    return now + timedelta(
+        seconds=getattr(settings, "NOTIFICATION_DELIVERY_LEASE", 600.0)
+    )
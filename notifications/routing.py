@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import NamedTuple
+
+import redis
+from django.conf import settings
+
+from .cache import LocalTTLCache, get_redis
+from .models import Alert, UserProfile
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "notifications:routing:invalidate"
+
+
+class Subscriber(NamedTuple):
+    profile_id: uuid.UUID
+    user_id: uuid.UUID
+    preference: str
+    preferred_channel: str
+    delivery_mode: str
+
+
+class StoreRoutingCache:
+    """
+    Worker-local cache of the subscribers of each store, keyed by location ID,
+    so that fan-out for a hot store needs no profile query.
+
+    Entries are bounded (LRU) and expire after a TTL. They are also evicted
+    explicitly by the UserProfile/Store signals, and the eviction is broadcast
+    over Redis pub/sub to the other processes when NOTIFICATION_REDIS_URL is set.
+    """
+
+    def __init__(self) -> None:
+        self._cache: LocalTTLCache[str, tuple[Subscriber, ...]] = LocalTTLCache(
+            maxsize=getattr(settings, "NOTIFICATION_ROUTING_CACHE_SIZE", 10_000),
+            ttl=getattr(settings, "NOTIFICATION_ROUTING_CACHE_TTL", 300),
+        )
+        # bumped on every invalidation, so that a load racing with it is not cached
+        self._generations: dict[str, int] = {}
+        self._listener: threading.Thread | None = None
+        self._listener_pid: int | None = None
+
+    def _load(self, location_id: str) -> tuple[Subscriber, ...]:
+        return tuple(
+            Subscriber(*row)
+            for row in UserProfile.objects.filter(store_id=location_id).values_list(
+                "id",
+                "user_id",
+                "notification_preference",
+                "preferred_channel",
+                "delivery_mode",
+            )
+        )
+
+    def get_subscribers(self, location_id: str) -> tuple[Subscriber, ...]:
+        self._ensure_listener()
+        if (subscribers := self._cache.get(location_id)) is not None:
+            return subscribers
+
+        generation = self._generations.get(location_id, 0)
+        subscribers = self._load(location_id)
+        if self._generations.get(location_id, 0) == generation:
+            self._cache.set(location_id, subscribers)
+        return subscribers
+
+    def get_recipients(self, alert: Alert) -> list[Subscriber]:
+        """Subscribers of the alert's store whose preference matches the alert."""
+        preferences = UserProfile.preferences_for(alert)
+        return [
+            subscriber
+            for subscriber in self.get_subscribers(alert.store_id)
+            if subscriber.preference in preferences
+        ]
+
+    def invalidate(self, location_id: str, broadcast: bool = True) -> None:
+        self._generations[location_id] = self._generations.get(location_id, 0) + 1
+        self._cache.delete(location_id)
+        if broadcast and (client := get_redis()) is not None:
+            try:
+                client.publish(INVALIDATION_CHANNEL, location_id)
+            except redis.RedisError:
+                # the TTL bounds how long other workers may serve the stale entry
+                logger.exception(
+                    f"Routing: Failed to broadcast invalidation of {location_id}"
+                )
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return self._cache.stats()
+
+    def _ensure_listener(self) -> None:
+        if self._listener_pid == os.getpid() and self._listener is not None:
+            return
+        if get_redis() is None:
+            return
+        # started lazily, and again in forked children which do not inherit threads
+        self._listener_pid = os.getpid()
+        self._listener = threading.Thread(
+            target=self._listen, name="routing-cache-invalidation", daemon=True
+        )
+        self._listener.start()
+
+    def _listen(self) -> None:
+        # dedicated connection: the shared client has a short socket timeout
+        client = redis.Redis.from_url(settings.NOTIFICATION_REDIS_URL)
+        while True:
+            try:
+                pubsub = client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # invalidations may have been missed while disconnected
+                self.clear()
+                for message in pubsub.listen():
+                    self.invalidate(message["data"].decode(), broadcast=False)
+            except redis.RedisError:
+                logger.exception("Routing: Invalidation listener disconnected")
+                time.sleep(1.0)
+
+
+routing_cache = StoreRoutingCache()
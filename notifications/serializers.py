@@ -4,6 +4,7 @@ from typing import Any
 from rest_framework import serializers
 
 from .models import Alert, ChannelChoices, Store, UserProfile
+from .stores import store_resolver
 
 
 class StoreSerializer(serializers.ModelSerializer[Store]):
@@ -13,6 +14,20 @@ class StoreSerializer(serializers.ModelSerializer[Store]):
         read_only_fields = ["created", "modified"]
 
 
+def parse_unix_timestamp(data: Any) -> datetime:
+    """Shared by UnixEpochDateTimeField and the fast alert validator."""
+    try:
+        ts = float(data)
+    except (TypeError, ValueError) as e:
+        raise serializers.ValidationError(
+            "Time spotted must be a UNIX timestamp (float or int)."
+        ) from e
+    try:
+        return datetime.fromtimestamp(ts, tz=timezone.utc)
+    except (OSError, OverflowError) as exc:
+        raise serializers.ValidationError("Invalid timestamp value.") from exc
+
+
 class UnixEpochDateTimeField(serializers.Field):
     """
     Accepts a float-or-int UNIX timestamp
@@ -21,16 +36,7 @@ class UnixEpochDateTimeField(serializers.Field):
     """
 
     def to_internal_value(self, data: Any) -> datetime:
-        try:
-            ts = float(data)
-        except (TypeError, ValueError) as e:
-            raise serializers.ValidationError(
-                "Time spotted must be a UNIX timestamp (float or int)."
-            ) from e
-        try:
-            return datetime.fromtimestamp(ts, tz=timezone.utc)
-        except (OSError, OverflowError) as exc:
-            raise serializers.ValidationError("Invalid timestamp value.") from exc
+        return parse_unix_timestamp(data)
 
     def to_representation(self, value: datetime) -> str:
         """return the datetime as a string in ISO-8601 format"""
@@ -39,7 +45,8 @@ class UnixEpochDateTimeField(serializers.Field):
 
 class StoreSlugField(serializers.SlugRelatedField[Store]):
     def to_internal_value(self, data: str) -> Store:
-        return Store.objects.get_or_create(location_id=data, defaults={"name": data})[0]
+        # only the first alert of a store reaches the Store table
+        return store_resolver.resolve(data)
 
 
 class AlertCreateSerializer(serializers.ModelSerializer[Alert]):
@@ -75,12 +82,27 @@ class AlertCreateSerializer(serializers.ModelSerializer[Alert]):
         # TODO: not in specs, so I'm handling it here for simplicity
         # TODO: in reality, I suppose that the store is created beforehand
 
-        return Alert.objects.update_or_create(
+        return Alert.objects.upsert(
             alert_uuid=validated_data.pop("alert_uuid"),
-            defaults={"store": validated_data.pop("location"), **validated_data},
+            store=validated_data.pop("location"),
+            **validated_data,
         )[0]
 
 
+class AlertBatchItemSerializer(serializers.Serializer[None]):
+    """
+    Validates one item of a batch ingestion request.
+    Same input contract as AlertCreateSerializer, but the store is kept as a
+    plain location ID so that stores and alerts can be upserted set-based.
+    """
+
+    alert_uuid = serializers.UUIDField()
+    url = serializers.URLField(max_length=500)
+    location = serializers.CharField(max_length=255)
+    label = serializers.ChoiceField(choices=Alert.LabelChoices.choices)
+    time_spotted = UnixEpochDateTimeField()
+
+
 class AlertReadOnlySerializer(serializers.ModelSerializer[Alert]):
     store = StoreSerializer(read_only=True)
     label = serializers.CharField(source="get_label_display", read_only=True)
@@ -117,6 +139,11 @@ class UserProfileCreateSerializer(serializers.ModelSerializer[UserProfile]):
         choices=ChannelChoices.choices,
         help_text="User's preferred notification channel",
     )
+    delivery_mode = serializers.ChoiceField(
+        choices=UserProfile.DeliveryModeChoices.choices,
+        required=False,
+        help_text="'digest' to receive standard alerts together every few minutes",
+    )
 
     class Meta:
         model = UserProfile
@@ -125,12 +152,29 @@ class UserProfileCreateSerializer(serializers.ModelSerializer[UserProfile]):
             "store",
             "notification_preference",
             "preferred_channel",
+            "delivery_mode",
         ]
 
 
-class OutgoingNotificationSerializer(serializers.Serializer[None]):
+class OutgoingAlertSerializer(serializers.Serializer[None]):
+    """Alert part of the outgoing payload, validated once per alert."""
+
     url = serializers.URLField()
     alert_uuid = serializers.UUIDField()
     location = serializers.CharField()
     label = serializers.CharField()
+
+
+class OutgoingNotificationSerializer(OutgoingAlertSerializer):
     target_user_id = serializers.UUIDField()
+
+
+class DeliveryLatencyQuerySerializer(serializers.Serializer[None]):
+    """Query parameters of the latency report, windows in seconds."""
+
+    window = serializers.ListField(
+        child=serializers.IntegerField(min_value=60), required=False
+    )
+    store = serializers.CharField(required=False)
+    label = serializers.ChoiceField(choices=Alert.LabelChoices.choices, required=False)
+    channel = serializers.ChoiceField(choices=ChannelChoices.choices, required=False)
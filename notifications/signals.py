@@ -0,0 +1,47 @@
+from typing import Any
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Store, UserProfile
+from .routing import routing_cache
+from .stores import store_resolver
+
+
+def invalidate_store_routing(location_id: str) -> None:
+    # evict right away for this process, and once more after commit: another
+    # worker may have cached the pre-commit subscribers in the meantime
+    routing_cache.invalidate(location_id, broadcast=False)
+    transaction.on_commit(lambda: routing_cache.invalidate(location_id))
+
+
+@receiver(post_init, sender=UserProfile)
+def remember_profile_store(
+    sender: type[UserProfile], instance: UserProfile, **kwargs: Any
+) -> None:
+    instance._routing_store_id = instance.__dict__.get("store_id")
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_profile_routing(
+    sender: type[UserProfile], instance: UserProfile, **kwargs: Any
+) -> None:
+    invalidate_store_routing(instance.store_id)
+    # the profile moved to another store
+    if instance._routing_store_id not in (None, instance.store_id):
+        invalidate_store_routing(instance._routing_store_id)
+    instance._routing_store_id = instance.store_id
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def invalidate_store(sender: type[Store], instance: Store, **kwargs: Any) -> None:
+    invalidate_store_routing(instance.location_id)
+    # evict right away, and once more after commit: another process may have
+    # put the store back in the shared hash in the meantime. Other processes
+    # keep their local entry until its TTL expires, alerts saved with it are
+    # retried (see ingestion.save_alert)
+    store_resolver.forget(instance.location_id)
+    transaction.on_commit(lambda: store_resolver.forget(instance.location_id))
@@ -0,0 +1,155 @@
+import copy
+import json
+import logging
+from collections.abc import Iterable
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .cache import LocalTTLCache, get_redis
+from .models import Store
+
+logger = logging.getLogger(__name__)
+
+SHARED_STORES_KEY = "notifications:stores"
+
+
+class StoreResolver:
+    """
+    Resolves location IDs to stores on the ingestion path, so that only the
+    first alert of a store touches the Store table.
+
+    Known stores are kept in a local LRU/TTL cache, backed by a Redis hash
+    shared by every process when NOTIFICATION_REDIS_URL is set. Stores are
+    only cached once their creation is committed.
+    """
+
+    def __init__(self) -> None:
+        self._cache: LocalTTLCache[str, Store] = LocalTTLCache(
+            maxsize=getattr(settings, "NOTIFICATION_STORE_CACHE_SIZE", 10_000),
+            ttl=getattr(settings, "NOTIFICATION_STORE_CACHE_TTL", 3600),
+        )
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    @staticmethod
+    def _dump(store: Store) -> str:
+        return json.dumps(
+            {
+                "name": store.name,
+                "created": store.created.isoformat(),
+                "modified": store.modified.isoformat(),
+            }
+        )
+
+    @staticmethod
+    def _load(location_id: str, raw: bytes) -> Store:
+        data = json.loads(raw)
+        return Store(
+            location_id=location_id,
+            name=data["name"],
+            created=parse_datetime(data["created"]),
+            modified=parse_datetime(data["modified"]),
+        )
+
+    def _get_shared(self, location_ids: list[str]) -> dict[str, Store]:
+        if (client := get_redis()) is None or not location_ids:
+            return {}
+        try:
+            values = client.hmget(SHARED_STORES_KEY, location_ids)
+        except redis.RedisError:
+            logger.exception("Stores: Failed to read the shared store cache")
+            return {}
+        stores = {
+            location_id: self._load(location_id, raw)
+            for location_id, raw in zip(location_ids, values)
+            if raw is not None
+        }
+        self.shared_hits += len(stores)
+        self.shared_misses += len(location_ids) - len(stores)
+        for location_id, store in stores.items():
+            self._cache.set(location_id, store)
+        return stores
+
+    def remember(self, stores: Iterable[Store]) -> None:
+        stores = list(stores)
+        for store in stores:
+            self._cache.set(store.location_id, store)
+        if (client := get_redis()) is None or not stores:
+            return
+        try:
+            client.hset(
+                SHARED_STORES_KEY,
+                mapping={store.location_id: self._dump(store) for store in stores},
+            )
+        except redis.RedisError:
+            logger.exception("Stores: Failed to write the shared store cache")
+
+    def forget(self, location_id: str) -> None:
+        self._cache.delete(location_id)
+        if (client := get_redis()) is None:
+            return
+        try:
+            client.hdel(SHARED_STORES_KEY, location_id)
+        except redis.RedisError:
+            logger.exception(f"Stores: Failed to forget {location_id}")
+
+    def resolve(self, location_id: str) -> Store:
+        """get_or_create of a store, served from the cache once it is known."""
+        # same coercion as the CharField primary key
+        location_id = str(location_id)
+        if (store := self._cache.get(location_id)) is None:
+            store = self._get_shared([location_id]).get(location_id)
+        if store is not None:
+            # callers may attach the instance to their own objects
+            return copy.copy(store)
+
+        # get_or_create already recovers from a concurrent creation
+        store, created = Store.objects.get_or_create(
+            location_id=location_id, defaults={"name": location_id}
+        )
+        if created:
+            transaction.on_commit(lambda: self.remember([store]))
+        else:
+            self.remember([store])
+        return copy.copy(store)
+
+    def ensure_exist(self, location_ids: Iterable[str]) -> None:
+        """
+        Set-based resolve for batch ingestion: unknown stores are created with
+        one INSERT ... ON CONFLICT DO NOTHING and read back with one SELECT.
+        """
+        unknown = [
+            location_id
+            for location_id in set(location_ids)
+            if self._cache.get(location_id) is None
+        ]
+        shared = self._get_shared(unknown)
+        unknown = [location_id for location_id in unknown if location_id not in shared]
+        if not unknown:
+            return
+
+        Store.objects.bulk_create(
+            [
+                Store(location_id=location_id, name=location_id)
+                for location_id in unknown
+            ],
+            ignore_conflicts=True,
+        )
+        stores = list(Store.objects.filter(location_id__in=unknown))
+        transaction.on_commit(lambda: self.remember(stores))
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            **self._cache.stats(),
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+        }
+
+
+store_resolver = StoreResolver()
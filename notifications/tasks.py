@@ -1,19 +1,91 @@
 import logging
+import uuid
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import datetime, timedelta, timezone
 
-from celery import Task, group, shared_task
+from celery import group, shared_task
 from celery.canvas import Signature
+from celery.signals import worker_process_init, worker_process_shutdown
+from django.conf import settings
+from django.db import IntegrityError
 
 from notifications.exceptions import (
+    NotificationDeferredError,
     NotificationPermanentError,
     NotificationRetryableError,
 )
 
-from .channels import get_channel_strategy
-from .models import Alert, Notification
+from . import latency, partitions
+from .channels import (
+    get_async_channel_strategy,
+    get_channel_strategy,
+    webhook_client_pool,
+)
+from .digests import digest_due_at, digest_states, group_digests, is_digested
+from .dispatcher import DeliveryOutcome, async_dispatcher
+from .metrics import fan_out_size
+from .models import Alert, DeliveryAttempt, Notification, UserProfile
+from .payloads import build_digest_payload, build_payload, payload_templates
+from .priority import batch_options, queue_for, task_options
+from .routing import routing_cache
+from .writer import delivery_writer
 
 logger = logging.getLogger(__name__)
 
 
+@worker_process_init.connect
+def reset_webhook_client_pool(**kwargs) -> None:
+    # prefork children must not reuse the connections inherited from the parent
+    webhook_client_pool.reset()
+
+
+@worker_process_shutdown.connect
+def close_webhook_client_pool(**kwargs) -> None:
+    webhook_client_pool.close()
+    async_dispatcher.close()
+    # buffered delivery states must not be lost on a graceful shutdown
+    delivery_writer.flush()
+
+
+def _create_pending(alert: Alert) -> list[uuid.UUID]:
+    """
+    Creates the pending notifications of the alert's subscribers, returns the
+    ones to enqueue now. A profile deleted by another process stays in the
+    routing cache until the invalidation reaches this worker (its TTL without
+    Redis) and fails the INSERT on its foreign key: the store's subscribers
+    are then reloaded and the INSERT tried again, once.
+    """
+    for reloaded in (False, True):
+        # constant number of queries whatever the store size: subscribers
+        # come from the worker-local routing cache, the pending upsert is
+        # set-based
+        subscribers = routing_cache.get_recipients(alert)
+        recipients = [
+            (subscriber.profile_id, subscriber.preferred_channel)
+            for subscriber in subscribers
+        ]
+        # standard alerts of digest profiles are left to the sweeper until
+        # the end of the profile's window, critical alerts always go out
+        # immediately
+        due_at = {
+            subscriber.profile_id: digest_due_at(subscriber.profile_id)
+            for subscriber in subscribers
+            if subscriber.delivery_mode == UserProfile.DeliveryModeChoices.DIGEST
+            and not alert.is_critical
+        }
+        try:
+            return Notification.objects.bulk_create_pending(alert, recipients, due_at)
+        except IntegrityError:
+            if reloaded:
+                raise
+            logger.warning(
+                f"Fan-out: Stale subscribers of store {alert.store_id}, reloading"
+            )
+            routing_cache.invalidate(alert.store_id, broadcast=False)
+    return []
+
+
 @shared_task
 def fan_out_notifications(alert_uuid: str):
     try:
@@ -22,29 +94,41 @@ def fan_out_notifications(alert_uuid: str):
         logger.error(f"Alert {alert_uuid} not found.")
         return
 
-    task_signatures: list[Signature] = []
-    for profile in alert.store.user_profiles.all():
-        if not profile.should_notify(alert):
-            continue
+    if not routing_cache.get_recipients(alert):
+        fan_out_size.observe(0)
+        return
 
-        notification, _ = Notification.objects.get_or_create_pending(
-            alert=alert,
-            user_profile=profile,
-            channel=profile.preferred_channel,
-        )
-        task_signatures.append(send_notification.s(str(notification.notification_uuid)))
+    try:
+        # validated and encoded once, shared by every delivery of the alert
+        payload_templates.get(alert)
+    except NotificationPermanentError as exc:
+        # the deliveries fail with the same error and record it
+        logger.error(f"Alert {alert_uuid} has an invalid payload: {exc}")
+
+    notification_uuids = [
+        str(notification_uuid) for notification_uuid in _create_pending(alert)
+    ]
+    fan_out_size.observe(len(notification_uuids))
 
+    batch_size = getattr(settings, "NOTIFICATION_SEND_BATCH_SIZE", 50)
+    options = task_options(alert.label)
+    task_signatures: list[Signature] = [
+        send_notification_batch.s(notification_uuids[start : start + batch_size]).set(
+            **options
+        )
+        for start in range(0, len(notification_uuids), batch_size)
+    ]
     if task_signatures:
         group(task_signatures).apply_async()
 
 
-@shared_task(bind=True, max_retries=5, default_retry_delay=300)
-def send_notification(self: Task, notification_uuid: str):
+@shared_task
+def send_notification(notification_uuid: str):
     logger.info(f"Send: Starting notification {notification_uuid}")
     try:
-        notification = Notification.objects.select_related(
-            "alert__store", "user_profile"
-        ).get(notification_uuid=notification_uuid)
+        notification = Notification.objects.select_related("alert", "user_profile").get(
+            notification_uuid=notification_uuid
+        )
     except Notification.DoesNotExist:
         logger.error(f"Notification {notification_uuid} not found.")
         return
@@ -52,25 +136,180 @@ def send_notification(self: Task, notification_uuid: str):
     if notification.is_sent:
         return
 
-    # Mark this attempt
-    notification.mark_attempt()
+    # Build payload and attempt to send
+    try:
+        if is_digested(notification):
+            payload = build_digest_payload([notification])
+        else:
+            payload = build_payload(notification)
+    except NotificationPermanentError as exc:
+        outcome = DeliveryOutcome(notification, error=exc)
+    else:
+        outcome = _send_sync(notification, payload)
+
+    # the attempt and its outcome are recorded with a single UPDATE,
+    # retries are scheduled on the row for sweep_due_notifications
+    delivery_writer.record([outcome.to_state()])
+    logger.info(f"Send: Completed notification {notification_uuid}")
 
-    # Build payload and choose strategy
-    payload = notification.build_payload()
-    if not (strategy := get_channel_strategy(notification.channel)):
-        notification.mark_failed("No channel strategy")
-        return
 
-    # Attempt to send
+def _send_sync(notification: Notification, payload: bytes) -> DeliveryOutcome:
+    """Delivers through a sync strategy, unexpected errors are permanent."""
+    if not (strategy := get_channel_strategy(notification.channel)):
+        return DeliveryOutcome(
+            notification, error=NotificationPermanentError("No channel strategy")
+        )
+    started_at = datetime.now(timezone.utc)
     try:
-        strategy.send(notification, payload)
-    except NotificationRetryableError as exc:
-        # retry up to max_retries
-        raise self.retry(exc=exc) from exc
-    except (NotificationPermanentError, Exception) as exc:
-        # permanent failure, no need to retry
-        notification.mark_failed(str(exc))
+        response_data = strategy.send(notification, payload)
+    except (
+        NotificationRetryableError,
+        NotificationPermanentError,
+        NotificationDeferredError,
+    ) as exc:
+        return DeliveryOutcome(notification, error=exc, started_at=started_at)
+    except Exception as exc:
+        return DeliveryOutcome(
+            notification,
+            error=NotificationPermanentError(str(exc)),
+            started_at=started_at,
+        )
+    return DeliveryOutcome(
+        notification, response_data=response_data, started_at=started_at
+    )
+
+
+@shared_task
+def send_notification_batch(notification_uuids: list[str]):
+    """
+    Delivers a chunk of notifications from a single Celery message:
+    one SELECT to load them, concurrent delivery for the channels that have
+    an async strategy, and one UPDATE to record the attempts and outcomes.
+    Failed items are scheduled for a retry with backoff on their row.
+    The notifications of a digest recipient are delivered as one webhook.
+    """
+    logger.info(f"SendBatch: Starting {len(notification_uuids)} notifications")
+    notifications = list(
+        Notification.objects.select_related("alert", "user_profile")
+        .filter(notification_uuid__in=notification_uuids)
+        .exclude(status=Notification.StatusChoices.SENT)
+    )
+    if not notifications:
         return
 
-    logger.info(f"Send: Completed notification {notification_uuid}")
-    # ? at that point, .send() should have marked the notification as sent
+    deliveries, digest_members, failed = _prepare_deliveries(notifications)
+    concurrent, sequential = [], []
+    for notification, payload in deliveries:
+        if get_async_channel_strategy(notification.channel):
+            concurrent.append((notification, payload))
+        else:
+            sequential.append((notification, payload))
+
+    sent: list[DeliveryOutcome] = []
+    if concurrent:
+        sent += async_dispatcher.run(concurrent)
+    sent += [_send_sync(notification, payload) for notification, payload in sequential]
+
+    states = [outcome.to_state() for outcome in failed]
+    for outcome in sent:
+        members = digest_members.get(outcome.notification.pk)
+        if members is None:
+            states.append(outcome.to_state())
+        else:
+            states += digest_states(outcome, members)
+    delivery_writer.record(states)
+    delivery_writer.flush_if_due()
+    retrying = sum(state.next_attempt_at is not None for state in states)
+    logger.info(
+        f"SendBatch: Completed {len(states) - retrying} notifications, "
+        f"retrying {retrying}"
+    )
+
+
+def _prepare_deliveries(
+    notifications: Iterable[Notification],
+) -> tuple[
+    list[tuple[Notification, bytes]],
+    dict[uuid.UUID, list[Notification]],
+    list[DeliveryOutcome],
+]:
+    """
+    Payloads to deliver, a digest under its first notification, the members
+    of each digest by that notification's UUID, and the outcomes of the
+    notifications whose payload is invalid.
+    """
+    deliveries: list[tuple[Notification, bytes]] = []
+    digest_members: dict[uuid.UUID, list[Notification]] = {}
+    failed: list[DeliveryOutcome] = []
+    single, digests = group_digests(notifications)
+    for notification in single:
+        try:
+            deliveries.append((notification, build_payload(notification)))
+        except NotificationPermanentError as exc:
+            failed.append(DeliveryOutcome(notification, error=exc))
+    for digest in digests:
+        members = []
+        for notification in digest:
+            try:
+                payload_templates.get(notification.alert)
+            except NotificationPermanentError as exc:
+                # an invalid alert does not hold back the rest of the digest
+                failed.append(DeliveryOutcome(notification, error=exc))
+            else:
+                members.append(notification)
+        if members:
+            digest_members[members[0].pk] = members
+            deliveries.append((members[0], build_digest_payload(members)))
+    return deliveries, digest_members, failed
+
+
+@shared_task
+def sweep_due_notifications():
+    """
+    Periodic task (see CELERY_BEAT_SCHEDULE): claims the pending notifications
+    due for a retry, or left behind by a crashed worker once their lease
+    expired, and enqueues them in batches until none is due. Each batch is
+    split by queue, so that retries stay on their priority queue, but not by
+    label, so that a digest of suspicious and normal alerts stays whole.
+    """
+    batch_size = getattr(settings, "NOTIFICATION_SEND_BATCH_SIZE", 50)
+    max_batches = getattr(settings, "NOTIFICATION_SWEEP_MAX_BATCHES", 100)
+    claimed = 0
+    for _ in range(max_batches):
+        if not (due := Notification.objects.claim_due(batch_size)):
+            break
+        by_queue: dict[str, list[tuple[str, str]]] = defaultdict(list)
+        for notification_uuid, label in due:
+            by_queue[queue_for(label)].append((str(notification_uuid), label))
+        for batch in by_queue.values():
+            send_notification_batch.apply_async(
+                ([notification_uuid for notification_uuid, _ in batch],),
+                **batch_options([label for _, label in batch], retry=True),
+            )
+        claimed += len(due)
+    if claimed:
+        logger.info(f"Sweep: Enqueued {claimed} due notifications")
+
+
+@shared_task
+def rollup_delivery_latency():
+    """Periodic task (see CELERY_BEAT_SCHEDULE), see notifications.latency."""
+    latency.rollup_delivery_latency()
+
+
+@shared_task
+def maintain_partitions():
+    """Periodic task (see CELERY_BEAT_SCHEDULE), see notifications.partitions."""
+    partitions.maintain_partitions()
+
+
+@shared_task
+def prune_delivery_attempts():
+    """
+    Periodic task (see CELERY_BEAT_SCHEDULE): deletes the delivery attempts
+    older than NOTIFICATION_ATTEMPT_RETENTION seconds.
+    """
+    retention = getattr(settings, "NOTIFICATION_ATTEMPT_RETENTION", 2592000.0)
+    before = datetime.now(timezone.utc) - timedelta(seconds=retention)
+    if pruned := DeliveryAttempt.objects.prune(before):
+        logger.info(f"Attempts: Pruned {pruned} delivery attempts")
@@ -1,12 +1,36 @@
 import uuid
 
+from django.conf import settings
 from django.test import TestCase
 from django.utils import timezone
 
 from notifications.models import Alert, ChannelChoices, Store, UserProfile
+from notifications.dedupe import seen_alerts
+from notifications.health import circuit_breaker
+from notifications.payloads import payload_templates
+from notifications.ratelimit import rate_limiter
+from notifications.routing import routing_cache
+from notifications.stores import store_resolver
+
+# the Redis of the Redis-backed tests, see config.test_settings
+REDIS_URL = getattr(settings, "NOTIFICATION_TEST_REDIS_URL", None)
+
+
+def clear_caches() -> None:
+    """Process-local caches outlive the rolled back test transactions."""
+    routing_cache.clear()
+    payload_templates.clear()
+    circuit_breaker.clear()
+    rate_limiter.clear()
+    seen_alerts.clear()
+    store_resolver.clear()
 
 
 class NotificationBaseTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        clear_caches()
+
     @classmethod
     def setUpTestData(cls):
         cls.store = Store.objects.create(
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+
+from django.test import SimpleTestCase, override_settings
+
+from notifications.attempts import decode_body, encode_body
+from notifications.dispatcher import DeliveryOutcome
+from notifications.exceptions import (
+    NotificationDeferredError,
+    NotificationRetryableError,
+)
+from notifications.models import DeliveryAttempt, Notification
+from notifications.tasks import prune_delivery_attempts
+
+from .common import NotificationBaseTestCase
+
+NOW = datetime(2026, 3, 20, 12, 0, 0, tzinfo=timezone.utc)
+
+
+@override_settings(NOTIFICATION_ATTEMPT_BODY_LIMIT=8)
+class EncodeBodyTest(SimpleTestCase):
+    def test_short_bodies_are_kept(self):
+        self.assertEqual(encode_body("OK"), (b"OK", False, False))
+
+    def test_long_bodies_are_truncated_on_a_character(self):
+        # "é" is two bytes, the limit falls in the middle of the fifth one
+        data, truncated, compressed = encode_body("ééééé")
+        self.assertTrue(truncated)
+        self.assertEqual(decode_body(data, compressed), "éééé")
+
+    @override_settings(
+        NOTIFICATION_ATTEMPT_BODY_LIMIT=1024,
+        NOTIFICATION_ATTEMPT_BODY_COMPRESSION=True,
+    )
+    def test_compressed_when_smaller(self):
+        data, truncated, compressed = encode_body("KO " * 100)
+        self.assertTrue(compressed)
+        self.assertLess(len(data), 300)
+        self.assertEqual(decode_body(data, compressed), "KO " * 100)
+        self.assertEqual(encode_body("OK"), (b"OK", False, False))
+
+
+class DeliveryAttemptTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.notification = Notification.objects.create(
+            alert=self.alert_critical, user_profile=self.profile_all
+        )
+
+    def test_retried_attempt(self):
+        error = NotificationRetryableError("503 Service Unavailable", status_code=503)
+        outcome = DeliveryOutcome(
+            self.notification,
+            error=error,
+            started_at=NOW,
+            attempted_at=NOW + timedelta(milliseconds=250),
+        )
+        DeliveryAttempt.objects.record([outcome.to_state()])
+
+        attempt = self.notification.attempts.get()
+        self.assertEqual(attempt.outcome, "retry")
+        self.assertEqual(attempt.status_code, 503)
+        self.assertEqual(attempt.error_class, "NotificationRetryableError")
+        self.assertEqual(attempt.duration, timedelta(milliseconds=250))
+        self.assertEqual(attempt.response_body, "503 Service Unavailable")
+
+    def test_deferred_deliveries_are_not_logged(self):
+        outcome = DeliveryOutcome(
+            self.notification, error=NotificationDeferredError("open circuit", 30)
+        )
+        self.assertEqual(DeliveryAttempt.objects.record([outcome.to_state()]), [])
+
+    @override_settings(NOTIFICATION_ATTEMPT_RETENTION=86400)
+    def test_old_attempts_are_pruned(self):
+        now = datetime.now(timezone.utc)
+        for days in (3, 2, 0):
+            DeliveryAttempt.objects.create(
+                notification=self.notification,
+                attempted_at=now - timedelta(days=days),
+                outcome=Notification.StatusChoices.FAILED,
+            )
+
+        prune_delivery_attempts()
+
+        self.assertEqual(self.notification.attempts.count(), 1)
@@ -0,0 +1,87 @@
+import httpx
+from django.test import override_settings
+
+from notifications.channels import WebhookChannelStrategy, WebhookClientPool
+from notifications.exceptions import (
+    NotificationPermanentError,
+    NotificationRetryableError,
+)
+from notifications.models import ChannelChoices, Notification
+from notifications.payloads import build_payload
+
+from .common import NotificationBaseTestCase
+
+WEBHOOK_URL = "http://receiver.test/webhook/"
+
+
+@override_settings(
+    NOTIFICATION_WEBHOOK_DRY_RUN=False, NOTIFICATION_WEBHOOK_URL=WEBHOOK_URL
+)
+class WebhookChannelStrategyTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.notification = Notification.objects.create(
+            alert=self.alert_critical,
+            user_profile=self.profile_all,
+            channel=ChannelChoices.WEBHOOK,
+        )
+        self.payload = build_payload(self.notification)
+        self.status_code = 200
+        self.requests: list[httpx.Request] = []
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        return httpx.Response(self.status_code, text="OK")
+
+    def strategy(self) -> WebhookChannelStrategy:
+        return WebhookChannelStrategy(
+            WebhookClientPool(httpx.MockTransport(self.handler))
+        )
+
+    def test_send_posts_payload_and_returns_response(self):
+        response_data = self.strategy().send(self.notification, self.payload)
+
+        self.assertEqual(response_data, "OK")
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(str(self.requests[0].url), WEBHOOK_URL)
+        self.assertEqual(self.requests[0].content, self.payload)
+        # the caller records the outcome
+        self.notification.refresh_from_db()
+        self.assertFalse(self.notification.is_sent)
+
+    def test_server_error_is_retryable(self):
+        self.status_code = 503
+        with self.assertRaises(NotificationRetryableError):
+            self.strategy().send(self.notification, self.payload)
+
+    def test_client_error_is_permanent(self):
+        self.status_code = 400
+        with self.assertRaises(NotificationPermanentError):
+            self.strategy().send(self.notification, self.payload)
+
+
+class WebhookClientPoolTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pool = WebhookClientPool(
+            httpx.MockTransport(lambda request: httpx.Response(200))
+        )
+
+    def test_one_long_lived_client_per_host(self):
+        client, _ = self.pool.get_client("http://a.test/one/")
+        self.assertIs(self.pool.get_client("http://a.test/two/")[0], client)
+        self.assertIsNot(self.pool.get_client("http://b.test/")[0], client)
+
+    def test_reset_drops_clients_after_fork(self):
+        client, _ = self.pool.get_client("http://a.test/")
+        self.pool._pid = -1  # simulate a forked child
+        self.assertIsNot(self.pool.get_client("http://a.test/")[0], client)
+
+    def test_stats_per_host(self):
+        self.pool.post("http://a.test/", json={})
+        self.pool.post("http://a.test/", json={})
+
+        stats = self.pool.stats()["a.test"]
+        self.assertEqual(stats["requests"], 2)
+        self.assertEqual(stats["in_flight"], 0)
+        self.assertEqual(stats["waiting"], 0)
@@ -0,0 +1,173 @@
+import uuid
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from notifications.cache import get_redis
+from notifications.dedupe import SEEN_ALERTS_KEY, SeenAlert, SeenAlerts, seen_alerts
+from notifications.models import (
+    Alert,
+    ChannelChoices,
+    Notification,
+    OutboxMessage,
+    Store,
+    UserProfile,
+)
+from notifications.outbox import relay_outbox
+from notifications.tasks import fan_out_notifications
+
+from .common import REDIS_URL, NotificationBaseTestCase, clear_caches
+
+
+class AlertUpsertTest(NotificationBaseTestCase):
+    def upsert(self, **overrides):
+        fields = {
+            "alert_uuid": self.alert_critical.alert_uuid,
+            "store": self.store,
+            "url": self.alert_critical.url,
+            "label": self.alert_critical.label,
+            "time_spotted": self.alert_critical.time_spotted,
+            **overrides,
+        }
+        return Alert.objects.upsert(**fields)
+
+    def test_exact_redelivery_writes_nothing(self):
+        with CaptureQueriesContext(connection) as queries:
+            _, changed = self.upsert()
+        self.assertFalse(changed)
+        self.assertFalse([q for q in queries if "UPDATE" in q["sql"]])
+
+    def test_changed_content_is_saved(self):
+        alert, changed = self.upsert(url="https://media.veesion.io/other.mp4")
+        self.assertTrue(changed)
+        alert.refresh_from_db()
+        self.assertEqual(alert.url, "https://media.veesion.io/other.mp4")
+
+    def test_new_alert_is_a_change(self):
+        _, changed = self.upsert(alert_uuid=uuid.uuid4())
+        self.assertTrue(changed)
+
+
+@patch("notifications.tasks.group")
+class FanOutAgainTest(NotificationBaseTestCase):
+    def test_sent_and_pending_notifications_are_not_dispatched_again(self, group):
+        fan_out_notifications(str(self.alert_critical.alert_uuid))
+        sent = Notification.objects.get(
+            alert=self.alert_critical, user_profile=self.profile_all
+        )
+        sent.mark_sent("OK")
+
+        recipients = [
+            (self.profile_all.pk, ChannelChoices.WEBHOOK),
+            (self.profile_critical.pk, ChannelChoices.WEBHOOK),
+        ]
+        self.assertEqual(
+            Notification.objects.bulk_create_pending(self.alert_critical, recipients),
+            [],
+        )
+        sent.refresh_from_db()
+        self.assertTrue(sent.is_sent)
+        self.assertEqual(sent.attempts.get().response_body, "OK")
+
+    def test_get_or_create_pending_keeps_sent_notifications(self, group):
+        notification, _ = Notification.objects.get_or_create_pending(
+            self.alert_critical, self.profile_all, ChannelChoices.WEBHOOK
+        )
+        notification.mark_sent("OK")
+
+        notification, created = Notification.objects.get_or_create_pending(
+            self.alert_critical, self.profile_all, ChannelChoices.WEBHOOK
+        )
+        self.assertFalse(created)
+        self.assertTrue(notification.is_sent)
+
+
+class IdempotentIngestionTest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        store = Store.objects.create(location_id="store-1", name="Store 1")
+        UserProfile.objects.create(user_id=uuid.uuid4(), store=store)
+        self.payload = {
+            "alert_uuid": str(uuid.uuid4()),
+            "url": "https://media.veesion.io/example.mp4",
+            "label": "theft",
+            "time_spotted": 1742470260.083,
+            "location": "store-1",
+        }
+
+    def post(self, payload=None):
+        response = self.client.post(
+            reverse("webhook-alerts"), payload or self.payload, format="json"
+        )
+        relay_outbox()
+        return response
+
+    def test_exact_redelivery_needs_no_database(self):
+        first = self.post()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.post(
+                reverse("webhook-alerts"), self.payload, format="json"
+            )
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_redelivery_after_the_seen_set_expired_is_not_fanned_out(self):
+        self.post()
+        seen_alerts.clear()
+        self.post()
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_changed_alert_is_fanned_out_without_resending(self):
+        self.post()
+        notification = Notification.objects.get()
+        self.assertTrue(notification.is_sent)
+
+        self.post({**self.payload, "url": "https://media.veesion.io/other.mp4"})
+
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        notification.refresh_from_db()
+        self.assertTrue(notification.is_sent)
+        self.assertEqual(notification.attempt_count, 1)
+
+    def test_batch_redelivery_is_unchanged(self):
+        url = reverse("webhook-alerts-batch")
+        self.client.post(url, [self.payload], format="json")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, [self.payload], format="json")
+        seen_alerts.clear()
+        expired = self.client.post(url, [self.payload], format="json")
+
+        self.assertEqual(response.data["unchanged"], 1)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(expired.data["unchanged"], 1)
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list("args", flat=True)),
+            [[self.payload["alert_uuid"]]],
+        )
+
+
+@skipUnless(REDIS_URL, "NOTIFICATION_REDIS_URL is not set")
+@override_settings(NOTIFICATION_REDIS_URL=REDIS_URL)
+class SharedSeenAlertsTest(SimpleTestCase):
+    def setUp(self):
+        self.alert_uuid = uuid.uuid4()
+        self.addCleanup(get_redis().delete, f"{SEEN_ALERTS_KEY}:{self.alert_uuid}")
+
+    def test_update_through_another_worker_is_not_unchanged(self):
+        worker, other_worker = SeenAlerts(), SeenAlerts()
+        worker.add(self.alert_uuid, "A", {"url": "a"})
+        other_worker.add(self.alert_uuid, "B", {"url": "b"})
+
+        self.assertIsNone(worker.get(self.alert_uuid, "A"))
+        self.assertFalse(worker.get_many({self.alert_uuid: "A"}))
+        self.assertIsNone(async_to_sync(worker.aget)(self.alert_uuid, "A"))
+        self.assertEqual(worker.get(self.alert_uuid, "B"), SeenAlert("B", {"url": "b"}))
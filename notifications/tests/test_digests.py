@@ -0,0 +1,138 @@
+import json
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import httpx
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone as django_timezone
+
+from notifications.channels import ASYNC_CHANNEL_REGISTRY, AsyncWebhookChannelStrategy
+from notifications.digests import digest_due_at
+from notifications.models import Alert, ChannelChoices, Notification, UserProfile
+from notifications.tasks import fan_out_notifications, sweep_due_notifications
+
+from .common import NotificationBaseTestCase
+
+
+@override_settings(NOTIFICATION_DIGEST_WINDOW=60)
+class DigestWindowTest(SimpleTestCase):
+    def test_alerts_of_a_window_share_its_end(self):
+        profile_id = uuid.uuid4()
+        now = datetime(2025, 3, 20, 12, 0, tzinfo=timezone.utc)
+        due = digest_due_at(profile_id, now)
+
+        self.assertGreater(due, now)
+        self.assertLessEqual(due - now, timedelta(seconds=60))
+        self.assertEqual(digest_due_at(profile_id, due - timedelta(seconds=1)), due)
+        self.assertEqual(digest_due_at(profile_id, due), due + timedelta(seconds=60))
+
+    def test_windows_are_offset_per_profile(self):
+        now = datetime(2025, 3, 20, 12, 0, tzinfo=timezone.utc)
+        due_times = {digest_due_at(uuid.uuid4(), now) for _ in range(10)}
+        self.assertGreater(len(due_times), 1)
+
+
+@override_settings(
+    NOTIFICATION_WEBHOOK_DRY_RUN=False,
+    NOTIFICATION_WEBHOOK_URL="http://receiver.test/webhook/",
+)
+class DigestDeliveryTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        UserProfile.objects.filter(pk=self.profile_standard.pk).update(
+            delivery_mode=UserProfile.DeliveryModeChoices.DIGEST
+        )
+        self.status_code = 200
+        self.bodies = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.bodies.append(json.loads(request.content))
+            return httpx.Response(self.status_code, text="OK")
+
+        strategy = AsyncWebhookChannelStrategy(httpx.MockTransport(handler))
+        registry = patch.dict(
+            ASYNC_CHANNEL_REGISTRY, {ChannelChoices.WEBHOOK: strategy}
+        )
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def digest_notifications(self):
+        return Notification.objects.filter(user_profile=self.profile_standard)
+
+    def standard_alerts(self, count):
+        return [
+            Alert.objects.create(
+                alert_uuid=uuid.uuid4(),
+                url=f"https://media.veesion.io/standard-{index}.mp4",
+                store=self.store,
+                label=Alert.LabelChoices.NORMAL,
+                time_spotted=django_timezone.now(),
+            )
+            for index in range(count)
+        ]
+
+    def end_window(self):
+        self.digest_notifications().update(
+            next_attempt_at=django_timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_standard_alerts_wait_for_the_end_of_the_window(self):
+        for alert in self.standard_alerts(3):
+            fan_out_notifications(str(alert.alert_uuid))
+
+        # profile_all is not in digest mode: one webhook per alert
+        self.assertEqual(len(self.bodies), 3)
+        self.assertNotIn("alerts", self.bodies[0])
+        pending = self.digest_notifications()
+        self.assertEqual(pending.count(), 3)
+        self.assertTrue(all(not notification.is_sent for notification in pending))
+        self.assertEqual(len({n.next_attempt_at for n in pending}), 1)
+
+    def test_window_is_delivered_as_a_single_webhook(self):
+        alerts = self.standard_alerts(3)
+        for alert in alerts:
+            fan_out_notifications(str(alert.alert_uuid))
+        self.bodies.clear()
+
+        self.end_window()
+        sweep_due_notifications()
+
+        self.assertEqual(len(self.bodies), 1)
+        digest = self.bodies[0]
+        self.assertEqual(digest["target_user_id"], str(self.profile_standard.user_id))
+        self.assertEqual(
+            {payload["alert_uuid"] for payload in digest["alerts"]},
+            {str(alert.alert_uuid) for alert in alerts},
+        )
+        for notification in self.digest_notifications():
+            self.assertTrue(notification.is_sent)
+            self.assertEqual(notification.attempt_count, 1)
+
+    def test_failed_digest_is_retried_as_a_whole(self):
+        for alert in self.standard_alerts(2):
+            fan_out_notifications(str(alert.alert_uuid))
+        self.status_code = 503
+
+        self.end_window()
+        sweep_due_notifications()
+
+        notifications = list(self.digest_notifications())
+        self.assertEqual(
+            {n.status for n in notifications}, {Notification.StatusChoices.PENDING}
+        )
+        self.assertEqual({n.attempt_count for n in notifications}, {1})
+        self.assertEqual(len({n.next_attempt_at for n in notifications}), 1)
+
+    def test_critical_alerts_are_not_digested(self):
+        UserProfile.objects.filter(pk=self.profile_all.pk).update(
+            delivery_mode=UserProfile.DeliveryModeChoices.DIGEST
+        )
+        fan_out_notifications(str(self.alert_critical.alert_uuid))
+
+        self.assertEqual(len(self.bodies), 2)
+        self.assertTrue(
+            Notification.objects.get(
+                alert=self.alert_critical, user_profile=self.profile_all
+            ).is_sent
+        )
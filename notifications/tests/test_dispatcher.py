@@ -0,0 +1,119 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+from django.test import override_settings
+
+from notifications.channels import (
+    ASYNC_CHANNEL_REGISTRY,
+    AsyncWebhookChannelStrategy,
+    DeliveryResponse,
+)
+from notifications.dispatcher import AsyncDeliveryDispatcher
+from notifications.exceptions import (
+    NotificationPermanentError,
+    NotificationRetryableError,
+)
+from notifications.models import ChannelChoices, Notification
+from notifications.payloads import build_payload
+
+from .common import NotificationBaseTestCase
+
+
+@override_settings(
+    NOTIFICATION_WEBHOOK_DRY_RUN=False,
+    NOTIFICATION_WEBHOOK_URL="http://receiver.test/webhook/",
+    NOTIFICATION_WEBHOOK_MAX_CONNECTIONS_PER_HOST=500,
+)
+class AsyncDeliveryDispatcherTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.status_by_user: dict[str, int] = {}
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.05)
+        self.in_flight -= 1
+        target = request.read().decode()
+        for user_id, status in self.status_by_user.items():
+            if user_id in target:
+                return httpx.Response(status, text="KO")
+        return httpx.Response(200, text="OK")
+
+    def deliveries(self, count: int, profile=None, channel=ChannelChoices.WEBHOOK):
+        notifications = [
+            Notification(
+                alert=self.alert_critical,
+                user_profile=profile or self.profile_all,
+                channel=channel,
+            )
+            for _ in range(count)
+        ]
+        return [(n, build_payload(n)) for n in notifications]
+
+    def dispatch(self, dispatcher, deliveries):
+        strategy = AsyncWebhookChannelStrategy(httpx.MockTransport(self.handler))
+        with patch.dict(ASYNC_CHANNEL_REGISTRY, {ChannelChoices.WEBHOOK: strategy}):
+            try:
+                return dispatcher.run(deliveries)
+            finally:
+                dispatcher.close()
+
+    def test_deliveries_run_concurrently_within_bound(self):
+        outcomes = self.dispatch(
+            AsyncDeliveryDispatcher(max_in_flight=100), self.deliveries(300)
+        )
+
+        self.assertEqual(len(outcomes), 300)
+        self.assertTrue(all(outcome.is_success for outcome in outcomes))
+        self.assertEqual(self.max_in_flight, 100)
+
+    @override_settings(NOTIFICATION_WEBHOOK_MAX_CONNECTIONS_PER_HOST=1)
+    def test_deliveries_waiting_on_a_host_do_not_hold_slots(self):
+        finished: list[float] = []
+
+        class InstantStrategy:
+            async def send(self, notification, payload, slot=None):
+                async with slot:
+                    finished.append(time.perf_counter())
+                    return DeliveryResponse("OK", 200)
+
+        # webhooks to a host taking one delivery at a time, queued first,
+        # then deliveries of a channel that answers at once
+        deliveries = self.deliveries(5) + self.deliveries(
+            5, channel=ChannelChoices.EMAIL
+        )
+        started = time.perf_counter()
+        with patch.dict(
+            ASYNC_CHANNEL_REGISTRY, {ChannelChoices.EMAIL: InstantStrategy()}
+        ):
+            outcomes = self.dispatch(
+                AsyncDeliveryDispatcher(max_in_flight=2), deliveries
+            )
+
+        self.assertTrue(all(outcome.is_success for outcome in outcomes))
+        self.assertEqual(self.max_in_flight, 1)
+        # not behind the webhooks, 50ms each
+        self.assertLess(max(finished) - started, 0.1)
+
+    def test_error_semantics_are_kept(self):
+        self.status_by_user = {
+            str(self.profile_critical.user_id): 503,
+            str(self.profile_standard.user_id): 400,
+        }
+        deliveries = (
+            self.deliveries(1)
+            + self.deliveries(1, self.profile_critical)
+            + self.deliveries(1, self.profile_standard)
+        )
+        ok, retryable, permanent = self.dispatch(AsyncDeliveryDispatcher(), deliveries)
+
+        self.assertEqual(ok.response_data, "OK")
+        self.assertIsInstance(retryable.error, NotificationRetryableError)
+        self.assertTrue(retryable.is_retryable)
+        self.assertIsInstance(permanent.error, NotificationPermanentError)
+        self.assertFalse(permanent.is_retryable)
@@ -0,0 +1,165 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from notifications.channels import (
+    ASYNC_CHANNEL_REGISTRY,
+    AsyncWebhookChannelStrategy,
+    WebhookChannelStrategy,
+    WebhookClientPool,
+)
+from notifications.exceptions import (
+    NotificationDeferredError,
+    NotificationRetryableError,
+)
+from notifications.health import (
+    AdaptiveConcurrencyLimit,
+    CircuitBreaker,
+    CircuitState,
+)
+from notifications.models import ChannelChoices, Notification
+from notifications.payloads import build_payload
+from notifications.tasks import send_notification_batch
+
+from .common import NotificationBaseTestCase
+
+DESTINATION = "receiver.test"
+
+
+@override_settings(NOTIFICATION_CIRCUIT_FAILURE_THRESHOLD=2)
+class CircuitBreakerTest(SimpleTestCase):
+    def setUp(self):
+        self.breaker = CircuitBreaker()
+
+    def open_circuit(self):
+        for _ in range(2):
+            self.breaker.record_failure(DESTINATION)
+
+    def end_cooldown(self):
+        self.breaker._local._opened_until[DESTINATION] = 0
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure(DESTINATION)
+        self.breaker.record_success(DESTINATION)
+        self.breaker.record_failure(DESTINATION)
+        self.assertIsNone(self.breaker.check(DESTINATION))
+
+        self.breaker.record_failure(DESTINATION)
+        self.assertEqual(self.breaker.state(DESTINATION), CircuitState.OPEN)
+        self.assertGreater(self.breaker.check(DESTINATION), 0)
+
+    def test_half_open_lets_a_single_probe_through(self):
+        self.open_circuit()
+        self.end_cooldown()
+
+        self.assertEqual(self.breaker.state(DESTINATION), CircuitState.HALF_OPEN)
+        self.assertIsNone(self.breaker.check(DESTINATION))
+        self.assertIsNotNone(self.breaker.check(DESTINATION))
+
+    def test_probe_outcome_closes_or_reopens(self):
+        self.open_circuit()
+        self.end_cooldown()
+        self.breaker.check(DESTINATION)
+        self.breaker.record_failure(DESTINATION)
+        self.assertEqual(self.breaker.state(DESTINATION), CircuitState.OPEN)
+
+        self.end_cooldown()
+        self.breaker.check(DESTINATION)
+        self.breaker.record_success(DESTINATION)
+        self.assertEqual(self.breaker.state(DESTINATION), CircuitState.CLOSED)
+
+
+class AdaptiveConcurrencyLimitTest(SimpleTestCase):
+    def test_additive_increase_multiplicative_decrease(self):
+        async def scenario():
+            limit = AdaptiveConcurrencyLimit(max_limit=8, min_limit=1)
+            for success in (False, False):
+                await limit.acquire()
+                await limit.release(success)
+            self.assertEqual(limit.limit, 2)
+            # about +1 per window of `limit` successes: 2 + 1/2 + 1/2.5
+            for _ in range(2):
+                await limit.acquire()
+                await limit.release(True)
+            self.assertAlmostEqual(limit.limit, 2.9)
+            # nothing sent, nothing learned
+            await limit.acquire()
+            await limit.release(None)
+            self.assertAlmostEqual(limit.limit, 2.9)
+
+        asyncio.run(scenario())
+
+    def test_in_flight_is_bounded_by_the_limit(self):
+        async def scenario():
+            limit = AdaptiveConcurrencyLimit(max_limit=3)
+            peak = 0
+
+            async def deliver():
+                nonlocal peak
+                await limit.acquire()
+                peak = max(peak, limit.in_flight)
+                await asyncio.sleep(0.01)
+                await limit.release(True)
+
+            await asyncio.gather(*(deliver() for _ in range(10)))
+            return peak
+
+        self.assertEqual(asyncio.run(scenario()), 3)
+
+
+@override_settings(
+    NOTIFICATION_WEBHOOK_DRY_RUN=False,
+    NOTIFICATION_WEBHOOK_URL=f"http://{DESTINATION}/webhook/",
+    NOTIFICATION_CIRCUIT_FAILURE_THRESHOLD=2,
+)
+class WebhookCircuitTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.requests = 0
+        self.notification = Notification.objects.create(
+            alert=self.alert_critical,
+            user_profile=self.profile_all,
+            channel=ChannelChoices.WEBHOOK,
+        )
+        self.breaker = CircuitBreaker()
+        self.strategy = WebhookChannelStrategy(
+            WebhookClientPool(httpx.MockTransport(self.handler)), self.breaker
+        )
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return httpx.Response(503)
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        return self.handler(request)
+
+    def test_open_circuit_defers_without_sending(self):
+        payload = build_payload(self.notification)
+        for _ in range(2):
+            with self.assertRaises(NotificationRetryableError):
+                self.strategy.send(self.notification, payload)
+
+        with self.assertRaises(NotificationDeferredError) as ctx:
+            self.strategy.send(self.notification, payload)
+        self.assertEqual(self.requests, 2)
+        self.assertGreater(ctx.exception.retry_after, 0)
+
+    def test_deferred_delivery_is_rescheduled_without_an_attempt(self):
+        self.breaker.record_failure(DESTINATION)
+        self.breaker.record_failure(DESTINATION)
+        strategy = AsyncWebhookChannelStrategy(
+            httpx.MockTransport(self.async_handler), self.breaker
+        )
+        with patch.dict(ASYNC_CHANNEL_REGISTRY, {ChannelChoices.WEBHOOK: strategy}):
+            send_notification_batch([str(self.notification.pk)])
+
+        self.notification.refresh_from_db()
+        self.assertEqual(self.requests, 0)
+        self.assertEqual(self.notification.status, Notification.StatusChoices.PENDING)
+        self.assertEqual(self.notification.attempt_count, 0)
+        self.assertIsNone(self.notification.last_attempt_at)
+        self.assertGreater(
+            self.notification.next_attempt_at, self.notification.modified
+        )
@@ -0,0 +1,50 @@
+import uuid
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from notifications.ids import uuid7, uuid7_time
+from notifications.models import Notification
+
+from .common import NotificationBaseTestCase
+
+NOW_NS = 1_773_000_000_123_456_789
+
+
+class UUID7Test(SimpleTestCase):
+    def setUp(self):
+        # the keys generated by the other tests are more recent than NOW_NS
+        state = patch.multiple("notifications.ids", _last_ms=0, _counter=0)
+        state.start()
+        self.addCleanup(state.stop)
+
+    def test_version_variant_and_time(self):
+        with patch("notifications.ids.time.time_ns", return_value=NOW_NS):
+            key = uuid7()
+        self.assertEqual((key.version, key.variant), (7, uuid.RFC_4122))
+        self.assertEqual(uuid7_time(key), 1_773_000_000.123)
+
+    def test_keys_are_monotonic_within_a_millisecond(self):
+        with patch("notifications.ids.time.time_ns", return_value=NOW_NS + 10**9):
+            # more than the 12 bits counter can count in a millisecond
+            keys = [uuid7() for _ in range(5000)]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        # the overflow carries the timestamp forward
+        self.assertGreater(uuid7_time(keys[-1]), uuid7_time(keys[0]))
+
+    def test_keys_are_monotonic_when_the_clock_goes_back(self):
+        with patch("notifications.ids.time.time_ns", return_value=NOW_NS + 2 * 10**9):
+            first = uuid7()
+        with patch("notifications.ids.time.time_ns", return_value=NOW_NS):
+            self.assertGreater(uuid7(), first)
+
+
+class TimeOrderedKeysTest(NotificationBaseTestCase):
+    def test_profiles_and_notifications_get_time_ordered_keys(self):
+        notification = Notification.objects.create(
+            alert=self.alert_critical, user_profile=self.profile_all
+        )
+        self.assertEqual(self.profile_all.pk.version, 7)
+        self.assertEqual(notification.pk.version, 7)
+        self.assertGreater(notification.pk, self.profile_all.pk)
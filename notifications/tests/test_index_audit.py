@@ -0,0 +1,79 @@
+import unittest
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+
+from notifications.index_audit import IndexInfo, duplicate_indexes, unused_indexes
+from notifications.models import Alert, Notification
+
+from .common import NotificationBaseTestCase
+
+
+def index(name: str, *columns: str, unique: bool = False, **kwargs) -> IndexInfo:
+    classes = kwargs.get("classes", " ".join("3126" for _ in columns))
+    return IndexInfo(
+        "notifications_alert",
+        name,
+        columns,
+        (classes, "btree", kwargs.get("predicate", "")),
+        unique,
+        kwargs.get("scans", 1),
+    )
+
+
+class IndexReportTest(unittest.TestCase):
+    def test_covered_indexes_are_duplicates(self):
+        prefix = index("store", "store_id")
+        identical = index("user_store", "user_id", "store_id")
+        infos = [
+            prefix,
+            index("store_time", "store_id", "time_spotted"),
+            identical,
+            index("user_store_uniq", "user_id", "store_id", unique=True),
+            # another predicate or operator class is not a duplicate
+            index("store_partial", "store_id", predicate="(label = 'theft')"),
+            index("store_like", "store_id", classes="10053"),
+        ]
+
+        self.assertEqual(
+            [
+                (duplicate.name, cover.name)
+                for duplicate, cover in duplicate_indexes(infos)
+            ],
+            [("store", "store_time"), ("user_store", "user_store_uniq")],
+        )
+
+    def test_unique_indexes_are_never_unused(self):
+        infos = [
+            index("pkey", "alert_uuid", unique=True, scans=0),
+            index("label", "label", scans=0),
+        ]
+        self.assertEqual([info.name for info in unused_indexes(infos)], ["label"])
+
+
+class AuditIndexesCommandTest(NotificationBaseTestCase):
+    @unittest.skipUnless(connection.vendor == "postgresql", "EXPLAIN on PostgreSQL")
+    def test_hot_paths_are_explained_and_rolled_back(self):
+        out = StringIO()
+        call_command(
+            "audit_indexes",
+            "--alert",
+            str(self.alert_critical.alert_uuid),
+            "--min-rows",
+            "0",
+            stdout=out,
+        )
+
+        report = out.getvalue()
+        for path in ("ingestion", "fan_out_notifications", "send_notification"):
+            self.assertIn(f"  {path}\n", report)
+        # the shipped index set has no redundant index
+        self.assertIn("Duplicate indexes:\nIndexes never scanned", report)
+        self.assertEqual(Alert.objects.count(), 2)
+        self.assertFalse(Notification.objects.exists())
+
+    @unittest.skipIf(connection.vendor == "postgresql", "other databases")
+    def test_needs_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command("audit_indexes")
@@ -0,0 +1,189 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from notifications.dispatcher import DeliveryOutcome
+from notifications.exceptions import NotificationRetryableError
+from notifications.latency import Histogram, latency_report, rollup_delivery_latency
+from notifications.models import (
+    Alert,
+    ChannelChoices,
+    DeliveryLatencyRollup,
+    JobCursor,
+    Notification,
+    Store,
+    UserProfile,
+)
+
+from .common import NotificationBaseTestCase, clear_caches
+
+NOW = datetime(2026, 3, 20, 12, 0, 50, tzinfo=timezone.utc)
+
+
+class DeliveryTimestampsTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.notification = Notification.objects.create(
+            alert=self.alert_critical, user_profile=self.profile_all
+        )
+
+    def record(self, outcome: DeliveryOutcome) -> Notification:
+        Notification.objects.record_deliveries([outcome.to_state()])
+        return Notification.objects.get(pk=self.notification.pk)
+
+    def test_first_attempt_queue_wait_and_sent_at(self):
+        started = self.notification.created + timedelta(seconds=2)
+        retried = self.record(
+            DeliveryOutcome(
+                self.notification,
+                error=NotificationRetryableError("503"),
+                started_at=started,
+                attempted_at=started + timedelta(seconds=1),
+            )
+        )
+        self.assertEqual(retried.first_attempt_at, started)
+        self.assertEqual(retried.queue_wait, timedelta(seconds=2))
+        self.assertIsNone(retried.sent_at)
+        self.assertIsNone(retried.recorded_at)
+
+        later = started + timedelta(seconds=60)
+        sent = self.record(
+            DeliveryOutcome(
+                retried,
+                response_data="OK",
+                started_at=later,
+                attempted_at=later + timedelta(seconds=1),
+            )
+        )
+        # the first attempt is kept, the success is the last one
+        self.assertEqual(sent.first_attempt_at, started)
+        self.assertEqual(sent.queue_wait, timedelta(seconds=2))
+        self.assertEqual(sent.sent_at, later + timedelta(seconds=1))
+        self.assertIsNotNone(sent.recorded_at)
+
+
+class HistogramTest(NotificationBaseTestCase):
+    def test_percentiles_are_within_the_bucket_precision(self):
+        histogram = Histogram()
+        for millis in range(1, 1001):
+            histogram.add(millis / 100)
+
+        summary = histogram.summary()
+        self.assertEqual(summary["count"], 1000)
+        self.assertEqual(summary["max"], 10.0)
+        for name, expected in (("p50", 5.0), ("p95", 9.5), ("p99", 9.9)):
+            self.assertGreaterEqual(summary[name], expected)
+            self.assertLessEqual(summary[name], expected * 1.1)
+
+
+@override_settings(NOTIFICATION_LATENCY_ROLLUP_DELAY=30)
+class LatencyRollupTest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.store = Store.objects.create(location_id="store-1", name="Store 1")
+        self.profiles = [
+            UserProfile.objects.create(user_id=uuid.uuid4(), store=self.store)
+            for _ in range(3)
+        ]
+
+    def sent(
+        self,
+        label: str,
+        latency: float,
+        sent_at: datetime,
+        recorded_at: datetime | None = None,
+    ) -> None:
+        alert = Alert.objects.create(
+            alert_uuid=uuid.uuid4(),
+            url="https://media.veesion.io/example.mp4",
+            store=self.store,
+            label=label,
+            time_spotted=sent_at - timedelta(seconds=latency),
+        )
+        for profile in self.profiles:
+            Notification.objects.create(
+                alert=alert,
+                user_profile=profile,
+                status=Notification.StatusChoices.SENT,
+                sent_at=sent_at,
+                recorded_at=recorded_at or sent_at,
+            )
+
+    def test_rollups_are_incremental(self):
+        self.sent("theft", 2.0, NOW - timedelta(minutes=3))
+        self.sent("normal", 5.0, NOW - timedelta(minutes=2))
+        # too recent, may not be recorded yet
+        self.sent("theft", 1.0, NOW - timedelta(seconds=10))
+
+        self.assertEqual(rollup_delivery_latency(NOW), 6)
+        self.assertEqual(DeliveryLatencyRollup.objects.count(), 2)
+        self.assertEqual(JobCursor.objects.get().position, NOW - timedelta(seconds=30))
+
+        # only the notifications sent since are read
+        self.assertEqual(rollup_delivery_latency(NOW + timedelta(seconds=60)), 3)
+        theft = DeliveryLatencyRollup.objects.filter(label="theft")
+        self.assertEqual(sorted(rollup.count for rollup in theft), [3, 3])
+        self.assertEqual(rollup_delivery_latency(NOW + timedelta(seconds=60)), 0)
+
+    def test_rows_committed_late_are_not_skipped(self):
+        rollup_delivery_latency(NOW)
+        # sent before the cursor position, recorded after it
+        self.sent(
+            "theft",
+            2.0,
+            NOW - timedelta(minutes=2),
+            recorded_at=NOW - timedelta(seconds=10),
+        )
+
+        self.assertEqual(rollup_delivery_latency(NOW + timedelta(seconds=60)), 3)
+        rollup = DeliveryLatencyRollup.objects.get()
+        self.assertEqual(rollup.minute, NOW.replace(second=0) - timedelta(minutes=2))
+
+    def test_same_minute_is_merged(self):
+        self.sent("theft", 2.0, NOW - timedelta(seconds=40))
+        rollup_delivery_latency(NOW)
+        self.sent("theft", 4.0, NOW - timedelta(seconds=25))
+        rollup_delivery_latency(NOW + timedelta(seconds=10))
+
+        rollup = DeliveryLatencyRollup.objects.get()
+        self.assertEqual(rollup.count, 6)
+        self.assertEqual(rollup.max_seconds, 4.0)
+        self.assertAlmostEqual(rollup.total_seconds, 18.0)
+
+    def test_report_per_window(self):
+        self.sent("theft", 2.0, NOW - timedelta(minutes=50))
+        self.sent("theft", 8.0, NOW - timedelta(minutes=2))
+        rollup_delivery_latency(NOW)
+
+        short, long = latency_report([300, 3600], now=NOW)
+
+        self.assertEqual(short["window"], 300)
+        [recent] = short["results"]
+        self.assertEqual(
+            (recent["store"], recent["label"], recent["channel"], recent["count"]),
+            ("store-1", "theft", ChannelChoices.WEBHOOK, 3),
+        )
+        self.assertEqual(recent["max"], 8.0)
+        [hour] = long["results"]
+        self.assertEqual(hour["count"], 6)
+        self.assertEqual(hour["mean"], 5.0)
+
+    def test_endpoint(self):
+        self.sent("theft", 2.0, NOW - timedelta(minutes=2))
+        self.sent("normal", 2.0, NOW - timedelta(minutes=2))
+        rollup_delivery_latency(NOW)
+
+        response = self.client.get(
+            reverse("delivery-latency"),
+            {"window": [86400 * 365], "label": "normal"},
+        )
+
+        self.assertEqual(response.status_code, 200)
+        [window] = response.data["windows"]
+        self.assertEqual([r["label"] for r in window["results"]], ["normal"])
+
+        response = self.client.get(reverse("delivery-latency"), {"window": 1})
+        self.assertEqual(response.status_code, 400)
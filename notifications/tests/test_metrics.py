@@ -0,0 +1,205 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from django.test import override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY
+from rest_framework.test import APITestCase
+
+from notifications.channels import InstrumentedStrategy
+from notifications.exceptions import NotificationRetryableError
+from notifications.models import ChannelChoices, DeliveryState, Notification, Store
+from notifications.tasks import fan_out_notifications
+from notifications.writer import DeliveryStateWriter
+
+from .common import NotificationBaseTestCase, clear_caches
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class IngestionMetricsTest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        Store.objects.create(location_id="store-1", name="Store 1")
+
+    def _alert(self, **overrides):
+        return {
+            "alert_uuid": str(uuid.uuid4()),
+            "url": "https://media.veesion.io/example.mp4",
+            "label": "theft",
+            "time_spotted": 1742470260.083,
+            "location": "store-1",
+            **overrides,
+        }
+
+    def test_webhook_requests_are_timed_and_rejections_counted(self):
+        before = sample(
+            "notifications_alert_ingestion_seconds_count",
+            endpoint="webhook-alerts",
+            status="200",
+        )
+        failures = sample(
+            "notifications_alert_validation_failures_total", endpoint="webhook-alerts"
+        )
+
+        self.client.post(reverse("webhook-alerts"), self._alert(), format="json")
+        self.client.post(
+            reverse("webhook-alerts"), self._alert(label="unknown"), format="json"
+        )
+
+        self.assertEqual(
+            sample(
+                "notifications_alert_ingestion_seconds_count",
+                endpoint="webhook-alerts",
+                status="200",
+            ),
+            before + 1,
+        )
+        self.assertEqual(
+            sample(
+                "notifications_alert_validation_failures_total",
+                endpoint="webhook-alerts",
+            ),
+            failures + 1,
+        )
+
+    def test_invalid_batch_items_are_counted(self):
+        failures = sample(
+            "notifications_alert_validation_failures_total",
+            endpoint="webhook-alerts-batch",
+        )
+
+        self.client.post(
+            reverse("webhook-alerts-batch"),
+            [self._alert(), self._alert(label="unknown"), {"alert_uuid": "nope"}],
+            format="json",
+        )
+
+        self.assertEqual(
+            sample(
+                "notifications_alert_validation_failures_total",
+                endpoint="webhook-alerts-batch",
+            ),
+            failures + 2,
+        )
+
+    def test_metrics_endpoint(self):
+        response = self.client.get(reverse("metrics"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b"notifications_alert_ingestion_seconds", response.content)
+
+
+class DeliveryMetricsTest(NotificationBaseTestCase):
+    def test_strategy_deliveries_are_timed_per_outcome(self):
+        class FlakyStrategy:
+            def send(self, notification, payload):
+                raise NotificationRetryableError("503")
+
+        notification = Notification(
+            alert=self.alert_critical, user_profile=self.profile_all
+        )
+        labels = {
+            "channel": ChannelChoices.EMAIL,
+            "destination": ChannelChoices.EMAIL,
+            "outcome": "retryable",
+        }
+        before = sample("notifications_delivery_seconds_count", **labels)
+
+        with self.assertRaises(NotificationRetryableError):
+            InstrumentedStrategy(ChannelChoices.EMAIL, FlakyStrategy()).send(
+                notification, b"{}"
+            )
+
+        self.assertEqual(
+            sample("notifications_delivery_seconds_count", **labels), before + 1
+        )
+
+    @override_settings(NOTIFICATION_WEBHOOK_URL="http://receiver.test/webhook/")
+    def test_webhook_destination_is_the_host(self):
+        class ReceiverStrategy:
+            def send(self, notification, payload):
+                return "OK"
+
+        labels = {
+            "channel": ChannelChoices.WEBHOOK,
+            "destination": "receiver.test",
+            "outcome": "success",
+        }
+        before = sample("notifications_delivery_seconds_count", **labels)
+
+        InstrumentedStrategy(ChannelChoices.WEBHOOK, ReceiverStrategy()).send(
+            Notification(), b"{}"
+        )
+
+        self.assertEqual(
+            sample("notifications_delivery_seconds_count", **labels), before + 1
+        )
+
+    def test_recorded_states_are_counted(self):
+        now = datetime.now(timezone.utc)
+        notifications = [
+            Notification.objects.create(alert=self.alert_critical, user_profile=profile)
+            for profile in (
+                self.profile_all,
+                self.profile_critical,
+                self.profile_standard,
+            )
+        ]
+        states = [
+            DeliveryState(
+                notifications[0].notification_uuid,
+                Notification.StatusChoices.SENT,
+                "OK",
+                now,
+            ),
+            DeliveryState(
+                notifications[1].notification_uuid,
+                Notification.StatusChoices.PENDING,
+                "503",
+                now,
+                now + timedelta(seconds=30),
+            ),
+            DeliveryState(
+                notifications[2].notification_uuid,
+                Notification.StatusChoices.FAILED,
+                "410",
+                now,
+            ),
+        ]
+        before = {
+            status: sample("notifications_delivery_states_total", status=status)
+            for status in ("sent", "retry", "failed")
+        }
+
+        DeliveryStateWriter().record(states)
+
+        for status, count in before.items():
+            self.assertEqual(
+                sample("notifications_delivery_states_total", status=status),
+                count + 1,
+            )
+
+
+class TaskMetricsTest(NotificationBaseTestCase):
+    @patch("notifications.tasks.group")
+    def test_fan_out_size_duration_and_queries(self, group):
+        task = "notifications.tasks.fan_out_notifications"
+        size = sample("notifications_fan_out_size_sum")
+        runs = sample("notifications_task_seconds_count", task=task, state="SUCCESS")
+        queries = sample("notifications_task_db_queries_sum", task=task)
+
+        fan_out_notifications.delay(str(self.alert_critical.alert_uuid))
+
+        self.assertEqual(sample("notifications_fan_out_size_sum"), size + 2)
+        self.assertEqual(
+            sample("notifications_task_seconds_count", task=task, state="SUCCESS"),
+            runs + 1,
+        )
+        self.assertGreater(
+            sample("notifications_task_db_queries_sum", task=task), queries
+        )
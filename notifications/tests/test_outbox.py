@@ -0,0 +1,118 @@
+import uuid
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError
+from django.urls import reverse
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from rest_framework.test import APITestCase
+
+from notifications.models import Alert, Notification, OutboxMessage, Store, UserProfile
+from notifications.outbox import prune_outbox, relay_outbox
+from notifications.priority import critical_queue, standard_queue
+
+from .common import clear_caches
+
+
+class OutboxTest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        store = Store.objects.create(location_id="store-1", name="Store 1")
+        UserProfile.objects.create(user_id=uuid.uuid4(), store=store)
+
+    def _alert(self, label="theft"):
+        return {
+            "alert_uuid": str(uuid.uuid4()),
+            "url": "https://media.veesion.io/example.mp4",
+            "label": label,
+            "time_spotted": 1742470260.083,
+            "location": "store-1",
+        }
+
+    def test_request_writes_the_outbox_without_publishing(self):
+        payload = self._alert()
+        with patch("notifications.outbox.group") as publish:
+            response = self.client.post(
+                reverse("webhook-alerts"), payload, format="json"
+            )
+
+        self.assertEqual(response.status_code, 200)
+        publish.assert_not_called()
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.task, "notifications.tasks.fan_out_notifications")
+        self.assertEqual(message.args, [payload["alert_uuid"]])
+        self.assertIsNone(message.published_at)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_alert_and_outbox_are_committed_together(self):
+        with (
+            patch("notifications.ingestion.enqueue_fan_out", side_effect=DatabaseError),
+            self.assertLogs("notifications.views", "ERROR"),
+        ):
+            response = self.client.post(
+                reverse("webhook-alerts"), self._alert(), format="json"
+            )
+
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(Alert.objects.exists())
+
+    def test_relay_publishes_and_marks_the_batch(self):
+        self.client.post(
+            reverse("webhook-alerts-batch"),
+            [self._alert("theft"), self._alert("normal"), self._alert("normal")],
+            format="json",
+        )
+
+        with patch("notifications.outbox.group") as publish:
+            self.assertEqual(relay_outbox(batch_size=2), 2)
+            self.assertEqual(relay_outbox(batch_size=2), 1)
+            self.assertEqual(relay_outbox(batch_size=2), 0)
+
+        self.assertEqual(publish.call_count, 2)
+        queues = [
+            signature.options["queue"]
+            for call in publish.call_args_list
+            for signature in call.args[0]
+        ]
+        self.assertEqual(queues, [critical_queue(), standard_queue(), standard_queue()])
+        self.assertFalse(OutboxMessage.objects.filter(published_at=None).exists())
+
+    def test_relay_runs_the_fan_out(self):
+        self.client.post(reverse("webhook-alerts"), self._alert(), format="json")
+        relay_outbox()
+        self.assertTrue(Notification.objects.get().is_sent)
+
+    def test_messages_stay_in_the_outbox_while_the_broker_is_down(self):
+        self.client.post(reverse("webhook-alerts"), self._alert(), format="json")
+
+        with patch("notifications.outbox.group") as publish:
+            publish.return_value.apply_async.side_effect = OperationalError
+            with self.assertRaises(OperationalError):
+                relay_outbox()
+        self.assertIsNone(OutboxMessage.objects.get().published_at)
+
+        call_command("relay_outbox", "--once")
+        self.assertIsNotNone(OutboxMessage.objects.get().published_at)
+        self.assertTrue(Notification.objects.get().is_sent)
+
+    def test_relay_loop_refuses_eager_tasks(self):
+        with self.assertRaisesMessage(CommandError, "CELERY_TASK_ALWAYS_EAGER"):
+            call_command("relay_outbox")
+
+    def test_only_old_published_messages_are_pruned(self):
+        old, recent, unpublished = OutboxMessage.objects.bulk_create(
+            OutboxMessage(task="notifications.tasks.fan_out_notifications")
+            for _ in range(3)
+        )
+        OutboxMessage.objects.filter(pk=old.pk).update(
+            published_at=timezone.now() - timedelta(days=2)
+        )
+        OutboxMessage.objects.filter(pk=recent.pk).update(published_at=timezone.now())
+
+        self.assertEqual(prune_outbox(), 1)
+        self.assertEqual(
+            set(OutboxMessage.objects.values_list("pk", flat=True)),
+            {recent.pk, unpublished.pk},
+        )
@@ -0,0 +1,192 @@
+import gzip
+import json
+import tempfile
+import threading
+import unittest
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+
+from notifications.ingestion import _upsert_alerts
+from notifications.models import Alert, Notification, RestoredPartition, Store
+from notifications.partitions import (
+    add_months,
+    archive_partitions,
+    ensure_partitions,
+    partition_name,
+    restore_partition,
+)
+
+from .common import NotificationBaseTestCase
+
+NOW = datetime(2020, 3, 20, 12, 0, tzinfo=timezone.utc)
+
+
+class PartitionKeyTest(NotificationBaseTestCase):
+    def test_notifications_get_the_time_spotted_of_their_alert(self):
+        notification = Notification.objects.create(
+            alert=self.alert_critical, user_profile=self.profile_all
+        )
+        Notification.objects.bulk_create_pending(
+            self.alert_critical, [(self.profile_critical.id, "webhook")]
+        )
+
+        self.assertEqual(
+            set(
+                Notification.objects.filter(alert=self.alert_critical).values_list(
+                    "alert_time_spotted", flat=True
+                )
+            ),
+            {self.alert_critical.time_spotted},
+        )
+        self.assertEqual(
+            notification.alert_time_spotted, self.alert_critical.time_spotted
+        )
+
+    def test_add_months(self):
+        self.assertEqual(add_months(NOW, 10), NOW.replace(year=2021, month=1))
+        self.assertEqual(add_months(NOW, -3), NOW.replace(year=2019, month=12))
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "PostgreSQL partitioning")
+@override_settings(
+    NOTIFICATION_PARTITION_PREMAKE=1, NOTIFICATION_PARTITION_RETENTION=12
+)
+class PartitionMaintenanceTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.archive_dir.cleanup)
+
+    def alert(self, time_spotted: datetime) -> Alert:
+        alert = Alert.objects.create(
+            alert_uuid=uuid.uuid4(),
+            url="https://media.veesion.io/example.mp4",
+            store=self.store,
+            label=Alert.LabelChoices.THEFT,
+            time_spotted=time_spotted,
+        )
+        Notification.objects.create(alert=alert, user_profile=self.profile_all)
+        return alert
+
+    def partition_of(self, alert: Alert) -> str:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT tableoid::regclass::text FROM notifications_alert "
+                "WHERE alert_uuid = %s",
+                [alert.alert_uuid],
+            )
+            return cursor.fetchone()[0]
+
+    def test_created_partitions_take_their_rows_from_the_default(self):
+        alert = self.alert(NOW.replace(month=4))
+        self.assertEqual(self.partition_of(alert), "notifications_alert_default")
+
+        created = ensure_partitions(NOW)
+
+        self.assertEqual(
+            sorted(created),
+            [
+                "notifications_alert_p2020_03",
+                "notifications_alert_p2020_04",
+                "notifications_notification_p2020_03",
+                "notifications_notification_p2020_04",
+            ],
+        )
+        self.assertEqual(self.partition_of(alert), "notifications_alert_p2020_04")
+        self.assertEqual(ensure_partitions(NOW), [])
+
+    def test_expired_partitions_are_archived_and_restored(self):
+        old = datetime(2019, 1, 15, tzinfo=timezone.utc)
+        with override_settings(NOTIFICATION_PARTITION_PREMAKE=0):
+            ensure_partitions(old)
+        alert = self.alert(old)
+        kept = self.alert(NOW)
+        # the deferred foreign key checks of this transaction prevent DROP TABLE
+        with connection.cursor() as cursor:
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+        with override_settings(NOTIFICATION_ARCHIVE_DIR=self.archive_dir.name):
+            archives = archive_partitions(NOW)
+
+        self.assertEqual(
+            sorted(path.name for path in archives),
+            [
+                f"{partition_name(table, old.replace(day=1))}.ndjson.gz"
+                for table in ("notifications_alert", "notifications_notification")
+            ],
+        )
+        self.assertFalse(Alert.objects.filter(pk=alert.pk).exists())
+        self.assertFalse(Notification.objects.filter(alert=alert).exists())
+        self.assertTrue(Notification.objects.filter(alert=kept).exists())
+        with gzip.open(sorted(archives)[0], "rt") as archive:
+            [row] = [json.loads(line) for line in archive]
+        self.assertEqual(row["alert_uuid"], str(alert.alert_uuid))
+
+        keep_until = NOW + timedelta(days=1)
+        self.assertEqual(
+            [restore_partition(path, keep_until) for path in sorted(archives)], [1, 1]
+        )
+        self.assertEqual(Alert.objects.get(pk=alert.pk).time_spotted, old)
+        self.assertEqual(self.partition_of(alert), "notifications_alert_p2019_01")
+        notification = Notification.objects.get(alert=alert)
+        self.assertEqual(notification.user_profile, self.profile_all)
+        # restoring again skips the rows already there
+        self.assertEqual(restore_partition(sorted(archives)[0], keep_until), 0)
+
+        with override_settings(NOTIFICATION_ARCHIVE_DIR=self.archive_dir.name):
+            # kept until keep_until, archived again after
+            self.assertEqual(archive_partitions(NOW), [])
+            self.assertTrue(Alert.objects.filter(pk=alert.pk).exists())
+            self.assertEqual(len(archive_partitions(keep_until)), 2)
+        self.assertFalse(Alert.objects.filter(pk=alert.pk).exists())
+        self.assertFalse(RestoredPartition.objects.exists())
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "PostgreSQL partitioning")
+class AlertUniquenessTest(TransactionTestCase):
+    def setUp(self):
+        self.store = Store.objects.create(location_id="store-1", name="Store 1")
+
+    def upsert(self, alert_uuid: uuid.UUID, time_spotted: datetime) -> None:
+        Alert.objects.upsert(
+            alert_uuid,
+            self.store,
+            "https://media.veesion.io/example.mp4",
+            Alert.LabelChoices.THEFT,
+            time_spotted,
+        )
+
+    def test_concurrent_inserts_of_an_alert_are_serialized(self):
+        alert_uuid = uuid.uuid4()
+
+        def redeliver():
+            try:
+                # another month: no conflict on (alert_uuid, time_spotted)
+                self.upsert(alert_uuid, NOW.replace(month=4))
+            finally:
+                connection.close()
+
+        with transaction.atomic():
+            # a batch holds the lock until its commit
+            _upsert_alerts(
+                {
+                    alert_uuid: {
+                        "url": "https://media.veesion.io/example.mp4",
+                        "location": "store-1",
+                        "label": Alert.LabelChoices.THEFT,
+                        "time_spotted": NOW,
+                    }
+                }
+            )
+            thread = threading.Thread(target=redeliver)
+            thread.start()
+            thread.join(timeout=0.5)
+            # waiting on the lock of the uncommitted alert
+            self.assertTrue(thread.is_alive())
+        thread.join()
+
+        [alert] = Alert.objects.filter(alert_uuid=alert_uuid)
+        self.assertEqual(alert.time_spotted, NOW.replace(month=4))
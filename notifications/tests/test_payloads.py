@@ -0,0 +1,75 @@
+import json
+from unittest.mock import patch
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from notifications.exceptions import NotificationPermanentError
+from notifications.models import ChannelChoices, Notification
+from notifications.payloads import build_payload, payload_templates
+from notifications.serializers import (
+    OutgoingAlertSerializer,
+    OutgoingNotificationSerializer,
+)
+
+from .common import NotificationBaseTestCase
+
+
+class PayloadTemplateCacheTest(NotificationBaseTestCase):
+    def notification(self, profile):
+        return Notification(
+            alert=self.alert_critical,
+            user_profile=profile,
+            channel=ChannelChoices.WEBHOOK,
+        )
+
+    def test_payload_matches_outgoing_schema(self):
+        payload = json.loads(build_payload(self.notification(self.profile_all)))
+
+        self.assertEqual(
+            payload,
+            {
+                "url": self.alert_critical.url,
+                "alert_uuid": str(self.alert_critical.alert_uuid),
+                "location": self.store.location_id,
+                "label": self.alert_critical.label,
+                "target_user_id": str(self.profile_all.user_id),
+            },
+        )
+        self.assertTrue(OutgoingNotificationSerializer(data=payload).is_valid())
+
+    def test_alert_is_validated_once_for_all_recipients(self):
+        with (
+            patch(
+                "notifications.payloads.OutgoingAlertSerializer",
+                wraps=OutgoingAlertSerializer,
+            ) as serializer,
+            CaptureQueriesContext(connection) as queries,
+        ):
+            payloads = [
+                build_payload(self.notification(profile))
+                for profile in (
+                    self.profile_all,
+                    self.profile_critical,
+                    self.profile_standard,
+                )
+            ]
+
+        self.assertEqual(serializer.call_count, 1)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(len(set(payloads)), 3)
+
+    def test_updated_alert_gets_a_new_template(self):
+        notification = self.notification(self.profile_all)
+        build_payload(notification)
+
+        self.alert_critical.url = "https://media.veesion.io/updated.mp4"
+        self.alert_critical.save()
+
+        payload = json.loads(build_payload(notification))
+        self.assertEqual(payload["url"], "https://media.veesion.io/updated.mp4")
+
+    def test_invalid_alert_is_a_permanent_error(self):
+        self.alert_critical.url = "not a url"
+        with self.assertRaises(NotificationPermanentError):
+            payload_templates.get(self.alert_critical)
@@ -0,0 +1,95 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from notifications.models import (
+    Alert,
+    ChannelChoices,
+    Notification,
+    OutboxMessage,
+    Store,
+)
+from notifications.priority import task_options
+from notifications.tasks import fan_out_notifications, sweep_due_notifications
+
+from .common import NotificationBaseTestCase, clear_caches
+
+CRITICAL = "notifications.critical"
+STANDARD = "notifications"
+
+
+class TaskOptionsTest(SimpleTestCase):
+    def test_critical_alerts_have_their_own_queue(self):
+        self.assertEqual(task_options(Alert.LabelChoices.THEFT), {"queue": CRITICAL})
+        self.assertEqual(task_options(Alert.LabelChoices.NORMAL), {"queue": STANDARD})
+        self.assertEqual(
+            task_options(Alert.LabelChoices.SUSPICIOUS), {"queue": STANDARD}
+        )
+
+    @override_settings(NOTIFICATION_BROKER_PRIORITIES=True)
+    def test_broker_priorities_by_label_and_retry(self):
+        self.assertEqual(task_options(Alert.LabelChoices.THEFT)["priority"], 0)
+        self.assertEqual(
+            task_options(Alert.LabelChoices.THEFT, retry=True)["priority"], 3
+        )
+        self.assertEqual(task_options(Alert.LabelChoices.SUSPICIOUS)["priority"], 3)
+        self.assertEqual(
+            task_options(Alert.LabelChoices.NORMAL, retry=True)["priority"], 9
+        )
+
+
+@patch("notifications.tasks.group")
+class FanOutRoutingTest(NotificationBaseTestCase):
+    def queues(self, group) -> set[str]:
+        (signatures,), _ = group.call_args
+        return {signature.options["queue"] for signature in signatures}
+
+    def test_critical_alert_batches_go_to_the_critical_queue(self, group):
+        fan_out_notifications(str(self.alert_critical.alert_uuid))
+        self.assertEqual(self.queues(group), {CRITICAL})
+
+    def test_standard_alert_batches_go_to_the_standard_queue(self, group):
+        fan_out_notifications(str(self.alert_standard.alert_uuid))
+        self.assertEqual(self.queues(group), {STANDARD})
+
+
+class SweepRoutingTest(NotificationBaseTestCase):
+    def test_retries_are_routed_by_alert_label(self):
+        due = timezone.now() - timedelta(seconds=1)
+        for alert in (self.alert_critical, self.alert_standard):
+            Notification.objects.create(
+                alert=alert,
+                user_profile=self.profile_all,
+                channel=ChannelChoices.WEBHOOK,
+                next_attempt_at=due,
+            )
+
+        with patch("notifications.tasks.send_notification_batch.apply_async") as send:
+            sweep_due_notifications()
+
+        queues = sorted(call.kwargs["queue"] for call in send.call_args_list)
+        self.assertEqual(queues, [STANDARD, CRITICAL])
+
+
+class AlertWebhookRoutingTest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        Store.objects.create(location_id="store-1", name="Store 1")
+
+    def test_theft_alert_fan_out_is_critical(self):
+        self.client.post(
+            reverse("webhook-alerts"),
+            {
+                "alert_uuid": "0b6c3b8e-58a4-4d1c-9d55-6c2f1a3c0e11",
+                "url": "https://media.veesion.io/example.mp4",
+                "label": "theft",
+                "time_spotted": 1742470260.083,
+                "location": "store-1",
+            },
+            format="json",
+        )
+        self.assertEqual(OutboxMessage.objects.get().options, {"queue": CRITICAL})
@@ -0,0 +1,222 @@
+import asyncio
+import threading
+import uuid
+from unittest import skipUnless
+from unittest.mock import patch
+
+import httpx
+from django.test import SimpleTestCase, override_settings
+
+from notifications.channels import (
+    AsyncWebhookChannelStrategy,
+    WebhookChannelStrategy,
+    WebhookClientPool,
+)
+from notifications.exceptions import (
+    NotificationDeferredError,
+    NotificationRetryableError,
+)
+from notifications.health import CircuitBreaker
+from notifications.models import ChannelChoices, Notification
+from notifications.payloads import build_payload
+from notifications.cache import get_redis
+from notifications.ratelimit import (
+    RATE_LIMIT_KEY,
+    RateLimit,
+    RateLimiter,
+    Reservation,
+    get_rate_limit,
+)
+
+from .common import REDIS_URL, NotificationBaseTestCase
+
+DESTINATION = "receiver.test"
+
+
+@override_settings(NOTIFICATION_WEBHOOK_RATE_LIMITS={DESTINATION: [2, 3]})
+class RateLimiterTest(SimpleTestCase):
+    def setUp(self):
+        self.limiter = RateLimiter()
+        self.now = 1000.0
+        patcher = patch(
+            "notifications.ratelimit.time.monotonic", side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_then_throttle(self):
+        for _ in range(3):
+            self.assertTrue(self.limiter.reserve(DESTINATION).granted)
+
+        reservation = self.limiter.reserve(DESTINATION)
+        self.assertFalse(reservation.granted)
+        self.assertAlmostEqual(reservation.wait, 0.5)
+
+    def test_tokens_refill_at_the_rate(self):
+        for _ in range(3):
+            self.limiter.reserve(DESTINATION)
+
+        self.now += 1.0
+        self.assertTrue(self.limiter.reserve(DESTINATION).granted)
+        self.assertTrue(self.limiter.reserve(DESTINATION).granted)
+        self.assertFalse(self.limiter.reserve(DESTINATION).granted)
+
+    def test_reserves_a_token_available_within_max_wait(self):
+        for _ in range(3):
+            self.limiter.reserve(DESTINATION)
+
+        reservation = self.limiter.reserve(DESTINATION, max_wait=1.0)
+        self.assertTrue(reservation.granted)
+        self.assertAlmostEqual(reservation.wait, 0.5)
+        # the next token is already promised
+        self.assertAlmostEqual(self.limiter.reserve(DESTINATION, 1.0).wait, 1.0)
+
+    @override_settings(
+        NOTIFICATION_WEBHOOK_DEFAULT_RATE=10, NOTIFICATION_WEBHOOK_DEFAULT_BURST=0
+    )
+    def test_rate_limit_per_destination(self):
+        self.assertEqual(get_rate_limit(DESTINATION), RateLimit(2.0, 3))
+        self.assertEqual(get_rate_limit("other.test"), RateLimit(10.0, 10))
+
+    def test_unlimited_destination(self):
+        self.assertIsNone(get_rate_limit("other.test"))
+        for _ in range(100):
+            self.assertTrue(self.limiter.reserve("other.test").granted)
+
+
+@override_settings(
+    NOTIFICATION_WEBHOOK_DRY_RUN=False,
+    NOTIFICATION_WEBHOOK_URL=f"http://{DESTINATION}/webhook/",
+    NOTIFICATION_WEBHOOK_RATE_LIMITS={DESTINATION: [1, 1]},
+)
+class WebhookRateLimitTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.requests = 0
+        self.notification = Notification.objects.create(
+            alert=self.alert_critical,
+            user_profile=self.profile_all,
+            channel=ChannelChoices.WEBHOOK,
+        )
+        self.limiter = RateLimiter()
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        return httpx.Response(200, text="OK")
+
+    async def async_handler(self, request: httpx.Request) -> httpx.Response:
+        return self.handler(request)
+
+    def test_throttled_delivery_is_deferred_without_sending(self):
+        strategy = WebhookChannelStrategy(
+            WebhookClientPool(httpx.MockTransport(self.handler)),
+            CircuitBreaker(),
+            self.limiter,
+        )
+        payload = build_payload(self.notification)
+        strategy.send(self.notification, payload)
+
+        with self.assertRaises(NotificationDeferredError) as ctx:
+            strategy.send(self.notification, payload)
+        self.assertEqual(self.requests, 1)
+        self.assertGreater(ctx.exception.retry_after, 0)
+
+    @override_settings(NOTIFICATION_RATE_LIMIT_MAX_WAIT=0.05)
+    def test_async_delivery_waits_only_up_to_max_wait(self):
+        strategy = AsyncWebhookChannelStrategy(
+            httpx.MockTransport(self.async_handler), CircuitBreaker(), self.limiter
+        )
+        payload = build_payload(self.notification)
+
+        async def send_twice():
+            await strategy.send(self.notification, payload)
+            with self.assertRaises(NotificationDeferredError):
+                await strategy.send(self.notification, payload)
+            await strategy.aclose()
+
+        asyncio.run(send_twice())
+        self.assertEqual(self.requests, 1)
+
+    def test_async_delivery_to_an_open_circuit_takes_no_token(self):
+        breaker = CircuitBreaker()
+        threads = []
+        strategy = AsyncWebhookChannelStrategy(
+            httpx.MockTransport(self.async_handler), breaker, self.limiter
+        )
+
+        def check(destination):
+            threads.append(threading.current_thread())
+            return 30.0
+
+        async def send():
+            with patch.object(breaker, "check", side_effect=check):
+                with self.assertRaises(NotificationDeferredError):
+                    await strategy.send(
+                        self.notification, build_payload(self.notification)
+                    )
+            await strategy.aclose()
+
+        asyncio.run(send())
+        self.assertTrue(self.limiter.reserve(DESTINATION).granted)
+        # a Redis round trip must not block the event loop
+        [thread] = threads
+        self.assertIsNot(thread, threading.main_thread())
+
+    def test_too_many_requests_is_retryable(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(429)
+
+        strategy = WebhookChannelStrategy(
+            WebhookClientPool(httpx.MockTransport(handler)),
+            CircuitBreaker(),
+            self.limiter,
+        )
+        with self.assertRaises(NotificationRetryableError):
+            strategy.send(self.notification, build_payload(self.notification))
+
+
+@skipUnless(REDIS_URL, "NOTIFICATION_REDIS_URL is not set")
+@override_settings(NOTIFICATION_REDIS_URL=REDIS_URL)
+class RedisRateLimiterTest(SimpleTestCase):
+    """The token bucket script, with the clock of Redis."""
+
+    def setUp(self):
+        self.destination = f"{uuid.uuid4()}.test"
+        self.limiter = RateLimiter()
+        self.addCleanup(get_redis().delete, f"{RATE_LIMIT_KEY}:{self.destination}")
+
+    def reserve(self, max_wait: float = 0.0) -> Reservation:
+        with override_settings(
+            NOTIFICATION_WEBHOOK_RATE_LIMITS={self.destination: [1, 3]}
+        ):
+            return self.limiter.reserve(self.destination, max_wait)
+
+    def test_burst_then_throttle(self):
+        for _ in range(3):
+            self.assertEqual(self.reserve(), Reservation(True, 0.0))
+
+        throttled = self.reserve()
+        self.assertFalse(throttled.granted)
+        self.assertGreater(throttled.wait, 0.5)
+        self.assertLessEqual(throttled.wait, 1.0)
+        # nothing was taken
+        self.assertAlmostEqual(self.reserve().wait, throttled.wait, delta=0.1)
+
+    def test_reserves_a_token_available_within_max_wait(self):
+        for _ in range(3):
+            self.reserve()
+
+        first, second = self.reserve(max_wait=5.0), self.reserve(max_wait=5.0)
+        self.assertTrue(first.granted and second.granted)
+        # the bucket went below zero, the next token is already promised
+        self.assertAlmostEqual(second.wait - first.wait, 1.0, delta=0.1)
+
+    def test_owed_tokens_outlive_the_key_expiry(self):
+        for _ in range(3):
+            self.reserve()
+        self.reserve(max_wait=5.0)
+        self.reserve(max_wait=5.0)
+
+        # 2 tokens owed: full again in burst / rate + 2 seconds, 5 at most
+        ttl = get_redis().ttl(f"{RATE_LIMIT_KEY}:{self.destination}")
+        self.assertGreaterEqual(ttl, 3 + 5)
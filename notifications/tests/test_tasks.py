@@ -1,14 +1,28 @@
 import uuid
+from datetime import timedelta
+from unittest.mock import patch
 
-from django.test import TestCase
+import httpx
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 
+from notifications.channels import ASYNC_CHANNEL_REGISTRY, AsyncWebhookChannelStrategy
 from notifications.models import Alert, ChannelChoices, Notification, Store, UserProfile
-from notifications.tasks import fan_out_notifications
+from notifications.routing import routing_cache
+from notifications.tasks import (
+    fan_out_notifications,
+    send_notification_batch,
+    sweep_due_notifications,
+)
+
+from .common import NotificationBaseTestCase, clear_caches
 
 
 class FanOutNotificationsTaskTest(TestCase):
     def setUp(self):
+        clear_caches()
         self.store = Store.objects.create(location_id="store-1", name="Store 1")
         self.alert = Alert.objects.create(
             alert_uuid=uuid.uuid4(),
@@ -43,3 +57,329 @@ class FanOutNotificationsTaskTest(TestCase):
             notif.status,
             [Notification.StatusChoices.PENDING, Notification.StatusChoices.SENT],
         )
+
+
+@patch("notifications.tasks.group")
+class SetBasedFanOutTest(NotificationBaseTestCase):
+    def test_preferences_are_filtered_in_sql(self, group):
+        fan_out_notifications(str(self.alert_critical.alert_uuid))
+        fan_out_notifications(str(self.alert_standard.alert_uuid))
+
+        self.assertEqual(
+            set(
+                Notification.objects.filter(alert=self.alert_critical).values_list(
+                    "user_profile", flat=True
+                )
+            ),
+            {self.profile_all.pk, self.profile_critical.pk},
+        )
+        self.assertEqual(
+            set(
+                Notification.objects.filter(alert=self.alert_standard).values_list(
+                    "user_profile", flat=True
+                )
+            ),
+            {self.profile_all.pk, self.profile_standard.pk},
+        )
+        # matches the per-profile rule
+        for profile in UserProfile.objects.all():
+            self.assertEqual(
+                profile.should_notify(self.alert_critical),
+                Notification.objects.filter(
+                    alert=self.alert_critical, user_profile=profile
+                ).exists(),
+            )
+
+    def test_query_count_does_not_depend_on_store_size(self, group):
+        with CaptureQueriesContext(connection) as small:
+            fan_out_notifications(str(self.alert_critical.alert_uuid))
+
+        for _ in range(20):
+            UserProfile.objects.create(user_id=uuid.uuid4(), store=self.store)
+        with CaptureQueriesContext(connection) as large:
+            fan_out_notifications(str(self.alert_standard.alert_uuid))
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(
+            Notification.objects.filter(alert=self.alert_standard).count(), 22
+        )
+
+    def test_fan_out_again_resets_existing_notifications(self, group):
+        fan_out_notifications(str(self.alert_critical.alert_uuid))
+        notification = Notification.objects.get(
+            alert=self.alert_critical, user_profile=self.profile_all
+        )
+        notification.mark_failed("boom")
+
+        fan_out_notifications(str(self.alert_critical.alert_uuid))
+
+        reset = Notification.objects.get(pk=notification.pk)
+        self.assertEqual(reset.status, Notification.StatusChoices.PENDING)
+        self.assertEqual(reset.attempt_count, 0)
+        # the failed attempt stays in the log
+        self.assertEqual(reset.attempts.get().response_body, "boom")
+        self.assertEqual(
+            Notification.objects.filter(alert=self.alert_critical).count(), 2
+        )
+
+
+@override_settings(
+    NOTIFICATION_WEBHOOK_DRY_RUN=False,
+    NOTIFICATION_WEBHOOK_URL="http://receiver.test/webhook/",
+)
+class SendNotificationBatchTaskTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.status_by_user: dict[str, int] = {}
+        self.notifications = [
+            Notification.objects.create(
+                alert=self.alert_critical,
+                user_profile=profile,
+                channel=ChannelChoices.WEBHOOK,
+            )
+            for profile in (self.profile_all, self.profile_critical)
+        ]
+        self.uuids = [str(n.notification_uuid) for n in self.notifications]
+        strategy = AsyncWebhookChannelStrategy(httpx.MockTransport(self.handler))
+        registry = patch.dict(
+            ASYNC_CHANNEL_REGISTRY, {ChannelChoices.WEBHOOK: strategy}
+        )
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        body = request.read().decode()
+        for user_id, status in self.status_by_user.items():
+            if user_id in body:
+                return httpx.Response(status, text="KO")
+        return httpx.Response(200, text="OK")
+
+    def test_batch_is_loaded_and_recorded_in_bulk(self):
+        # one SELECT, one UPDATE for the attempts and outcomes, one INSERT
+        # of the attempt log
+        with self.assertNumQueries(3):
+            send_notification_batch(self.uuids)
+
+        for notification in self.notifications:
+            notification.refresh_from_db()
+            self.assertTrue(notification.is_sent)
+            self.assertEqual(notification.attempt_count, 1)
+            attempt = notification.attempts.get()
+            self.assertEqual((attempt.status_code, attempt.response_body), (200, "OK"))
+
+    def test_only_failed_items_are_retried(self):
+        self.status_by_user = {str(self.profile_critical.user_id): 503}
+
+        send_notification_batch(self.uuids)
+
+        sent, pending = (Notification.objects.get(pk=n.pk) for n in self.notifications)
+        self.assertTrue(sent.is_sent)
+        self.assertIsNone(sent.next_attempt_at)
+        self.assertEqual(pending.status, Notification.StatusChoices.PENDING)
+        self.assertEqual(pending.attempt_count, 1)
+        # scheduled on the row with backoff, not through the broker
+        self.assertGreater(pending.next_attempt_at, timezone.now())
+
+    def test_permanent_errors_are_not_retried(self):
+        self.status_by_user = {str(self.profile_critical.user_id): 410}
+
+        send_notification_batch(self.uuids)
+
+        failed = Notification.objects.get(pk=self.notifications[1].pk)
+        self.assertEqual(failed.status, Notification.StatusChoices.FAILED)
+        attempt = failed.attempts.get()
+        self.assertEqual((attempt.outcome, attempt.status_code), ("failed", 410))
+        self.assertEqual(attempt.error_class, "HTTPStatusError")
+
+    def test_fan_out_chunks_by_configured_batch_size(self):
+        for _ in range(4):
+            UserProfile.objects.create(user_id=uuid.uuid4(), store=self.store)
+
+        with override_settings(NOTIFICATION_SEND_BATCH_SIZE=2):
+            with patch("notifications.tasks.group") as group:
+                fan_out_notifications(str(self.alert_standard.alert_uuid))
+
+        signatures = list(group.call_args.args[0])
+        self.assertEqual([len(s.args[0]) for s in signatures], [2, 2, 2])
+
+
+@override_settings(
+    NOTIFICATION_WEBHOOK_DRY_RUN=False,
+    NOTIFICATION_WEBHOOK_URL="http://receiver.test/webhook/",
+    NOTIFICATION_MAX_ATTEMPTS=3,
+)
+class RetrySchedulerTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.status_code = 503
+        self.notification = Notification.objects.create(
+            alert=self.alert_critical,
+            user_profile=self.profile_all,
+            channel=ChannelChoices.WEBHOOK,
+            next_attempt_at=timezone.now() - timedelta(seconds=1),
+        )
+        strategy = AsyncWebhookChannelStrategy(
+            httpx.MockTransport(lambda request: httpx.Response(self.status_code))
+        )
+        registry = patch.dict(
+            ASYNC_CHANNEL_REGISTRY, {ChannelChoices.WEBHOOK: strategy}
+        )
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def make_due(self):
+        Notification.objects.filter(pk=self.notification.pk).update(
+            next_attempt_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_sweeper_delivers_due_notifications(self):
+        self.status_code = 200
+        sweep_due_notifications()
+
+        self.notification.refresh_from_db()
+        self.assertTrue(self.notification.is_sent)
+        self.assertIsNone(self.notification.next_attempt_at)
+
+    def test_backoff_until_attempts_are_exhausted(self):
+        delays = []
+        for _ in range(2):
+            sweep_due_notifications()
+            self.notification.refresh_from_db()
+            self.assertEqual(
+                self.notification.status, Notification.StatusChoices.PENDING
+            )
+            delays.append(
+                self.notification.next_attempt_at - self.notification.last_attempt_at
+            )
+            self.make_due()
+        # exponential: the second delay is at least the first one
+        self.assertGreaterEqual(delays[1], delays[0])
+
+        sweep_due_notifications()
+        self.notification.refresh_from_db()
+        self.assertEqual(self.notification.status, Notification.StatusChoices.FAILED)
+        self.assertEqual(self.notification.attempt_count, 3)
+        self.assertIsNone(self.notification.next_attempt_at)
+
+    def test_claim_skips_rows_not_due_and_leases_claimed_rows(self):
+        later = Notification.objects.create(
+            alert=self.alert_critical,
+            user_profile=self.profile_critical,
+            channel=ChannelChoices.WEBHOOK,
+            next_attempt_at=timezone.now() + timedelta(minutes=5),
+        )
+
+        self.assertEqual(
+            Notification.objects.claim_due(10),
+            [(self.notification.pk, self.alert_critical.label)],
+        )
+        # claimed rows are leased, a second sweeper does not get them
+        self.assertEqual(Notification.objects.claim_due(10), [])
+        self.notification.refresh_from_db()
+        self.assertGreater(self.notification.next_attempt_at, later.next_attempt_at)
+
+    def test_fan_out_leases_pending_rows(self):
+        with patch("notifications.tasks.group"):
+            fan_out_notifications(str(self.alert_standard.alert_uuid))
+
+        # not delivered since the group is mocked: reclaimed once the lease expires
+        stuck = Notification.objects.filter(alert=self.alert_standard)
+        self.assertTrue(stuck.exists())
+        self.assertEqual(
+            Notification.objects.claim_due(10),
+            [(self.notification.pk, self.alert_critical.label)],
+        )
+        stuck.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(Notification.objects.claim_due(10)), stuck.count())
+
+
+@patch("notifications.tasks.group")
+class StoreRoutingCacheTest(NotificationBaseTestCase):
+    def test_hot_store_fan_out_needs_no_profile_query(self, group):
+        fan_out_notifications(str(self.alert_critical.alert_uuid))
+
+        with CaptureQueriesContext(connection) as queries:
+            fan_out_notifications(str(self.alert_standard.alert_uuid))
+
+        self.assertFalse(
+            [
+                q
+                for q in queries
+                if UserProfile._meta.db_table in q["sql"].split("FROM")[-1]
+            ]
+        )
+        self.assertEqual(
+            Notification.objects.filter(alert=self.alert_standard).count(), 2
+        )
+
+    def test_profile_changes_invalidate_the_store_entry(self, group):
+        fan_out_notifications(str(self.alert_critical.alert_uuid))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            newcomer = UserProfile.objects.create(
+                user_id=uuid.uuid4(),
+                store=self.store,
+                notification_preference=UserProfile.NotificationPreferenceChoices.CRITICAL,
+            )
+            self.profile_critical.delete()
+
+        recipients = routing_cache.get_recipients(self.alert_critical)
+        self.assertEqual(
+            {subscriber.profile_id for subscriber in recipients},
+            {self.profile_all.pk, newcomer.pk},
+        )
+
+    def test_profile_moving_store_invalidates_both_stores(self, group):
+        other_store = Store.objects.create(location_id="store-2")
+        routing_cache.get_subscribers(self.store.location_id)
+        routing_cache.get_subscribers(other_store.location_id)
+
+        self.profile_all.store = other_store
+        self.profile_all.save()
+
+        self.assertNotIn(
+            self.profile_all.pk,
+            {
+                s.profile_id
+                for s in routing_cache.get_subscribers(self.store.location_id)
+            },
+        )
+        self.assertIn(
+            self.profile_all.pk,
+            {
+                s.profile_id
+                for s in routing_cache.get_subscribers(other_store.location_id)
+            },
+        )
+
+
+@patch("notifications.tasks.group")
+class StaleRoutingCacheTest(TransactionTestCase):
+    def setUp(self):
+        clear_caches()
+        self.store = Store.objects.create(location_id="store-1", name="Store 1")
+        self.alert = Alert.objects.create(
+            alert_uuid=uuid.uuid4(),
+            url="https://media.veesion.io/critical.mp4",
+            store=self.store,
+            label=Alert.LabelChoices.THEFT,
+            time_spotted=timezone.now(),
+        )
+        self.profiles = [
+            UserProfile.objects.create(user_id=uuid.uuid4(), store=self.store)
+            for _ in range(2)
+        ]
+
+    def test_profile_deleted_by_another_process_is_reloaded(self, group):
+        routing_cache.get_subscribers(self.store.location_id)
+        # deleted elsewhere, without Redis the invalidation never comes
+        with patch.object(routing_cache, "invalidate"):
+            self.profiles[1].delete()
+
+        fan_out_notifications(str(self.alert.alert_uuid))
+
+        self.assertEqual(
+            list(Notification.objects.values_list("user_profile", flat=True)),
+            [self.profiles[0].pk],
+        )
+        self.assertEqual(len(routing_cache.get_recipients(self.alert)), 1)
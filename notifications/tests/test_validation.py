@@ -0,0 +1,120 @@
+import uuid
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.test import APITestCase
+
+from notifications.models import Alert, Store
+from notifications.serializers import AlertCreateSerializer
+from notifications.validation import validate_alert_payload
+
+from .common import clear_caches
+
+VALID = {
+    "alert_uuid": "0b6c3b8e-58a4-4d1c-9d55-6c2f1a3c0e11",
+    "url": "https://media.veesion.io/example.mp4",
+    "label": "theft",
+    "time_spotted": 1742470260.083,
+    "location": "store-1",
+}
+
+# (name, payload) pairs, every payload must be judged the same way by both paths
+CASES = [
+    ("valid", VALID),
+    ("uuid as int", {**VALID, "alert_uuid": 42}),
+    ("uuid without dashes", {**VALID, "alert_uuid": uuid.uuid4().hex}),
+    ("time as int", {**VALID, "time_spotted": 1742470260}),
+    ("time as string", {**VALID, "time_spotted": "1742470260.5"}),
+    ("url with whitespace", {**VALID, "url": "  https://veesion.io/a.mp4 "}),
+    ("location as int", {**VALID, "location": 1}),
+    ("empty payload", {}),
+    ("nulls", {name: None for name in VALID}),
+    ("blanks", {name: "" for name in VALID}),
+    ("whitespace", {name: "   " for name in VALID}),
+    ("bad uuid", {**VALID, "alert_uuid": "not-a-uuid"}),
+    ("negative uuid", {**VALID, "alert_uuid": -1}),
+    ("uuid as list", {**VALID, "alert_uuid": ["x"]}),
+    ("bad url", {**VALID, "url": "not a url"}),
+    ("url as bool", {**VALID, "url": True}),
+    ("url as dict", {**VALID, "url": {"a": 1}}),
+    ("url too long", {**VALID, "url": "https://veesion.io/" + "a" * 500}),
+    ("url with null char", {**VALID, "url": "https://veesion.io/\x00"}),
+    ("unknown label", {**VALID, "label": "robbery"}),
+    ("label as int", {**VALID, "label": 1}),
+    ("label wrong case", {**VALID, "label": "THEFT"}),
+    ("bad time", {**VALID, "time_spotted": "yesterday"}),
+    ("time out of range", {**VALID, "time_spotted": 1e20}),
+    ("time as bool", {**VALID, "time_spotted": True}),
+    ("time as list", {**VALID, "time_spotted": [1]}),
+    ("list payload", [VALID]),
+    ("string payload", "alert"),
+]
+
+
+class FastValidationParityTest(TestCase):
+    def setUp(self):
+        clear_caches()
+        Store.objects.create(location_id="store-1", name="Store 1")
+
+    def assertSameErrors(self, fast_errors, drf_errors):
+        # ErrorDetail equality ignores codes, compare them explicitly
+        self.assertEqual(fast_errors, drf_errors)
+        self.assertEqual(
+            {name: [e.code for e in errors] for name, errors in fast_errors.items()},
+            {name: [e.code for e in errors] for name, errors in drf_errors.items()},
+        )
+
+    def test_same_result_as_serializer(self):
+        for name, payload in CASES:
+            with self.subTest(name):
+                serializer = AlertCreateSerializer(data=payload)
+                is_valid = serializer.is_valid()
+                try:
+                    record = validate_alert_payload(payload)
+                except serializers.ValidationError as exc:
+                    self.assertFalse(is_valid, exc.detail)
+                    self.assertSameErrors(exc.detail, serializer.errors)
+                    continue
+
+                self.assertTrue(is_valid, serializer.errors)
+                expected = serializer.validated_data
+                self.assertEqual(record.alert_uuid, expected["alert_uuid"])
+                self.assertEqual(record.url, expected["url"])
+                self.assertEqual(record.label, expected["label"])
+                self.assertEqual(record.time_spotted, expected["time_spotted"])
+                self.assertEqual(record.location, expected["location"].location_id)
+
+    def test_no_data(self):
+        serializer = AlertCreateSerializer(data=None)
+        self.assertFalse(serializer.is_valid())
+        with self.assertRaises(serializers.ValidationError) as ctx:
+            validate_alert_payload(None)
+        self.assertSameErrors(ctx.exception.detail, serializer.errors)
+
+
+@override_settings(NOTIFICATION_ALERT_FAST_VALIDATION=True)
+class AlertWebhookFastValidationAPITest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.url = reverse("webhook-alerts")
+
+    def test_post_creates_alert_and_store(self):
+        payload = {**VALID, "location": "store-2"}
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["alert_uuid"], VALID["alert_uuid"])
+        alert = Alert.objects.get(alert_uuid=VALID["alert_uuid"])
+        self.assertEqual(alert.store_id, "store-2")
+
+    def test_post_invalid_returns_serializer_errors(self):
+        payload = {**VALID, "label": "robbery"}
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        # the store is only resolved once the payload is valid
+        self.assertFalse(Store.objects.exists())
+        with override_settings(NOTIFICATION_ALERT_FAST_VALIDATION=False):
+            expected = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.json(), expected.json())
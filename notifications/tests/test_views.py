@@ -1,13 +1,28 @@
+import json
+import threading
 import uuid
+from unittest.mock import patch
 
+from asgiref.sync import sync_to_async
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from django.utils import timezone
+from rest_framework.test import APITestCase, APITransactionTestCase
 
-from notifications.models import Alert, Store
+from notifications.models import Alert, OutboxMessage, Store
+from notifications.ingestion import save_alert
+from notifications.serializers import AlertReadOnlySerializer
+from notifications.stores import store_resolver
+from notifications.views import _db_executor
+
+from .common import clear_caches
 
 
 class AlertWebhookAPITest(APITestCase):
     def setUp(self):
+        clear_caches()
         self.url = reverse("webhook-alerts")
         Store.objects.create(location_id="store-1", name="Store 1")
         self.payload = {
@@ -34,3 +49,281 @@ class AlertWebhookAPITest(APITestCase):
         self.assertEqual(
             Alert.objects.filter(alert_uuid=self.payload["alert_uuid"]).count(), 1
         )
+
+
+class AlertWebhookAsyncViewTest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.url = reverse("webhook-alerts-async")
+        Store.objects.create(location_id="store-1", name="Store 1")
+        self.payload = {
+            "url": "https://media.veesion.io/example.mp4",
+            "location": "store-1",
+            "alert_uuid": str(uuid.uuid4()),
+            "label": Alert.LabelChoices.THEFT,
+            "time_spotted": 1742470260.083,
+        }
+
+    async def post(self, payload):
+        return await self.async_client.post(
+            self.url, json.dumps(payload), content_type="application/json"
+        )
+
+    async def test_post_upserts_alert_and_writes_the_outbox(self):
+        response = await self.post(self.payload)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["alert_uuid"], self.payload["alert_uuid"])
+        self.assertTrue(
+            await Alert.objects.filter(pk=self.payload["alert_uuid"]).aexists()
+        )
+        self.assertEqual(await OutboxMessage.objects.acount(), 1)
+
+    async def test_same_representation_as_the_sync_view(self):
+        response = await self.post(self.payload)
+        alert = await Alert.objects.select_related("store").aget(
+            pk=self.payload["alert_uuid"]
+        )
+        self.assertEqual(response.json(), dict(AlertReadOnlySerializer(alert).data))
+
+    async def test_invalid_payload_has_the_serializer_errors(self):
+        invalid = {**self.payload, "label": "robbery", "time_spotted": "yesterday"}
+        response = await self.post(invalid)
+        expected = await sync_to_async(self.client.post)(
+            reverse("webhook-alerts"), invalid, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), json.loads(json.dumps(expected.data)))
+
+    async def test_malformed_json_is_rejected(self):
+        response = await self.async_client.post(
+            self.url, "{", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_exact_redelivery_needs_no_database(self):
+        first = await self.post(self.payload)
+        with patch("notifications.views.save_alert") as save:
+            second = await self.post(self.payload)
+        save.assert_not_called()
+        self.assertEqual(second.json(), first.json())
+
+
+@override_settings(NOTIFICATION_ASYNC_DB_THREADS=1)
+class AlertWebhookAsyncViewDBThreadsTest(TransactionTestCase):
+    def setUp(self):
+        clear_caches()
+        _db_executor.cache_clear()
+        self.addCleanup(_db_executor.cache_clear)
+        Store.objects.create(location_id="store-1", name="Store 1")
+
+    def tearDown(self):
+        # the connection of the pool thread would outlive the test database
+        _db_executor().submit(lambda: connection.close()).result()
+        _db_executor().shutdown()
+
+    async def test_transactions_run_on_the_pool_threads(self):
+        threads = set()
+        with patch(
+            "notifications.views.save_alert",
+            side_effect=lambda record: threads.add(threading.current_thread().name)
+            or save_alert(record),
+        ):
+            for _ in range(2):
+                response = await self.async_client.post(
+                    reverse("webhook-alerts-async"),
+                    {
+                        "url": "https://media.veesion.io/example.mp4",
+                        "location": "store-1",
+                        "alert_uuid": str(uuid.uuid4()),
+                        "label": Alert.LabelChoices.THEFT,
+                        "time_spotted": 1742470260.083,
+                    },
+                    content_type="application/json",
+                )
+                self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads.pop().startswith("alert-db"))
+        self.assertEqual(await OutboxMessage.objects.acount(), 2)
+
+
+class AlertBatchWebhookAPITest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.url = reverse("webhook-alerts-batch")
+        self.existing = Alert.objects.create(
+            alert_uuid=uuid.uuid4(),
+            url="https://media.veesion.io/old.mp4",
+            store=Store.objects.create(location_id="store-1", name="Store 1"),
+            label=Alert.LabelChoices.NORMAL,
+            time_spotted=timezone.now(),
+        )
+
+    def _alert(self, **overrides):
+        return {
+            "url": "https://media.veesion.io/example.mp4",
+            "location": "store-2",
+            "alert_uuid": str(uuid.uuid4()),
+            "label": Alert.LabelChoices.THEFT,
+            "time_spotted": 1742470260.083,
+            **overrides,
+        }
+
+    def test_json_array_upserts_alerts_and_stores(self):
+        batch = [
+            self._alert(),
+            self._alert(alert_uuid=str(self.existing.alert_uuid), location="store-1"),
+        ]
+        response = self.client.post(self.url, batch, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["created"], 1)
+        self.assertEqual(response.data["updated"], 1)
+        self.assertEqual(
+            [result["status"] for result in response.data["results"]],
+            ["created", "updated"],
+        )
+        self.assertTrue(Store.objects.filter(location_id="store-2").exists())
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.label, Alert.LabelChoices.THEFT)
+
+    def test_ndjson_bad_items_do_not_reject_batch(self):
+        lines = [
+            json.dumps(self._alert()),
+            "{not json",
+            json.dumps(self._alert(label="robbery")),
+            json.dumps(self._alert()),
+        ]
+        response = self.client.post(
+            self.url, "\n".join(lines), content_type="application/x-ndjson"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["created", "invalid", "invalid", "created"])
+        self.assertIn("label", response.data["results"][2]["errors"])
+        self.assertEqual(Alert.objects.count(), 3)
+
+    def test_truncated_json_array_keeps_decoded_items(self):
+        body = json.dumps([self._alert()])[:-1] + ', {"url": '
+        response = self.client.post(self.url, body, content_type="application/json")
+
+        self.assertEqual(response.status_code, 200)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["created", "invalid"])
+
+    def test_ndjson_undecodable_line_is_invalid(self):
+        body = b"\n".join(
+            [json.dumps(self._alert()).encode(), b'{"alert_uuid": "\xff\xfe"}']
+        )
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 200)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["created", "invalid"])
+
+    def test_undecodable_json_array(self):
+        body = b'[{"alert_uuid": "\xff\xfe"}]'
+        response = self.client.post(self.url, body, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+        # past the first items, in a later chunk
+        body = json.dumps([self._alert()]).encode()[:-1] + b', {"url": "\xff"}]'
+        with patch("notifications.parsers.CHUNK_SIZE", 16):
+            response = self.client.post(self.url, body, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        statuses = [result["status"] for result in response.data["results"]]
+        self.assertEqual(statuses, ["created", "invalid"])
+
+    def test_non_array_json_is_rejected(self):
+        response = self.client.post(self.url, self._alert(), format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, [self._alert()], format="json")
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(
+                self.url, [self._alert() for _ in range(50)], format="json"
+            )
+        self.assertEqual(len(small), len(large))
+
+
+class StoreResolutionCacheTest(APITestCase):
+    def setUp(self):
+        clear_caches()
+        self.url = reverse("webhook-alerts")
+
+    def _post(self, location):
+        payload = {
+            "url": "https://media.veesion.io/example.mp4",
+            "location": location,
+            "alert_uuid": str(uuid.uuid4()),
+            "label": Alert.LabelChoices.THEFT,
+            "time_spotted": 1742470260.083,
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [
+            q for q in queries if Store._meta.db_table in q["sql"].split("FROM")[-1]
+        ]
+
+    def test_only_first_alert_of_a_store_touches_store_table(self):
+        hits = store_resolver.stats()["hits"]
+        self.assertTrue(self._post("store-new"))
+        self.assertFalse(self._post("store-new"))
+        self.assertTrue(Store.objects.filter(location_id="store-new").exists())
+        self.assertEqual(store_resolver.stats()["hits"], hits + 1)
+
+    def test_store_deletion_is_forgotten(self):
+        self._post("store-new")
+        Store.objects.get(location_id="store-new").delete()
+
+        self._post("store-new")
+        self.assertTrue(Store.objects.filter(location_id="store-new").exists())
+
+    def test_uncommitted_store_is_not_cached(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                store_resolver.resolve("store-rolled-back")
+                raise RuntimeError
+
+        self.assertIsNone(store_resolver._cache.get("store-rolled-back"))
+
+
+class DeletedStoreTest(APITransactionTestCase):
+    """A store deleted by another process, still in this process's cache."""
+
+    def setUp(self):
+        clear_caches()
+        store_resolver.resolve("store-1")
+        with patch.object(store_resolver, "forget"):
+            Store.objects.get(location_id="store-1").delete()
+
+    def _alert(self):
+        return {
+            "url": "https://media.veesion.io/example.mp4",
+            "location": "store-1",
+            "alert_uuid": str(uuid.uuid4()),
+            "label": Alert.LabelChoices.THEFT,
+            "time_spotted": 1742470260.083,
+        }
+
+    def test_alert_is_saved_with_the_store_created_again(self):
+        response = self.client.post(
+            reverse("webhook-alerts"), self._alert(), format="json"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Alert.objects.filter(store_id="store-1").exists())
+
+    def test_batch_is_saved_with_the_store_created_again(self):
+        response = self.client.post(
+            reverse("webhook-alerts-batch"), [self._alert()], format="json"
+        )
+
+        self.assertEqual(response.data["created"], 1)
+        self.assertTrue(Store.objects.filter(location_id="store-1").exists())
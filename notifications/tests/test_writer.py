@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+from django.db import OperationalError, transaction
+
+from notifications.models import ChannelChoices, DeliveryState, Notification
+from notifications.writer import DeliveryStateWriter
+
+from .common import NotificationBaseTestCase
+
+SENT = Notification.StatusChoices.SENT
+FAILED = Notification.StatusChoices.FAILED
+PENDING = Notification.StatusChoices.PENDING
+
+
+class DeliveryStateWriterTest(NotificationBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.notifications = [
+            Notification.objects.create(
+                alert=self.alert_critical,
+                user_profile=profile,
+                channel=ChannelChoices.WEBHOOK,
+            )
+            for profile in (self.profile_all, self.profile_critical)
+        ]
+
+    def state(self, notification, status, response_data=None):
+        return DeliveryState(
+            notification.notification_uuid,
+            status,
+            response_data,
+            datetime.now(timezone.utc),
+        )
+
+    def test_attempt_and_outcomes_in_one_update(self):
+        sent, failed = self.notifications
+        # the update of the notifications and the insert of their attempts
+        with self.assertNumQueries(2):
+            DeliveryStateWriter().record(
+                [self.state(sent, SENT, "OK"), self.state(failed, FAILED, "410")]
+            )
+
+        sent.refresh_from_db()
+        failed.refresh_from_db()
+        self.assertEqual((sent.status, sent.attempt_count), (SENT, 1))
+        self.assertEqual((failed.status, failed.attempt_count), (FAILED, 1))
+        self.assertEqual(sent.attempts.get().response_body, "OK")
+        self.assertEqual(failed.attempts.get().response_body, "410")
+        self.assertIsNotNone(sent.last_attempt_at)
+
+    def test_sent_notifications_are_not_overwritten(self):
+        notification = self.notifications[0]
+        writer = DeliveryStateWriter()
+        writer.record([self.state(notification, SENT, "OK")])
+        writer.record([self.state(notification, FAILED, "late duplicate")])
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, SENT)
+        self.assertEqual(notification.attempt_count, 1)
+        # both attempts are logged
+        self.assertEqual(
+            [
+                attempt.response_body
+                for attempt in notification.attempts.order_by("attempted_at")
+            ],
+            ["OK", "late duplicate"],
+        )
+
+    def test_buffer_is_flushed_every_n_states(self):
+        writer = DeliveryStateWriter(flush_size=2, flush_interval_ms=60_000)
+        first, second = self.notifications
+
+        with self.assertNumQueries(0):
+            writer.record([self.state(first, SENT, "OK")])
+        with self.assertNumQueries(2):
+            writer.record([self.state(second, SENT, "OK")])
+        self.assertEqual(Notification.objects.filter(status=SENT).count(), 2)
+
+    def test_same_notification_twice_counts_two_attempts(self):
+        writer = DeliveryStateWriter(flush_size=10, flush_interval_ms=60_000)
+        notification = self.notifications[0]
+        writer.record([self.state(notification, PENDING, "503")])
+        writer.record([self.state(notification, SENT, "OK")])
+        writer.flush()
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, SENT)
+        self.assertEqual(notification.attempt_count, 2)
+
+    def test_failed_flush_keeps_the_states(self):
+        writer = DeliveryStateWriter(flush_size=10, flush_interval_ms=60_000)
+        notification = self.notifications[0]
+        writer.record([self.state(notification, SENT, "OK")])
+
+        with patch.object(
+            Notification.objects,
+            "record_deliveries",
+            side_effect=OperationalError("connection lost"),
+        ):
+            # the test case's transaction, flushes run outside of one
+            with self.assertRaises(OperationalError), transaction.atomic():
+                writer.flush()
+        self.assertEqual(writer.flush(), 1)
+
+        notification.refresh_from_db()
+        self.assertEqual(notification.status, SENT)
+        self.assertEqual(notification.attempts.get().response_body, "OK")
@@ -1,8 +1,27 @@
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
 
-from .views import AlertWebhookAPIView, UserProfileCreateAPIView
+from .views import (
+    AlertBatchWebhookAPIView,
+    AlertWebhookAPIView,
+    AlertWebhookAsyncView,
+    DeliveryLatencyAPIView,
+    UserProfileCreateAPIView,
+)
 
 urlpatterns = [
     path("webhooks/alerts/", AlertWebhookAPIView.as_view(), name="webhook-alerts"),
+    # server to server, as the DRF views
+    path(
+        "webhooks/alerts/async/",
+        csrf_exempt(AlertWebhookAsyncView.as_view()),
+        name="webhook-alerts-async",
+    ),
+    path(
+        "webhooks/alerts/batch/",
+        AlertBatchWebhookAPIView.as_view(),
+        name="webhook-alerts-batch",
+    ),
     path("profiles/", UserProfileCreateAPIView.as_view(), name="profile-create"),
+    path("latency/", DeliveryLatencyAPIView.as_view(), name="delivery-latency"),
 ]
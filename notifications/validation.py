@@ -0,0 +1,167 @@
+import uuid
+from collections.abc import Callable, Mapping
+from datetime import datetime
+from functools import cache
+from typing import Any, NamedTuple
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ErrorDetail, ValidationError
+from rest_framework.fields import empty, get_error_detail
+from rest_framework.settings import api_settings
+
+from .models import Alert
+from .serializers import AlertCreateSerializer, parse_unix_timestamp
+
+
+class AlertRecord(NamedTuple):
+    alert_uuid: uuid.UUID
+    url: str
+    label: str
+    time_spotted: datetime
+    location: str
+
+
+class _FieldError(Exception):
+    def __init__(self, detail: list[ErrorDetail]) -> None:
+        self.detail = detail
+
+
+class _Schema(NamedTuple):
+    messages: dict[str, dict[str, str]]
+    validators: dict[str, list[Callable[[Any], None]]]
+    labels: dict[str, str]
+
+
+@cache
+def _compile() -> _Schema:
+    """
+    Precomputes, once per process, everything AlertCreateSerializer derives
+    from the model on each instantiation: error messages, validators and
+    label choices. Reusing them keeps the error format identical.
+    """
+    fields = AlertCreateSerializer().fields
+    return _Schema(
+        messages={name: field.error_messages for name, field in fields.items()},
+        validators={name: list(field.validators) for name, field in fields.items()},
+        labels={str(value): value for value in Alert.LabelChoices.values},
+    )
+
+
+def _fail(schema: _Schema, field: str, key: str, **kwargs: Any) -> _FieldError:
+    message = schema.messages[field][key].format(**kwargs)
+    return _FieldError([ErrorDetail(message, code=key)])
+
+
+def _check_presence(schema: _Schema, field: str, value: Any) -> None:
+    if value is empty:
+        raise _fail(schema, field, "required")
+    if value is None:
+        raise _fail(schema, field, "null")
+
+
+def _run_validators(schema: _Schema, field: str, value: Any) -> None:
+    # like Field.run_validators, every failing validator is reported
+    errors: list[ErrorDetail] = []
+    for validator in schema.validators[field]:
+        try:
+            validator(value)
+        except ValidationError as exc:
+            errors.extend(exc.detail)
+        except DjangoValidationError as exc:
+            errors.extend(get_error_detail(exc))
+    if errors:
+        raise _FieldError(errors)
+
+
+def _validate_uuid(schema: _Schema, value: Any) -> uuid.UUID:
+    _check_presence(schema, "alert_uuid", value)
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        if isinstance(value, int):
+            return uuid.UUID(int=value)
+        if isinstance(value, str):
+            return uuid.UUID(hex=value)
+    except ValueError:
+        pass
+    raise _fail(schema, "alert_uuid", "invalid", value=value)
+
+
+def _validate_url(schema: _Schema, value: Any) -> str:
+    if value == "" or str(value).strip() == "":
+        raise _fail(schema, "url", "blank")
+    _check_presence(schema, "url", value)
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise _fail(schema, "url", "invalid")
+    url = str(value).strip()
+    _run_validators(schema, "url", url)
+    return url
+
+
+def _validate_label(schema: _Schema, value: Any) -> str:
+    _check_presence(schema, "label", value)
+    try:
+        label = schema.labels[str(value)]
+    except KeyError:
+        raise _fail(schema, "label", "invalid_choice", input=value) from None
+    _run_validators(schema, "label", label)
+    return label
+
+
+def _validate_time_spotted(schema: _Schema, value: Any) -> datetime:
+    _check_presence(schema, "time_spotted", value)
+    try:
+        return parse_unix_timestamp(value)
+    except ValidationError as exc:
+        raise _FieldError(exc.detail) from exc
+
+
+def _validate_location(schema: _Schema, value: Any) -> str:
+    # relational fields treat an empty string as null
+    _check_presence(schema, "location", None if value == "" else value)
+    return str(value)
+
+
+_FIELD_VALIDATORS: list[tuple[str, Callable[[_Schema, Any], Any]]] = [
+    ("alert_uuid", _validate_uuid),
+    ("url", _validate_url),
+    ("label", _validate_label),
+    ("time_spotted", _validate_time_spotted),
+    ("location", _validate_location),
+]
+
+
+def validate_alert_payload(data: Any) -> AlertRecord:
+    """
+    Fast path equivalent of AlertCreateSerializer(data=data).is_valid():
+    accepts and rejects the same inputs and raises the same ValidationError,
+    but returns a typed record without building a serializer.
+    Unlike the serializer, the store is not resolved during validation.
+    """
+    schema = _compile()
+    if data is None:
+        raise ValidationError(
+            {
+                api_settings.NON_FIELD_ERRORS_KEY: [
+                    ErrorDetail("No data provided", code="null")
+                ]
+            }
+        )
+    if not isinstance(data, Mapping):
+        message = AlertCreateSerializer.default_error_messages["invalid"].format(
+            datatype=type(data).__name__
+        )
+        raise ValidationError(
+            {api_settings.NON_FIELD_ERRORS_KEY: [ErrorDetail(message, code="invalid")]}
+        )
+
+    values: dict[str, Any] = {}
+    errors: dict[str, list[ErrorDetail]] = {}
+    for name, validate in _FIELD_VALIDATORS:
+        try:
+            values[name] = validate(schema, data.get(name, empty))
+        except _FieldError as exc:
+            errors[name] = exc.detail
+    if errors:
+        raise ValidationError(errors)
+    return AlertRecord(**values)
@@ -1,20 +1,35 @@
+import json
 import logging
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
 from typing import Any
 
-from django.db import DatabaseError, transaction
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.views import View
 from rest_framework import generics, status
+from rest_framework.exceptions import ParseError, ValidationError
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from notifications.models import UserProfile
+from notifications.models import Alert, Store, UserProfile
 
+from .dedupe import alert_fingerprint, seen_alerts
+from .ingestion import ingest_alert_batch, save_alert
+from .latency import DEFAULT_WINDOWS, latency_report
+from .metrics import alert_validation_failures, render
+from .parsers import JSONArrayStreamParser, NDJSONParser
 from .serializers import (
     AlertCreateSerializer,
     AlertReadOnlySerializer,
+    DeliveryLatencyQuerySerializer,
     UserProfileCreateSerializer,
 )
-from .tasks import fan_out_notifications
+from .validation import AlertRecord, validate_alert_payload
 
 logger = logging.getLogger(__name__)
 
@@ -22,46 +37,202 @@ logger = logging.getLogger(__name__)
 class AlertWebhookAPIView(APIView):
     """
     Receive shoplifting alerts from the external service,
-    upsert into Alert, then asynchronously fan out notifications.
+    upsert into Alert and, in the same transaction, write its fan-out to the
+    outbox: notifications are published by the relay, not by the request.
+
+    With NOTIFICATION_ALERT_FAST_VALIDATION, the payload is checked by the
+    precompiled validator instead of AlertCreateSerializer (same contract).
+    Re-deliveries of an alert only fan out again when its content changed.
     """
 
-    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
-        serializer = AlertCreateSerializer(data=request.data)
+    def _validate_with_serializer(self, data: Any) -> tuple[AlertRecord, Store]:
+        serializer = AlertCreateSerializer(data=data)
         serializer.is_valid(raise_exception=True)
+        validated = serializer.validated_data
+        record = AlertRecord(
+            alert_uuid=validated["alert_uuid"],
+            url=validated["url"],
+            label=validated["label"],
+            time_spotted=validated["time_spotted"],
+            location=validated["location"].location_id,
+        )
+        return record, validated["location"]
+
+    def _save(self, record: AlertRecord, store: Store | None) -> tuple[Alert, bool]:
+        try:
+            return save_alert(record, store)
+        except DatabaseError:
+            logger.exception(
+                "DB error saving Alert", extra={"validated_data": record._asdict()}
+            )
+            raise
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        if getattr(settings, "NOTIFICATION_ALERT_FAST_VALIDATION", False):
+            record, store = validate_alert_payload(request.data), None
+        else:
+            # the serializer already resolved the store
+            record, store = self._validate_with_serializer(request.data)
+
+        # the upstream service retries: an exact re-delivery is answered as
+        # the first one was, without touching the database
+        fingerprint = alert_fingerprint(
+            record.url, record.location, record.label, record.time_spotted
+        )
+        seen = seen_alerts.get(record.alert_uuid, fingerprint)
+        if seen is not None and seen.representation is not None:
+            return Response(seen.representation, status=status.HTTP_200_OK)
 
         try:
-            with transaction.atomic():
-                alert = serializer.save()
+            alert, _ = self._save(record, store)
 
         # TODO: try-catch block here could probably be done across the app as a middleware?
         except DatabaseError as db_exc:
-            logger.exception(
-                "DB error saving Alert",
-                extra={"validated_data": serializer.validated_data},
-            )
             return Response(
                 {"error": "Could not persist alert"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
+        # return the up-to-date Alert representation
+        read_serializer = AlertReadOnlySerializer(alert, context={"request": request})
+        seen_alerts.add(alert.alert_uuid, fingerprint, read_serializer.data)
+        return Response(read_serializer.data, status=status.HTTP_200_OK)
+
+
+@cache
+def _db_executor() -> ThreadPoolExecutor | None:
+    """
+    Threads running the transactions of the async view, each keeping its
+    database connection across requests, when NOTIFICATION_ASYNC_DB_THREADS
+    is set: at most that many connections per process, none opened per
+    request. Otherwise Django runs them in a new thread per request.
+    """
+    if threads := getattr(settings, "NOTIFICATION_ASYNC_DB_THREADS", 0):
+        return ThreadPoolExecutor(threads, thread_name_prefix="alert-db")
+    return None
+
+
+def _save_on_db_thread(record: AlertRecord) -> tuple[Alert, bool]:
+    try:
+        return save_alert(record)
+    except DatabaseError:
+        # reconnect on the next request of this thread
+        connection.close()
+        raise
+
+
+class AlertWebhookAsyncView(View):
+    """
+    Async-native AlertWebhookAPIView, same contract, for ASGI deployments:
+    a request waiting on the database or Redis holds no worker, only its
+    coroutine. DRF views are sync only, so this is a plain Django view.
+
+    Payloads always go through the precompiled validator, which needs no
+    database. The upsert and its outbox row share a transaction, which Django
+    only runs synchronously: they are one sync_to_async call, the only thread
+    hop of a request besides Redis round trips (see _db_executor).
+    """
+
+    http_method_names = ["post"]
+
+    async def post(self, request: HttpRequest, *args: Any, **kwargs: Any):
+        try:
+            record = validate_alert_payload(json.loads(request.body))
+        except ValueError as exc:
+            return JsonResponse(
+                {"detail": f"JSON parse error - {exc}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except ValidationError as exc:
+            return JsonResponse(
+                exc.detail, status=status.HTTP_400_BAD_REQUEST, safe=False
+            )
+
+        fingerprint = alert_fingerprint(
+            record.url, record.location, record.label, record.time_spotted
+        )
+        seen = await seen_alerts.aget(record.alert_uuid, fingerprint)
+        if seen is not None and seen.representation is not None:
+            return JsonResponse(seen.representation)
+
         try:
-            fan_out_notifications.delay(str(alert.alert_uuid))
-        except Exception as task_exc:
-            # uh-oh... celery isn't feeling well
+            if (executor := _db_executor()) is not None:
+                save = sync_to_async(
+                    _save_on_db_thread, thread_sensitive=False, executor=executor
+                )
+            else:
+                save = sync_to_async(save_alert)
+            alert, _ = await save(record)
+        except DatabaseError:
             logger.exception(
-                "Failed to enqueue notification fan-out",
-                extra={"alert_uuid": str(alert.alert_uuid)},
+                "DB error saving Alert", extra={"validated_data": record._asdict()}
             )
-            return Response(
-                {
-                    "warning": "Alert saved but notifications not scheduled",
-                },
-                status=status.HTTP_202_ACCEPTED,
+            return JsonResponse(
+                {"error": "Could not persist alert"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        # return the up-to-date Alert representation
-        read_serializer = AlertReadOnlySerializer(alert, context={"request": request})
-        return Response(read_serializer.data, status=status.HTTP_200_OK)
+        representation = AlertReadOnlySerializer(alert).data
+        await seen_alerts.aadd(alert.alert_uuid, fingerprint, representation)
+        return JsonResponse(representation)
+
+
+class AlertBatchWebhookAPIView(APIView):
+    """
+    Receive a batch of alerts, as a JSON array or an NDJSON stream,
+    upsert them set-based and fan out their notifications in bulk.
+    Returns one result per item so that a bad alert does not reject the batch.
+    """
+
+    parser_classes = [JSONArrayStreamParser, NDJSONParser]
+
+    def post(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        items = request.data
+        if isinstance(items, Mapping):
+            # empty body, DRF short-circuits the parsers
+            if items:
+                raise ParseError("Expected a JSON array or an NDJSON stream of alerts.")
+            items = []
+
+        results = ingest_alert_batch(items)
+        summary = {
+            outcome: sum(result["status"] == outcome for result in results)
+            for outcome in ("created", "updated", "unchanged", "invalid", "failed")
+        }
+        alert_validation_failures.labels("webhook-alerts-batch").inc(summary["invalid"])
+        return Response({**summary, "results": results}, status=status.HTTP_200_OK)
+
+
+class DeliveryLatencyAPIView(APIView):
+    """
+    Detection-to-delivery latency percentiles (seconds) per store, label and
+    channel, over rolling windows: ?window=300&window=3600, filtered by
+    ?store=, ?label= and ?channel=. Read from the per-minute rollups, see
+    notifications.latency: the last NOTIFICATION_LATENCY_ROLLUP_DELAY seconds
+    and the time since the last rollup are not counted yet.
+    """
+
+    def get(self, request: Request, *args: Any, **kwargs: Any) -> Response:
+        query = DeliveryLatencyQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+        filters = {
+            field: params[name]
+            for name, field in (
+                ("store", "store_id"),
+                ("label", "label"),
+                ("channel", "channel"),
+            )
+            if name in params
+        }
+        windows = latency_report(params.get("window") or DEFAULT_WINDOWS, **filters)
+        return Response({"windows": windows}, status=status.HTTP_200_OK)
+
+
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Prometheus scrape endpoint, see notifications.metrics."""
+    body, content_type = render()
+    return HttpResponse(body, content_type=content_type)
 
 
 class UserProfileCreateAPIView(generics.CreateAPIView):
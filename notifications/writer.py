@@ -0,0 +1,108 @@
+import logging
+import threading
+import time
+from collections.abc import Iterable
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from .metrics import observe_delivery_states
+from .models import DeliveryAttempt, DeliveryState, Notification
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryStateWriter:
+    """
+    Records delivery attempts and outcomes, one conditional UPDATE of the
+    notifications (see NotificationManager.record_deliveries) and one INSERT
+    into the attempt log (see DeliveryAttempt) for everything flushed at once.
+
+    With NOTIFICATION_STATE_FLUSH_SIZE above 1, states are buffered in the
+    worker and flushed every flush_size states or flush_interval_ms, whichever
+    comes first, and on worker shutdown. A failed flush keeps its states for
+    the next one. Buffered states are lost if the process dies: the
+    notifications then stay pending and are delivered again.
+    """
+
+    def __init__(
+        self, flush_size: int | None = None, flush_interval_ms: int | None = None
+    ) -> None:
+        self.flush_size = flush_size or getattr(
+            settings, "NOTIFICATION_STATE_FLUSH_SIZE", 1
+        )
+        self.flush_interval_ms = flush_interval_ms or getattr(
+            settings, "NOTIFICATION_STATE_FLUSH_INTERVAL_MS", 200
+        )
+        # reentrant: record() flushes while holding it
+        self._lock = threading.RLock()
+        self._buffer: dict[str, DeliveryState] = {}
+        self._deadline: float | None = None
+        self._timer: threading.Timer | None = None
+
+    def record(self, states: Iterable[DeliveryState]) -> None:
+        """Buffers the states, the buffer is flushed once it holds flush_size."""
+        states = list(states)
+        observe_delivery_states(states)
+        with self._lock:
+            for state in states:
+                key = str(state.notification_uuid)
+                if key in self._buffer:
+                    # a single UPDATE counts one attempt per row
+                    self.flush()
+                self._buffer[key] = state
+                if self._deadline is None:
+                    self._deadline = time.monotonic() + self.flush_interval_ms / 1000
+                    self._schedule_timer()
+            # states recorded together are written together
+            if len(self._buffer) >= self.flush_size:
+                self.flush()
+
+    def flush_if_due(self) -> None:
+        with self._lock:
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                self.flush()
+
+    def flush(self) -> int:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            states = self._buffer
+            if not states:
+                self._deadline = None
+                return 0
+            # written under the lock, so that a newer state of a row cannot
+            # be overwritten by an older one flushed concurrently
+            try:
+                with transaction.atomic(savepoint=False):
+                    updated = Notification.objects.record_deliveries(states.values())
+                    DeliveryAttempt.objects.record(states.values())
+            except Exception:
+                # kept for the next flush: the notifications would otherwise
+                # stay leased, and be delivered again once the lease expires
+                self._deadline = time.monotonic() + self.flush_interval_ms / 1000
+                self._schedule_timer()
+                raise
+            self._buffer, self._deadline = {}, None
+        logger.info(f"StateWriter: Flushed {len(states)} delivery states")
+        return updated
+
+    def _schedule_timer(self) -> None:
+        if self.flush_size <= 1:
+            return
+        self._timer = threading.Timer(self.flush_interval_ms / 1000, self._on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("StateWriter: Failed to flush delivery states")
+        finally:
+            # the timer thread got its own connections, do not leak them
+            connections.close_all()
+
+
+delivery_writer = DeliveryStateWriter()